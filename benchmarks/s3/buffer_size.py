@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Measures S3 key transfer throughput for different buffer sizes.
+
+Uploads an object from memory to, and downloads it back from, the stub
+S3 server on the loopback interface (run in a child process so it doesn't
+compete for the GIL), once per ``buffer_size``.  Reports MB/s and the
+number of socket send/receive calls made per MB, counted by wrapping
+``socket.socket.sendall`` and ``socket.SocketIO.readinto``; every one of
+those is at least one system call.
+
+    PYTHONPATH=. python -m benchmarks.s3.buffer_size --size 64
+"""
+import argparse
+import socket
+import time
+
+from benchmarks.s3.stubserver import start_process
+from boto.compat import BytesIO
+from boto.s3.connection import OrdinaryCallingFormat, S3Connection
+
+
+MB = 1024 * 1024
+
+
+class CallCounter(object):
+    """Counts calls to the socket methods that make system calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.patched = []
+
+    def wrap(self, cls, name):
+        original = getattr(cls, name)
+
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return original(*args, **kwargs)
+        setattr(cls, name, counted)
+        self.patched.append((cls, name, original))
+
+    def __enter__(self):
+        self.wrap(socket.socket, 'sendall')
+        if hasattr(socket, 'SocketIO'):
+            self.wrap(socket.SocketIO, 'readinto')
+        return self
+
+    def __exit__(self, *exc_info):
+        for cls, name, original in self.patched:
+            setattr(cls, name, original)
+
+
+class NullWriter(object):
+    def write(self, data):
+        pass
+
+
+def measure(func, nbytes, repeat):
+    best = None
+    for i in range(repeat):
+        with CallCounter() as counter:
+            start = time.time()
+            func()
+            elapsed = time.time() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, counter.calls)
+    elapsed, calls = best
+    return nbytes / float(MB) / elapsed, calls / (nbytes / float(MB))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--size', type=int, default=32,
+                        help='Object size in MB.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Transfers per measurement; the fastest counts.')
+    parser.add_argument('--buffer-sizes', default='4096,8192,65536,262144,'
+                        '1048576,adaptive',
+                        help='Comma separated buffer sizes to try.')
+    args = parser.parse_args()
+
+    payload = b'x' * (args.size * MB)
+    process, port = start_process()
+
+    conn = S3Connection('access_key', 'secret_key', host='127.0.0.1',
+                        port=port, is_secure=False,
+                        calling_format=OrdinaryCallingFormat())
+    key = conn.create_bucket('bench').new_key('object')
+    md5 = key.compute_md5(BytesIO(payload))
+
+    print('%-10s %12s %12s %12s %12s' % ('buffer', 'PUT MB/s', 'PUT calls/MB',
+                                         'GET MB/s', 'GET calls/MB'))
+    try:
+        for buffer_size in args.buffer_sizes.split(','):
+            if buffer_size != 'adaptive':
+                buffer_size = int(buffer_size)
+
+            def upload():
+                key.set_contents_from_file(BytesIO(payload), md5=md5,
+                                           buffer_size=buffer_size)
+
+            def download():
+                key.size = len(payload)
+                key.get_contents_to_file(NullWriter(),
+                                         buffer_size=buffer_size)
+
+            put_rate, put_calls = measure(upload, len(payload), args.repeat)
+            get_rate, get_calls = measure(download, len(payload),
+                                          args.repeat)
+            print('%-10s %12.1f %12.1f %12.1f %12.1f' % (
+                buffer_size, put_rate, put_calls, get_rate, get_calls))
+    finally:
+        process.terminate()
+
+
+if __name__ == '__main__':
+    main()
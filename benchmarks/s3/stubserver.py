@@ -0,0 +1,522 @@
+"""
+An in-memory stand-in for S3, for measuring boto's side of the data path.
+
+Implements the path-style REST calls boto's S3 transfers make: bucket
+create/delete, object ``PUT`` (including copies), ``GET`` (including
+ranges and ``If-Match``), ``HEAD`` and ``DELETE``, listing with prefix,
+marker and delimiter, multi-object delete, and multipart uploads
+(including part copies).  Requests aren't authenticated, so any
+credentials work; connect with ``OrdinaryCallingFormat``::
+
+    server = StubS3Server()
+    port = server.start()
+    conn = S3Connection('access', 'secret', host='127.0.0.1', port=port,
+                        is_secure=False, calling_format=OrdinaryCallingFormat())
+
+The server runs on threads of the calling process.  To keep its CPU time
+out of the client's measurements, and the two from contending for the
+GIL, run it in a child process with :func:`start_process` instead.
+"""
+import hashlib
+import multiprocessing
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ElementTree
+from xml.sax.saxutils import escape
+
+from boto.compat import parse_qs, unquote, urlparse
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+XMLNS = 'http://s3.amazonaws.com/doc/2006-03-01/'
+ISO8601_MS = '%Y-%m-%dT%H:%M:%S.000Z'
+RFC1123 = '%a, %d %b %Y %H:%M:%S GMT'
+
+# The headers stored with an object and returned when it's fetched.
+STORED_HEADERS = ('content-type', 'content-encoding', 'content-disposition',
+                  'content-language', 'cache-control', 'expires')
+
+
+class StubError(Exception):
+    def __init__(self, status, code, message=''):
+        super(StubError, self).__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+class StoredObject(object):
+    def __init__(self, data, headers, etag=None):
+        self.data = data
+        self.headers = headers
+        self.etag = etag or '"%s"' % hashlib.md5(data).hexdigest()
+        self.mtime = time.time()
+
+
+class MultipartUpload(object):
+    def __init__(self, key_name, headers):
+        self.key_name = key_name
+        self.headers = headers
+        self.parts = {}
+
+
+def _xml(root, body):
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n<%s xmlns="%s">%s</%s>' %
+            (root, XMLNS, body, root)).encode('utf-8')
+
+
+def _element(name, value):
+    return '<%s>%s</%s>' % (name, escape(str(value)), name)
+
+
+def _timestamp(mtime, fmt=ISO8601_MS):
+    return time.strftime(fmt, time.gmtime(mtime))
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _children(element, name):
+    return [child for child in element if _local_name(child.tag) == name]
+
+
+def _text(element, name):
+    found = _children(element, name)
+    return (found[0].text or '') if found else ''
+
+
+def _parse_range(value, size):
+    match = re.match(r'^bytes=(\d*)-(\d*)$', value or '')
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+    if first > last:
+        raise StubError(416, 'InvalidRange',
+                        'The requested range is not satisfiable')
+    return first, last
+
+
+def _decode_aws_chunked(body):
+    """Strips the framing of a streaming SigV4 upload."""
+    data = []
+    offset = 0
+    while True:
+        end = body.index(b'\r\n', offset)
+        size = int(body[offset:end].split(b';')[0], 16)
+        if not size:
+            return b''.join(data)
+        data.append(body[end + 2:end + 2 + size])
+        offset = end + 2 + size + 2
+
+
+class StubS3Store(object):
+    """The buckets, objects and uploads of a server.  Thread-safe."""
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.buckets = {}
+        self.uploads = {}
+
+    def bucket(self, name):
+        try:
+            return self.buckets[name]
+        except KeyError:
+            raise StubError(404, 'NoSuchBucket',
+                            'The specified bucket does not exist')
+
+    def get(self, bucket_name, key_name):
+        with self.mutex:
+            try:
+                return self.bucket(bucket_name)[key_name]
+            except KeyError:
+                raise StubError(404, 'NoSuchKey',
+                                'The specified key does not exist.')
+
+    def put(self, bucket_name, key_name, obj):
+        with self.mutex:
+            self.bucket(bucket_name)[key_name] = obj
+
+    def delete(self, bucket_name, key_name):
+        with self.mutex:
+            self.bucket(bucket_name).pop(key_name, None)
+
+    def upload(self, upload_id):
+        try:
+            return self.uploads[upload_id]
+        except KeyError:
+            raise StubError(404, 'NoSuchUpload',
+                            'The specified upload does not exist.')
+
+
+class StubS3Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so that boto's pooled connections are reused.
+    protocol_version = 'HTTP/1.1'
+    # Otherwise the "100 Continue" and the response that follows it wait
+    # out the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def do_HEAD(self):
+        self.dispatch('HEAD')
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        parts = url.path.lstrip('/').split('/', 1)
+        bucket_name = unquote(parts[0])
+        key_name = unquote(parts[1]) if len(parts) > 1 else ''
+        query = dict((name, values[0]) for name, values in
+                     parse_qs(url.query, keep_blank_values=True).items())
+        body = self.read_body()
+        try:
+            if not bucket_name:
+                raise StubError(405, 'MethodNotAllowed')
+            if key_name:
+                handler = getattr(self, '%s_object' % method.lower())
+            else:
+                handler = getattr(self, '%s_bucket' % method.lower())
+            status, headers, payload = handler(bucket_name, key_name, query,
+                                               body)
+        except StubError as e:
+            status, headers = e.status, {'Content-Type': 'application/xml'}
+            payload = _xml('Error', _element('Code', e.code) +
+                           _element('Message', e.message))
+        self.respond(method, status, headers, payload)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        chunks = []
+        while length:
+            chunk = self.rfile.read(min(length, 1024 * 1024))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            length -= len(chunk)
+        body = b''.join(chunks)
+        if 'aws-chunked' in (self.headers.get('Content-Encoding') or ''):
+            body = _decode_aws_chunked(body)
+        return body
+
+    def respond(self, method, status, headers, payload):
+        self.send_response(status)
+        headers.setdefault('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if method != 'HEAD' and payload:
+            self.wfile.write(payload)
+
+    def stored_headers(self):
+        headers = {}
+        for name, value in self.headers.items():
+            name = name.lower()
+            if name in STORED_HEADERS or name.startswith('x-amz-meta-'):
+                headers[name] = value
+        headers.setdefault('content-type', 'binary/octet-stream')
+        return headers
+
+    def copy_source(self, query):
+        source = unquote(self.headers['x-amz-copy-source']).lstrip('/')
+        source = source.split('?', 1)[0]
+        bucket_name, key_name = source.split('/', 1)
+        obj = self.store.get(bucket_name, key_name)
+        if_match = self.headers.get('x-amz-copy-source-if-match')
+        if if_match and if_match.strip('"') != obj.etag.strip('"'):
+            raise StubError(412, 'PreconditionFailed',
+                            'At least one of the pre-conditions you '
+                            'specified did not hold')
+        return obj
+
+    # Buckets
+
+    def put_bucket(self, bucket_name, key_name, query, body):
+        with self.store.mutex:
+            self.store.buckets.setdefault(bucket_name, {})
+        return 200, {}, b''
+
+    def delete_bucket(self, bucket_name, key_name, query, body):
+        with self.store.mutex:
+            if self.store.bucket(bucket_name):
+                raise StubError(409, 'BucketNotEmpty',
+                                'The bucket you tried to delete is not empty')
+            del self.store.buckets[bucket_name]
+        return 204, {}, b''
+
+    def head_bucket(self, bucket_name, key_name, query, body):
+        with self.store.mutex:
+            self.store.bucket(bucket_name)
+        return 200, {}, b''
+
+    def get_bucket(self, bucket_name, key_name, query, body):
+        prefix = query.get('prefix', '')
+        marker = query.get('marker', '')
+        delimiter = query.get('delimiter', '')
+        max_keys = int(query.get('max-keys') or 1000)
+        with self.store.mutex:
+            bucket = self.store.bucket(bucket_name)
+            names = sorted(name for name in bucket
+                           if name > marker and name.startswith(prefix))
+            objects = dict((name, bucket[name]) for name in names)
+        contents = []
+        prefixes = []
+        truncated = False
+        last = None
+        for name in names:
+            rest = name[len(prefix):]
+            if delimiter and delimiter in rest:
+                common = prefix + rest[:rest.index(delimiter) + 1]
+                if prefixes and prefixes[-1] == common:
+                    continue
+                item = ('prefix', common)
+            else:
+                item = ('key', name)
+            if len(contents) + len(prefixes) == max_keys:
+                truncated = True
+                break
+            if item[0] == 'prefix':
+                prefixes.append(common)
+            else:
+                obj = objects[name]
+                contents.append(
+                    '<Contents>%s%s%s%s%s</Contents>' % (
+                        _element('Key', name),
+                        _element('LastModified', _timestamp(obj.mtime)),
+                        _element('ETag', obj.etag),
+                        _element('Size', len(obj.data)),
+                        _element('StorageClass', 'STANDARD')))
+            last = item[1]
+        body = (_element('Name', bucket_name) + _element('Prefix', prefix) +
+                _element('Marker', marker) + _element('MaxKeys', max_keys) +
+                _element('IsTruncated', 'true' if truncated else 'false'))
+        if delimiter:
+            body += _element('Delimiter', delimiter)
+            if truncated and last is not None:
+                if last.endswith(delimiter):
+                    # Continue after everything under the rolled-up prefix.
+                    last += u'\U0010ffff'
+                body += _element('NextMarker', last)
+        body += ''.join(contents)
+        body += ''.join('<CommonPrefixes>%s</CommonPrefixes>' %
+                        _element('Prefix', p) for p in prefixes)
+        return 200, {'Content-Type': 'application/xml'}, \
+            _xml('ListBucketResult', body)
+
+    def post_bucket(self, bucket_name, key_name, query, body):
+        if 'delete' not in query:
+            raise StubError(400, 'InvalidRequest')
+        request = ElementTree.fromstring(body)
+        quiet = _text(request, 'Quiet').lower() == 'true'
+        results = []
+        for obj in _children(request, 'Object'):
+            name = _text(obj, 'Key')
+            self.store.delete(bucket_name, name)
+            if not quiet:
+                results.append('<Deleted>%s</Deleted>' %
+                               _element('Key', name))
+        return 200, {'Content-Type': 'application/xml'}, \
+            _xml('DeleteResult', ''.join(results))
+
+    # Objects
+
+    def head_object(self, bucket_name, key_name, query, body):
+        return self.get_object(bucket_name, key_name, query, body)
+
+    def get_object(self, bucket_name, key_name, query, body):
+        obj = self.store.get(bucket_name, key_name)
+        if_match = self.headers.get('If-Match')
+        if if_match and if_match.strip('"') != obj.etag.strip('"'):
+            raise StubError(412, 'PreconditionFailed',
+                            'At least one of the pre-conditions you '
+                            'specified did not hold')
+        headers = dict(obj.headers)
+        headers['ETag'] = obj.etag
+        headers['Last-Modified'] = _timestamp(obj.mtime, RFC1123)
+        headers['Accept-Ranges'] = 'bytes'
+        size = len(obj.data)
+        byte_range = _parse_range(self.headers.get('Range'), size)
+        if byte_range is None:
+            return 200, headers, obj.data
+        first, last = byte_range
+        headers['Content-Range'] = 'bytes %d-%d/%d' % (first, last, size)
+        return 206, headers, obj.data[first:last + 1]
+
+    def put_object(self, bucket_name, key_name, query, body):
+        if 'uploadId' in query:
+            return self.put_part(bucket_name, key_name, query, body)
+        if 'x-amz-copy-source' in self.headers:
+            source = self.copy_source(query)
+            directive = self.headers.get('x-amz-metadata-directive', 'COPY')
+            headers = source.headers
+            if directive.upper() == 'REPLACE':
+                headers = self.stored_headers()
+            obj = StoredObject(source.data, headers)
+            self.store.put(bucket_name, key_name, obj)
+            result = (_element('LastModified', _timestamp(obj.mtime)) +
+                      _element('ETag', obj.etag))
+            return 200, {'Content-Type': 'application/xml'}, \
+                _xml('CopyObjectResult', result)
+        obj = StoredObject(body, self.stored_headers())
+        self.store.put(bucket_name, key_name, obj)
+        return 200, {'ETag': obj.etag}, b''
+
+    def put_part(self, bucket_name, key_name, query, body):
+        part_number = int(query['partNumber'])
+        with self.store.mutex:
+            upload = self.store.upload(query['uploadId'])
+        if 'x-amz-copy-source' in self.headers:
+            data = self.copy_source(query).data
+            byte_range = _parse_range(
+                self.headers.get('x-amz-copy-source-range'), len(data))
+            if byte_range is not None:
+                data = data[byte_range[0]:byte_range[1] + 1]
+            part = StoredObject(data, {})
+            with self.store.mutex:
+                upload.parts[part_number] = part
+            result = (_element('LastModified', _timestamp(part.mtime)) +
+                      _element('ETag', part.etag))
+            return 200, {'Content-Type': 'application/xml'}, \
+                _xml('CopyPartResult', result)
+        part = StoredObject(body, {})
+        with self.store.mutex:
+            upload.parts[part_number] = part
+        return 200, {'ETag': part.etag}, b''
+
+    def post_object(self, bucket_name, key_name, query, body):
+        if 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            with self.store.mutex:
+                self.store.bucket(bucket_name)
+                self.store.uploads[upload_id] = MultipartUpload(
+                    key_name, self.stored_headers())
+            result = (_element('Bucket', bucket_name) +
+                      _element('Key', key_name) +
+                      _element('UploadId', upload_id))
+            return 200, {'Content-Type': 'application/xml'}, \
+                _xml('InitiateMultipartUploadResult', result)
+        if 'uploadId' not in query:
+            raise StubError(400, 'InvalidRequest')
+        with self.store.mutex:
+            upload = self.store.upload(query['uploadId'])
+        request = ElementTree.fromstring(body)
+        data = []
+        digests = []
+        for part in _children(request, 'Part'):
+            stored = upload.parts.get(int(_text(part, 'PartNumber')))
+            if stored is None or \
+                    stored.etag.strip('"') != _text(part, 'ETag').strip('"'):
+                raise StubError(400, 'InvalidPart',
+                                'One or more of the specified parts could '
+                                'not be found.')
+            data.append(stored.data)
+            digests.append(hashlib.md5(stored.data).digest())
+        etag = '"%s-%d"' % (hashlib.md5(b''.join(digests)).hexdigest(),
+                            len(digests))
+        obj = StoredObject(b''.join(data), upload.headers, etag)
+        self.store.put(bucket_name, key_name, obj)
+        with self.store.mutex:
+            self.store.uploads.pop(query['uploadId'], None)
+        result = (_element('Location', 'http://%s:%d/%s/%s' % (
+                      self.server.server_address + (bucket_name, key_name))) +
+                  _element('Bucket', bucket_name) +
+                  _element('Key', key_name) + _element('ETag', etag))
+        return 200, {'Content-Type': 'application/xml'}, \
+            _xml('CompleteMultipartUploadResult', result)
+
+    def delete_object(self, bucket_name, key_name, query, body):
+        if 'uploadId' in query:
+            with self.store.mutex:
+                self.store.upload(query['uploadId'])
+                del self.store.uploads[query['uploadId']]
+        else:
+            self.store.delete(bucket_name, key_name)
+        return 204, {}, b''
+
+
+class StubS3Server(ThreadingMixIn, HTTPServer):
+    """
+    Serves a :class:`StubS3Store` on ``host``, on ``port`` or, by
+    default, a free port.  Each connection is handled on its own thread.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        HTTPServer.__init__(self, (host, port), StubS3Handler)
+        self.store = StubS3Store()
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serves from a daemon thread and returns the port."""
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def _serve(host, ports):
+    server = StubS3Server(host)
+    ports.put(server.port)
+    server.serve_forever()
+
+
+def start_process(host='127.0.0.1'):
+    """
+    Runs a server in a child process.  Returns the process, which should
+    be terminated when done with, and the port it listens on.
+    """
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(host, ports))
+    process.daemon = True
+    process.start()
+    return process, ports.get()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    args = parser.parse_args()
+    server = StubS3Server(args.host, args.port)
+    print('Serving on %s:%d' % (args.host, server.port))
+    server.serve_forever()
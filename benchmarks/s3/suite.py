@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""
+Measures boto's S3 data path against the stub S3 server.
+
+Runs each transfer path -- single ``PUT`` and ``GET``, ranged ``GET``,
+parallel multipart upload and ranged download, server-side parallel
+copy, sequential and parallel listing, and sequential and pipelined
+multi-object delete -- several times against the stub server on the
+loopback interface, and reports for each the latency percentiles, MB/s
+(or objects/s for the paths that move no data) and the client's CPU time
+per MB or per thousand objects.  The server runs in a child process, so
+its CPU time isn't counted.  Nothing leaves the machine, so the numbers
+track boto's overhead rather than the network's, and can be compared
+between commits to catch regressions.
+
+    PYTHONPATH=. python -m benchmarks.s3.suite --size 64 --keys 2000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.s3.stubserver import start_process
+from boto.compat import BytesIO
+from boto.s3.connection import OrdinaryCallingFormat, S3Connection
+from boto.s3.transfer import MIN_PART_SIZE
+
+
+MB = 1024 * 1024
+
+try:
+    from time import process_time
+except ImportError:
+    # Python < 3.3.
+    from time import clock as process_time
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[index]
+
+
+class NullWriter(object):
+    def write(self, data):
+        pass
+
+
+class Case(object):
+    """
+    A path to measure: ``func`` is timed ``repeat`` times, each after an
+    untimed call to ``setup``, and moves ``nbytes`` bytes or touches
+    ``nobjects`` objects.
+    """
+
+    def __init__(self, name, func, nbytes=0, nobjects=0, setup=None):
+        self.name = name
+        self.func = func
+        self.nbytes = nbytes
+        self.nobjects = nobjects
+        self.setup = setup
+
+    def run(self, repeat):
+        latencies = []
+        cpu = 0.0
+        for i in range(repeat):
+            if self.setup is not None:
+                self.setup()
+            cpu_start = process_time()
+            start = time.time()
+            self.func()
+            latencies.append(time.time() - start)
+            cpu += process_time() - cpu_start
+        return latencies, cpu
+
+
+def report(case, latencies, cpu):
+    elapsed = sum(latencies)
+    count = len(latencies)
+    if case.nbytes:
+        amount = case.nbytes * count / float(MB)
+        rate = '%9.1f MB/s' % (amount / elapsed)
+        cost = '%8.1f ms/MB' % (cpu * 1000 / amount)
+    else:
+        amount = case.nobjects * count / 1000.0
+        rate = '%7.0f objs/s' % (amount * 1000 / elapsed)
+        cost = '%6.1f ms/kobj' % (cpu * 1000 / amount)
+    print('%-16s %9.2f %9.2f %9.2f %15s %14s' % (
+        case.name, percentile(latencies, 50) * 1000,
+        percentile(latencies, 90) * 1000, percentile(latencies, 99) * 1000,
+        rate, cost))
+
+
+def build_cases(bucket, args, tmpdir):
+    size = args.size * MB
+    payload = os.urandom(size)
+    source_path = os.path.join(tmpdir, 'source')
+    with open(source_path, 'wb') as fp:
+        fp.write(payload)
+    target_path = os.path.join(tmpdir, 'target')
+    key = bucket.new_key('object')
+    md5 = key.compute_md5(BytesIO(payload))
+    key.set_contents_from_file(BytesIO(payload), md5=md5)
+    range_size = min(MB, size)
+    part_size = MIN_PART_SIZE
+    threads = args.threads
+
+    def put():
+        key.set_contents_from_file(BytesIO(payload), md5=md5)
+
+    def get():
+        key.get_contents_to_file(NullWriter())
+
+    def ranged_get():
+        offset = (size - range_size) // 2
+        key.get_contents_to_file(NullWriter(), headers={
+            'Range': 'bytes=%d-%d' % (offset, offset + range_size - 1)})
+
+    def parallel_put():
+        bucket.new_key('multipart').set_contents_from_filename(
+            source_path, parallel=threads, part_size=part_size)
+
+    def parallel_get():
+        bucket.new_key('object').get_contents_to_filename(
+            target_path, parallel=threads, part_size=part_size)
+
+    def parallel_copy():
+        bucket.copy_key('copy', bucket.name, 'object', parallel=threads,
+                        part_size=part_size)
+
+    names = ['listing/%06d' % i for i in range(args.keys)]
+    for name in names:
+        bucket.new_key(name).set_contents_from_string('')
+
+    def list_keys(parallel=None):
+        listed = sum(1 for k in bucket.list(prefix='listing/',
+                                            parallel=parallel))
+        assert listed == len(names), listed
+
+    def populate():
+        for name in names:
+            bucket.new_key('delete/' + name).set_contents_from_string('')
+
+    def delete(parallel=None):
+        result = bucket.delete_keys(['delete/' + name for name in names],
+                                    quiet=True, parallel=parallel)
+        assert result.deleted_count == len(names), result.errors
+
+    return [
+        Case('put', put, nbytes=size),
+        Case('get', get, nbytes=size),
+        Case('ranged-get', ranged_get, nbytes=range_size),
+        Case('parallel-put', parallel_put, nbytes=size),
+        Case('parallel-get', parallel_get, nbytes=size),
+        Case('parallel-copy', parallel_copy, nbytes=size),
+        Case('list', list_keys, nobjects=len(names)),
+        Case('parallel-list', lambda: list_keys(threads),
+             nobjects=len(names)),
+        Case('delete', delete, nobjects=len(names), setup=populate),
+        Case('parallel-delete', lambda: delete(threads),
+             nobjects=len(names), setup=populate),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--size', type=int, default=32,
+                        help='Object size in MB.')
+    parser.add_argument('--keys', type=int, default=1000,
+                        help='Keys to list and delete.')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='Threads for the parallel paths.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Runs of each case.')
+    parser.add_argument('--cases', default=None,
+                        help='Comma separated cases to run; default all.')
+    args = parser.parse_args()
+
+    process, port = start_process()
+    tmpdir = tempfile.mkdtemp()
+    try:
+        conn = S3Connection('access_key', 'secret_key', host='127.0.0.1',
+                            port=port, is_secure=False,
+                            calling_format=OrdinaryCallingFormat())
+        bucket = conn.create_bucket('bench')
+        cases = build_cases(bucket, args, tmpdir)
+        if args.cases:
+            selected = args.cases.split(',')
+            cases = [case for case in cases if case.name in selected]
+        print('%-16s %9s %9s %9s %15s %14s' % ('case', 'p50 ms', 'p90 ms',
+                                               'p99 ms', 'rate', 'client CPU'))
+        for case in cases:
+            latencies, cpu = case.run(args.repeat)
+            report(case, latencies, cpu)
+    finally:
+        shutil.rmtree(tmpdir)
+        process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Measures the per-request cost of SigV4 signing.
+
+Signs the same DynamoDB-style request repeatedly, once with the derived
+signing key cache emptied before every request (the cost of deriving
+the key each time) and once with it left warm.
+
+    PYTHONPATH=. python benchmarks/sigv4_signing.py --requests 20000
+"""
+import argparse
+import copy
+import timeit
+
+from boto.auth import HmacAuthV4Handler, S3HmacAuthV4Handler
+from boto.connection import HTTPRequest
+from boto.provider import Provider
+
+
+def build_request(host):
+    body = '{"TableName": "bench", "Key": {"id": {"S": "1"}}}'
+    return HTTPRequest(
+        'POST', 'https', host, 443, '/', None, {},
+        {'X-Amz-Target': 'DynamoDB_20120810.GetItem',
+         'Content-Type': 'application/x-amz-json-1.0',
+         'Content-Length': str(len(body))}, body)
+
+
+def time_signing(handler, request, count, cold):
+    def sign():
+        if cold:
+            handler._clear_signing_keys()
+        handler.add_auth(copy.copy(request))
+    return min(timeit.repeat(sign, number=count, repeat=3)) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--requests', type=int, default=10000,
+                        help='Requests signed per timing run.')
+    args = parser.parse_args()
+
+    provider = Provider('aws', access_key='access_key',
+                        secret_key='secret_key')
+    cases = [
+        ('hmac-v4', HmacAuthV4Handler, 'dynamodb.us-east-1.amazonaws.com'),
+        ('hmac-v4-s3', S3HmacAuthV4Handler, 's3.amazonaws.com'),
+    ]
+    print('%-12s %14s %14s %8s' % ('handler', 'uncached (us)', 'cached (us)',
+                                   'saving'))
+    for name, handler_cls, host in cases:
+        handler = handler_cls(host, None, provider)
+        request = build_request(host)
+        cold = time_signing(handler, request, args.requests, True) * 1e6
+        warm = time_signing(handler, request, args.requests, False) * 1e6
+        print('%-12s %14.2f %14.2f %7.1f%%' % (name, cold, warm,
+                                               100 * (cold - warm) / cold))
+
+
+if __name__ == '__main__':
+    main()
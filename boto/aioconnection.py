@@ -0,0 +1,475 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+asyncio based connections to AWS.
+
+The classes in this module build, sign and parse requests exactly like
+their blocking counterparts in :py:mod:`boto.connection`, but all
+network I/O happens on an asyncio event loop so that many requests can
+be in flight from a single thread::
+
+    conn = AsyncAWSQueryConnection(host='ec2.us-east-1.amazonaws.com')
+    rs = loop.run_until_complete(conn.get_list('DescribeRegions', {},
+                                               [('item', RegionInfo)]))
+
+The HTTP layer is pluggable: pass any :py:class:`AsyncHTTPTransport`
+as the ``transport`` keyword argument.  The default
+:py:class:`StreamTransport` only needs the standard library.
+
+This module requires Python 3.5 or later.
+"""
+import asyncio
+import ssl
+from collections import deque
+from datetime import datetime
+
+import boto
+from boto import config
+from boto.compat import http_client, urlparse
+from boto.connection import AWSAuthConnection, AWSQueryConnection
+from boto.exception import BotoClientError
+from boto.exception import BotoServerError
+from boto.exception import PleaseRetryException
+from boto.retry import TRANSIENT, THROTTLING
+
+
+class AsyncHTTPResponse(object):
+    """
+    A completely read HTTP response.
+
+    This provides the subset of the ``http_client.HTTPResponse``
+    interface that boto uses, so responses can be handed to the
+    existing response parsing code unchanged.
+    """
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self._headers = headers
+        self.msg = http_client.HTTPMessage()
+        for name, value in headers:
+            self.msg[name] = value
+        self._body = body
+        self._offset = 0
+
+    def getheader(self, name, default=None):
+        return self.msg.get(name, default)
+
+    def getheaders(self):
+        return list(self._headers)
+
+    def read(self, amt=None):
+        """
+        Read the response body.  As with :py:class:`boto.connection.HTTPResponse`,
+        calling this with no ``amt`` always returns the whole body.
+        """
+        if amt is None:
+            return self._body
+        data = self._body[self._offset:self._offset + amt]
+        self._offset += len(data)
+        return data
+
+    def isclosed(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class AsyncHTTPTransport(object):
+    """
+    Interface for the HTTP layer used by :py:class:`AsyncAWSAuthConnection`.
+
+    Implementations must be usable from a running event loop and return
+    an :py:class:`AsyncHTTPResponse` (or an object with the same
+    interface) whose body has been read.
+    """
+
+    async def request(self, host, port, is_secure, method, path, body,
+                      headers):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class StreamTransport(AsyncHTTPTransport):
+    """
+    HTTP/1.1 transport built on ``asyncio.open_connection``.
+
+    Idle connections are kept per (host,port,is_secure) and reused
+    while the server allows keep-alive.
+    """
+
+    def __init__(self, ssl_context=None, timeout=None, max_idle=10):
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = {}
+
+    async def request(self, host, port, is_secure, method, path, body,
+                      headers):
+        coro = self._request(host, port, is_secure, method, path, body,
+                             headers)
+        if self.timeout is not None:
+            return await asyncio.wait_for(coro, self.timeout)
+        return await coro
+
+    async def _request(self, host, port, is_secure, method, path, body,
+                       headers):
+        key = (host, port, is_secure)
+        reader, writer = await self._get_stream(key)
+        try:
+            writer.write(self._build_request(key, method, path, body,
+                                             headers))
+            await writer.drain()
+            response, reusable = await self._read_response(reader, method)
+        except BaseException:
+            writer.close()
+            raise
+        idle = self._idle.setdefault(key, deque())
+        if reusable and len(idle) < self.max_idle:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+        return response
+
+    async def _get_stream(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.popleft()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        host, port, is_secure = key
+        if is_secure:
+            context = self.ssl_context or ssl.create_default_context()
+            return await asyncio.open_connection(host, port, ssl=context,
+                                                 server_hostname=host)
+        return await asyncio.open_connection(host, port)
+
+    def _build_request(self, key, method, path, body, headers):
+        host, port, is_secure = key
+        if isinstance(body, str):
+            # Same default encoding as http_client.
+            body = body.encode('iso-8859-1')
+        lines = ['%s %s HTTP/1.1' % (method, path)]
+        names = set(name.lower() for name in headers)
+        if 'host' not in names:
+            if port in (None, 443 if is_secure else 80):
+                lines.append('Host: %s' % host)
+            else:
+                lines.append('Host: %s:%s' % (host, port))
+        if 'accept-encoding' not in names:
+            lines.append('Accept-Encoding: identity')
+        if body and 'content-length' not in names and \
+                'transfer-encoding' not in names:
+            lines.append('Content-Length: %d' % len(body))
+        for name, value in headers.items():
+            lines.append('%s: %s' % (name, value))
+        head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        return head + (body or b'')
+
+    async def _read_response(self, reader, method):
+        status_line = await reader.readline()
+        if not status_line:
+            raise http_client.BadStatusLine(repr(status_line))
+        parts = status_line.decode('latin-1').rstrip('\r\n').split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise http_client.BadStatusLine(repr(status_line))
+        version, status = parts[0], int(parts[1])
+        reason = parts[2] if len(parts) > 2 else ''
+        headers = []
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers.append((name.strip(), value.strip()))
+        fields = dict((name.lower(), value) for name, value in headers)
+
+        reusable = version == 'HTTP/1.1' and \
+            fields.get('connection', '').lower() != 'close'
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif fields.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(reader)
+        elif 'content-length' in fields:
+            body = await reader.readexactly(int(fields['content-length']))
+        else:
+            body = await reader.read()
+            reusable = False
+        return AsyncHTTPResponse(status, reason, headers, body), reusable
+
+    async def _read_chunked(self, reader):
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # Skip any trailers.
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+    async def close(self):
+        for idle in self._idle.values():
+            while idle:
+                reader, writer = idle.popleft()
+                writer.close()
+        self._idle = {}
+
+
+class AsyncAWSAuthConnection(AWSAuthConnection):
+    """
+    An :py:class:`boto.connection.AWSAuthConnection` whose
+    ``make_request`` is a coroutine.
+
+    Takes the same arguments as ``AWSAuthConnection`` plus an optional
+    ``transport``.  Requests are retried (using the connection's
+    ``retry_policy``) and redirects followed with the same rules as the
+    blocking ``_mexe``, sleeping with ``asyncio.sleep`` instead of
+    blocking the thread.  HTTPS requests
+    through a proxy are not supported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        transport = kwargs.pop('transport', None)
+        super(AsyncAWSAuthConnection, self).__init__(*args, **kwargs)
+        self.async_http_exceptions = (http_client.HTTPException, OSError,
+                                      EOFError, asyncio.TimeoutError)
+        self.async_unretryable_exceptions = (ssl.CertificateError,)
+        if transport is None:
+            ssl_context = None
+            if self.is_secure:
+                ssl_context = self._build_ssl_context()
+            transport = StreamTransport(
+                ssl_context=ssl_context,
+                timeout=self.http_connection_kwargs.get('timeout'))
+        self.transport = transport
+
+    def _build_ssl_context(self):
+        if self.https_validate_certificates:
+            return ssl.create_default_context(
+                cafile=self.ca_certificates_file)
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        return context
+
+    def _connect_address(self, host, port, is_secure):
+        # Make sure the host is really just the host, not including
+        # the port number
+        host = host.split(':', 1)[0]
+        if self.use_proxy and not self.skip_proxy(host):
+            if is_secure:
+                raise BotoClientError(
+                    'HTTPS requests through a proxy are not supported '
+                    'by %s' % self.__class__.__name__)
+            return self.proxy, int(self.proxy_port)
+        return host, int(port)
+
+    async def _mexe(self, request, override_num_retries=None,
+                    retry_handler=None):
+        """
+        Coroutine version of
+        :py:meth:`boto.connection.AWSAuthConnection._mexe`.
+        """
+        boto.log.debug('Method: %s' % request.method)
+        boto.log.debug('Path: %s' % request.path)
+        boto.log.debug('Data: %s' % request.body)
+        boto.log.debug('Headers: %s' % request.headers)
+        boto.log.debug('Host: %s' % request.host)
+        boto.log.debug('Port: %s' % request.port)
+        boto.log.debug('Params: %s' % request.params)
+        response = None
+        body = None
+        error = None
+        if override_num_retries is None:
+            num_retries = config.getint('Boto', 'num_retries', self.num_retries)
+        else:
+            num_retries = override_num_retries
+        i = 0
+        is_secure = self.is_secure
+
+        # Convert body to bytes if needed
+        if not isinstance(request.body, bytes) and hasattr(request.body,
+                                                           'encode'):
+            request.body = request.body.encode('utf-8')
+
+        policy = self.retry_policy
+        next_sleep = None
+        while i <= num_retries:
+            # Use exponential backoff to desynchronize client requests.
+            next_sleep = policy.delay(i, next_sleep)
+            retry_kind = None
+            try:
+                policy.record_attempt()
+                # we now re-sign each request before it is retried
+                request.authorize(connection=self)
+                if 's3' not in self._required_auth_capability():
+                    if not getattr(self, 'anon', False):
+                        self.set_host_header(request)
+                boto.log.debug('Final headers: %s' % request.headers)
+                request.start_time = datetime.now()
+                host, port = self._connect_address(request.host,
+                                                   request.port, is_secure)
+                response = await self.transport.request(
+                    host, port, is_secure, request.method, request.path,
+                    request.body, request.headers)
+                boto.log.debug('Response headers: %s' % response.getheaders())
+                location = response.getheader('location')
+                if callable(retry_handler):
+                    status = retry_handler(response, i, next_sleep)
+                    if status:
+                        msg, i, next_sleep = status
+                        if msg:
+                            boto.log.debug(msg)
+                        if not policy.should_retry(THROTTLING):
+                            body = response.read()
+                            break
+                        policy.record_sleep(next_sleep)
+                        await asyncio.sleep(next_sleep)
+                        continue
+                retry_kind = policy.classify_response(response)
+                if retry_kind:
+                    msg = 'Received %d response.  ' % response.status
+                    msg += 'Retrying in %3.1f seconds' % next_sleep
+                    boto.log.debug(msg)
+                    body = response.read()
+                    if isinstance(body, bytes):
+                        body = body.decode('utf-8')
+                elif response.status < 300 or response.status >= 400 or \
+                        not location:
+                    if self.request_hook is not None:
+                        self.request_hook.handle_request_data(request, response)
+                    policy.record_success()
+                    return response
+                else:
+                    scheme, request.host, request.path, \
+                        params, query, fragment = urlparse(location)
+                    if query:
+                        request.path += '?' + query
+                    # urlparse can return both host and port in netloc, so if
+                    # that's the case we need to split them up properly
+                    if ':' in request.host:
+                        request.host, request.port = request.host.split(':', 1)
+                    is_secure = scheme == 'https'
+                    msg = 'Redirecting: %s' % scheme + '://'
+                    msg += request.host + request.path
+                    boto.log.debug(msg)
+                    response = None
+                    continue
+            except PleaseRetryException as e:
+                boto.log.debug('encountered a retry exception: %s' % e)
+                response = e.response
+                retry_kind = TRANSIENT
+            except self.async_unretryable_exceptions as e:
+                boto.log.debug(
+                    'encountered unretryable %s exception, re-raising' %
+                    e.__class__.__name__)
+                raise
+            except self.async_http_exceptions as e:
+                boto.log.debug('encountered %s exception, retrying' %
+                               e.__class__.__name__)
+                retry_kind = policy.classify_exception(e)
+                error = e
+            i += 1
+            if i > num_retries or not policy.should_retry(retry_kind):
+                break
+            policy.record_sleep(next_sleep)
+            await asyncio.sleep(next_sleep)
+        # If we made it here, it's because we have exhausted our retries
+        # and stil haven't succeeded.  So, if we have a response object,
+        # use it to raise an exception.
+        # Otherwise, raise the exception that must have already happened.
+        if self.request_hook is not None:
+            self.request_hook.handle_request_data(request, response, error=True)
+        if response:
+            raise BotoServerError(response.status, response.reason, body)
+        elif error:
+            raise error
+        else:
+            msg = 'Please report this exception as a Boto Issue!'
+            raise BotoClientError(msg)
+
+    async def make_request(self, method, path, headers=None, data='',
+                           host=None, auth_path=None,
+                           override_num_retries=None, params=None,
+                           retry_handler=None):
+        """Makes a request to the server, with stock multiple-retry logic."""
+        if params is None:
+            params = {}
+        http_request = self.build_base_http_request(method, path, auth_path,
+                                                    params, headers, data, host)
+        return await self._mexe(http_request, override_num_retries,
+                                retry_handler=retry_handler)
+
+    async def close(self):
+        """Close any idle connections held by the transport."""
+        boto.log.debug('closing all HTTP connections')
+        self._connection = None  # compat field
+        await self.transport.close()
+
+
+class AsyncAWSQueryConnection(AsyncAWSAuthConnection, AWSQueryConnection):
+    """
+    Coroutine version of :py:class:`boto.connection.AWSQueryConnection`.
+
+    ``make_request``, ``get_list``, ``get_object`` and ``get_status``
+    are coroutines returning the same values as their blocking
+    counterparts.
+    """
+
+    async def make_request(self, action, params=None, path='/', verb='GET'):
+        http_request = self.build_base_http_request(verb, path, None,
+                                                    params, {}, '',
+                                                    self.host)
+        if action:
+            http_request.params['Action'] = action
+        if self.APIVersion:
+            http_request.params['Version'] = self.APIVersion
+        return await self._mexe(http_request)
+
+    async def get_list(self, action, params, markers, path='/',
+                       parent=None, verb='GET'):
+        if not parent:
+            parent = self
+        response = await self.make_request(action, params, path, verb)
+        return self._parse_list_response(response, markers, parent)
+
+    async def get_object(self, action, params, cls, path='/',
+                         parent=None, verb='GET'):
+        if not parent:
+            parent = self
+        response = await self.make_request(action, params, path, verb)
+        return self._parse_object_response(response, cls, parent)
+
+    async def get_status(self, action, params, path='/', parent=None,
+                         verb='GET'):
+        if not parent:
+            parent = self
+        response = await self.make_request(action, params, path, verb)
+        return self._parse_status_response(response, parent)
@@ -287,6 +287,10 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
 
     capability = ['hmac-v4']
 
+    # The most derived signing keys to keep.  A key is only good for one
+    # date/region/service, so a handful covers any single connection.
+    SIGNING_KEY_CACHE_SIZE = 16
+
     def __init__(self, host, config, provider,
                  service_name=None, region_name=None):
         AuthHandler.__init__(self, host, config, provider)
@@ -297,6 +301,42 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
         self.service_name = service_name
         self.region_name = region_name
 
+    def update_provider(self, provider):
+        super(HmacAuthV4Handler, self).update_provider(provider)
+        self._clear_signing_keys()
+
+    def _clear_signing_keys(self):
+        self._signing_keys = {}
+        self._signing_keys_secret = None
+
+    def signing_key(self, timestamp, region_name, service_name):
+        """
+        Returns the SigV4 signing key for the given date (YYYYMMDD),
+        region and service.
+
+        Deriving the key takes four HMAC-SHA256 rounds, but the result
+        only changes once a day (or when the credentials change), so
+        derived keys are cached.  The cache is emptied whenever the
+        secret key differs from the one the cached keys were derived
+        from, e.g. after temporary credentials are refreshed.
+        """
+        secret_key = self._provider.secret_key
+        if secret_key != self._signing_keys_secret:
+            self._signing_keys = {}
+            self._signing_keys_secret = secret_key
+        cache_key = (timestamp, region_name, service_name)
+        k_signing = self._signing_keys.get(cache_key)
+        if k_signing is None:
+            k_date = self._sign(('AWS4' + secret_key).encode('utf-8'),
+                                timestamp)
+            k_region = self._sign(k_date, region_name)
+            k_service = self._sign(k_region, service_name)
+            k_signing = self._sign(k_service, 'aws4_request')
+            if len(self._signing_keys) >= self.SIGNING_KEY_CACHE_SIZE:
+                self._signing_keys = {}
+            self._signing_keys[cache_key] = k_signing
+        return k_signing
+
     def _sign(self, key, msg, hex=False):
         if not isinstance(key, bytes):
             key = key.encode('utf-8')
@@ -470,12 +510,9 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
         return '\n'.join(sts)
 
     def signature(self, http_request, string_to_sign):
-        key = self._provider.secret_key
-        k_date = self._sign(('AWS4' + key).encode('utf-8'),
-                              http_request.timestamp)
-        k_region = self._sign(k_date, http_request.region_name)
-        k_service = self._sign(k_region, http_request.service_name)
-        k_signing = self._sign(k_service, 'aws4_request')
+        k_signing = self.signing_key(http_request.timestamp,
+                                     http_request.region_name,
+                                     http_request.service_name)
         return self._sign(k_signing, string_to_sign, hex=True)
 
     def add_auth(self, req, **kwargs):
@@ -527,6 +564,13 @@ class S3HmacAuthV4Handler(HmacAuthV4Handler, AuthHandler):
     """
     capability = ['hmac-v4-s3']
 
+    # Values of ``x-amz-content-sha256`` that stand in for the hash of the
+    # whole payload.
+    STREAMING_PAYLOAD = 'STREAMING-AWS4-HMAC-SHA256-PAYLOAD'
+    UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+    EMPTY_SHA256 = ('e3b0c44298fc1c149afbf4c8996fb924'
+                    '27ae41e4649b934ca495991b7852b855')
+
     def __init__(self, *args, **kwargs):
         super(S3HmacAuthV4Handler, self).__init__(*args, **kwargs)
 
@@ -674,6 +718,34 @@ class S3HmacAuthV4Handler(HmacAuthV4Handler, AuthHandler):
         req = self.mangle_path_and_params(req)
         return super(S3HmacAuthV4Handler, self).add_auth(req, **kwargs)
 
+    def chunk_signer(self, headers):
+        """
+        Returns a function that signs the chunks of a
+        ``STREAMING-AWS4-HMAC-SHA256-PAYLOAD`` body, one after another.
+
+        ``headers`` are the headers of the already signed request; the
+        signature of the first chunk is chained to the request signature
+        and every following one to the signature of the chunk before it.
+
+        http://docs.aws.amazon.com/AmazonS3/latest/API/sigv4-streaming.html
+        """
+        auth = headers['Authorization'].split(' ', 1)[1]
+        fields = dict(field.split('=', 1) for field in auth.split(','))
+        scope = fields['Credential'].split('/', 1)[1]
+        timestamp, region_name, service_name = scope.split('/')[:3]
+        k_signing = self.signing_key(timestamp, region_name, service_name)
+        prefix = '\n'.join(['AWS4-HMAC-SHA256-PAYLOAD',
+                            headers['X-Amz-Date'], scope])
+        previous = [fields['Signature']]
+
+        def sign(chunk):
+            sts = '\n'.join([prefix, previous[0], self.EMPTY_SHA256,
+                             sha256(chunk).hexdigest()])
+            previous[0] = self._sign(k_signing, sts, hex=True)
+            return previous[0]
+
+        return sign
+
     def presign(self, req, expires, iso_date=None):
         """
         Presign a request using SigV4 query params. Takes in an HTTP request
@@ -45,13 +45,13 @@ Handles basic connections to AWS
 from datetime import datetime
 import errno
 import os
-import random
 import re
 import socket
 import sys
 import time
 import xml.sax
 import copy
+from collections import deque
 
 from boto import auth
 from boto import auth_handler
@@ -68,6 +68,7 @@ from boto.exception import BotoServerError
 from boto.exception import PleaseRetryException
 from boto.provider import Provider
 from boto.resultset import ResultSet
+from boto.retry import RetryPolicy, TRANSIENT, THROTTLING
 
 HAVE_HTTPS_CONNECTION = False
 try:
@@ -99,19 +100,23 @@ class HostConnectionPool(object):
     A pool of connections for one remote (host,port,is_secure).
 
     When connections are added to the pool, they are put into a
-    pending queue.  The _mexe method returns connections to the pool
-    before the response body has been read, so they connections aren't
-    ready to send another request yet.  They stay in the pending queue
-    until they are ready for another request, at which point they are
-    returned to the pool of ready connections.
-
-    The pool of ready connections is an ordered list of
-    (connection,time) pairs, where the time is the time the connection
-    was returned from _mexe.  After a certain period of time,
-    connections are considered stale, and discarded rather than being
-    reused.  This saves having to wait for the connection to time out
-    if AWS has decided to close it on the other end because of
-    inactivity.
+    ready queue.  The _mexe method returns connections to the pool
+    before the response body has been read, so the connections aren't
+    necessarily ready to send another request yet.  A connection that
+    is found to still be in use when checked out is moved to the
+    pending queue, where it stays until it is ready for another
+    request, at which point it is handed out again.
+
+    Both queues are deques of (connection,time) pairs ordered by the
+    time the connection was returned from _mexe (or last found busy),
+    so checking out, returning and expiring a connection are all O(1)
+    operations.  After a certain period of time, connections are
+    considered stale, and discarded rather than being reused.  This
+    saves having to wait for the connection to time out if AWS has
+    decided to close it on the other end because of inactivity.
+
+    If ``max_size`` is set, putting a connection into a full pool
+    evicts the oldest connection held by the pool.
 
     Thread Safety:
 
@@ -119,8 +124,13 @@ class HostConnectionPool(object):
         is held.
     """
 
-    def __init__(self):
-        self.queue = []
+    def __init__(self, max_size=None):
+        self.queue = deque()
+        self.pending = deque()
+        self.max_size = max_size
+        # Number of connections handed out (or that callers were told
+        # to create) which have not been put back or released yet.
+        self.checked_out = 0
 
     def size(self):
         """
@@ -128,14 +138,21 @@ class HostConnectionPool(object):
         Some of the connections may still be in use, and may not be
         ready to be returned by get().
         """
-        return len(self.queue)
+        return len(self.queue) + len(self.pending)
 
     def put(self, conn):
         """
         Adds a connection to the pool, along with the time it was
-        added.
+        added.  Returns the number of connections evicted to make room
+        for it.
         """
+        evicted = 0
+        if self.max_size is not None:
+            while self.size() and self.size() >= self.max_size:
+                self._evict()
+                evicted += 1
         self.queue.append((conn, time.time()))
+        return evicted
 
     def get(self):
         """
@@ -146,17 +163,38 @@ class HostConnectionPool(object):
         self.clean()
 
         # Return the first connection that is ready, and remove it
-        # from the queue.  Connections that aren't ready are returned
-        # to the end of the queue with an updated time, on the
-        # assumption that somebody is actively reading the response.
-        for _ in range(len(self.queue)):
-            (conn, _) = self.queue.pop(0)
+        # from the queue.  Connections that aren't ready are moved to
+        # the pending queue with an updated time, on the assumption
+        # that somebody is actively reading the response.  Each
+        # returned connection is inspected here at most once.
+        while self.queue:
+            (conn, _) = self.queue.popleft()
             if self._conn_ready(conn):
                 return conn
-            else:
-                self.put(conn)
+            self.pending.append((conn, time.time()))
+
+        # Give the longest-waiting pending connection another chance.
+        if self.pending:
+            (conn, _) = self.pending.popleft()
+            if self._conn_ready(conn):
+                return conn
+            self.pending.append((conn, time.time()))
         return None
 
+    def _evict(self):
+        """
+        Drops the oldest connection held by the pool, preferring idle
+        connections over ones that are still being read from.
+        """
+        if self.queue:
+            (conn, _) = self.queue.popleft()
+        else:
+            (conn, _) = self.pending.popleft()
+        # Only close idle connections -- somebody may still be reading
+        # from the others.
+        if self._conn_ready(conn):
+            conn.close()
+
     def _conn_ready(self, conn):
         """
         There is a nice state diagram at the top of http_client.py.  It
@@ -186,8 +224,9 @@ class HostConnectionPool(object):
         """
         # Note that we do not close the connection here -- somebody
         # may still be reading from it.
-        while len(self.queue) > 0 and self._pair_stale(self.queue[0]):
-            self.queue.pop(0)
+        for queue in (self.queue, self.pending):
+            while len(queue) > 0 and self._pair_stale(queue[0]):
+                queue.popleft()
 
     def _pair_stale(self, pair):
         """
@@ -206,6 +245,17 @@ class ConnectionPool(object):
     time.  This saves time spent waiting for a connection that AWS has
     timed out on the other end.
 
+    The number of connections per (host,port,is_secure) can be bounded
+    with ``max_size``.  When ``block`` is False (the default) callers
+    are still allowed to open extra connections once the limit is
+    reached, but the pool never holds on to more than ``max_size`` of
+    them.  When ``block`` is True, checking out a connection from a
+    host whose connections are all in use waits (up to ``timeout``
+    seconds) for one to be returned.
+
+    Counters of pool ``hits``, ``misses``, ``evictions`` and ``waits``
+    are kept for all hosts; see ``stats``.
+
     This class is thread-safe.
     """
 
@@ -228,25 +278,49 @@ class ConnectionPool(object):
 
     STALE_DURATION = 60.0
 
-    def __init__(self):
+    #
+    # How often a blocked checkout re-examines the connections whose
+    # responses are still being read.  Callers finishing a read do not
+    # notify the pool, so waiters have to poll for them.
+    #
+
+    WAIT_INTERVAL = 0.05
+
+    def __init__(self, max_size=None, block=None, timeout=None):
         # Mapping from (host,port,is_secure) to HostConnectionPool.
         # If a pool becomes empty, it is removed.
         self.host_to_pool = {}
         # The last time the pool was cleaned.
         self.last_clean_time = 0.0
         self.mutex = threading.Lock()
+        self.condition = threading.Condition(self.mutex)
         ConnectionPool.STALE_DURATION = \
             config.getfloat('Boto', 'connection_stale_duration',
                             ConnectionPool.STALE_DURATION)
+        if max_size is None:
+            max_size = config.getint('Boto', 'connection_pool_max_size', 0)
+        self.max_size = max_size or None
+        if block is None:
+            block = config.getbool('Boto', 'connection_pool_block', False)
+        self.block = block
+        if timeout is None:
+            timeout = config.getfloat('Boto', 'connection_pool_timeout', 0)
+        self.timeout = timeout or None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.waits = 0
 
     def __getstate__(self):
         pickled_dict = copy.copy(self.__dict__)
         pickled_dict['host_to_pool'] = {}
         del pickled_dict['mutex']
+        del pickled_dict['condition']
         return pickled_dict
 
     def __setstate__(self, dct):
-        self.__init__()
+        self.__init__(dct.get('max_size'), dct.get('block'),
+                      dct.get('timeout'))
 
     def size(self):
         """
@@ -254,30 +328,96 @@ class ConnectionPool(object):
         """
         return sum(pool.size() for pool in self.host_to_pool.values())
 
+    def stats(self):
+        """
+        Returns a dict with the pool counters and the number of
+        connections currently held and checked out.
+        """
+        with self.mutex:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'waits': self.waits,
+                'size': self.size(),
+                'checked_out': sum(pool.checked_out for pool in
+                                   self.host_to_pool.values()),
+            }
+
+    def _get_pool(self, key):
+        if key not in self.host_to_pool:
+            self.host_to_pool[key] = HostConnectionPool(self.max_size)
+        return self.host_to_pool[key]
+
+    def _is_full(self, pool):
+        return (self.max_size is not None and
+                pool.checked_out + pool.size() >= self.max_size)
+
     def get_http_connection(self, host, port, is_secure):
         """
         Gets a connection from the pool for the named host.  Returns
         None if there is no connection that can be reused. It's the caller's
         responsibility to call close() on the connection when it's no longer
         needed.
+
+        Every connection handed out, and every None returned, counts
+        against the host's ``max_size`` until the connection is given
+        back with ``put_http_connection`` or ``release_http_connection``.
         """
         self.clean()
         with self.mutex:
-            key = (host, port, is_secure)
-            if key not in self.host_to_pool:
-                return None
-            return self.host_to_pool[key].get()
+            pool = self._get_pool((host, port, is_secure))
+            waited = False
+            deadline = None
+            if self.timeout is not None:
+                deadline = time.time() + self.timeout
+            while True:
+                conn = pool.get()
+                if conn is not None:
+                    pool.checked_out += 1
+                    self.hits += 1
+                    return conn
+                if not self.block or not self._is_full(pool):
+                    break
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                wait_time = self.WAIT_INTERVAL
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise AWSConnectionError(
+                            'Timed out waiting for a connection to %s:%s '
+                            '(max_size=%s)' % (host, port, self.max_size))
+                    wait_time = min(wait_time, remaining)
+                self.condition.wait(wait_time)
+            pool.checked_out += 1
+            self.misses += 1
+            return None
 
     def put_http_connection(self, host, port, is_secure, conn):
         """
         Adds a connection to the pool of connections that can be
         reused for the named host.
         """
+        with self.mutex:
+            pool = self._get_pool((host, port, is_secure))
+            pool.checked_out = max(pool.checked_out - 1, 0)
+            self.evictions += pool.put(conn)
+            self.condition.notify()
+
+    def release_http_connection(self, host, port, is_secure):
+        """
+        Tells the pool that a connection checked out for the named host
+        has been closed or abandoned rather than put back, so that it no
+        longer counts against the host's ``max_size``.
+        """
         with self.mutex:
             key = (host, port, is_secure)
-            if key not in self.host_to_pool:
-                self.host_to_pool[key] = HostConnectionPool()
-            self.host_to_pool[key].put(conn)
+            if key in self.host_to_pool:
+                pool = self.host_to_pool[key]
+                pool.checked_out = max(pool.checked_out - 1, 0)
+                self.condition.notify()
 
     def clean(self):
         """
@@ -293,7 +433,7 @@ class ConnectionPool(object):
                 to_remove = []
                 for (host, pool) in self.host_to_pool.items():
                     pool.clean()
-                    if pool.size() == 0:
+                    if pool.size() == 0 and pool.checked_out == 0:
                         to_remove.append(host)
                 for host in to_remove:
                     del self.host_to_pool[host]
@@ -472,6 +612,9 @@ class AWSAuthConnection(object):
         """
         self.suppress_consec_slashes = suppress_consec_slashes
         self.num_retries = 6
+        # Decides which failures _mexe retries and how long it backs off.
+        # It is shared by every request made through this connection.
+        self.retry_policy = RetryPolicy.from_config()
         # Override passed-in is_secure setting if value was defined in config.
         if config.has_option('Boto', 'is_secure'):
             is_secure = config.getboolean('Boto', 'is_secure')
@@ -779,6 +922,9 @@ class AWSAuthConnection(object):
     def put_http_connection(self, host, port, is_secure, connection):
         self._pool.put_http_connection(host, port, is_secure, connection)
 
+    def release_http_connection(self, host, port, is_secure):
+        self._pool.release_http_connection(host, port, is_secure)
+
     def proxy_ssl(self, host=None, port=None):
         if host and port:
             host = '%s:%d' % (host, port)
@@ -887,25 +1033,28 @@ class AWSAuthConnection(object):
         boto.log.debug('Params: %s' % request.params)
         response = None
         body = None
-        e = None
+        error = None
         if override_num_retries is None:
             num_retries = config.getint('Boto', 'num_retries', self.num_retries)
         else:
             num_retries = override_num_retries
         i = 0
-        connection = self.get_http_connection(request.host, request.port,
-                                              self.is_secure)
+        connection_key = (request.host, request.port, self.is_secure)
+        connection = self.get_http_connection(*connection_key)
 
         # Convert body to bytes if needed
         if not isinstance(request.body, bytes) and hasattr(request.body,
                                                            'encode'):
             request.body = request.body.encode('utf-8')
 
+        policy = self.retry_policy
+        next_sleep = None
         while i <= num_retries:
-            # Use binary exponential backoff to desynchronize client requests.
-            next_sleep = min(random.random() * (2 ** i),
-                             boto.config.get('Boto', 'max_retry_delay', 60))
+            # Use exponential backoff to desynchronize client requests.
+            next_sleep = policy.delay(i, next_sleep)
+            retry_kind = None
             try:
+                policy.record_attempt()
                 # we now re-sign each request before it is retried
                 boto.log.debug('Token: %s' % self.provider.security_token)
                 request.authorize(connection=self)
@@ -939,9 +1088,13 @@ class AWSAuthConnection(object):
                         msg, i, next_sleep = status
                         if msg:
                             boto.log.debug(msg)
-                        time.sleep(next_sleep)
+                        if not policy.should_retry(THROTTLING):
+                            body = response.read()
+                            break
+                        policy.sleep(next_sleep)
                         continue
-                if response.status in [500, 502, 503, 504]:
+                retry_kind = policy.classify_response(response)
+                if retry_kind:
                     msg = 'Received %d response.  ' % response.status
                     msg += 'Retrying in %3.1f seconds' % next_sleep
                     boto.log.debug(msg)
@@ -958,11 +1111,13 @@ class AWSAuthConnection(object):
                     conn_header_value = response.getheader('connection')
                     if conn_header_value == 'close':
                         connection.close()
+                        self.release_http_connection(*connection_key)
                     else:
-                        self.put_http_connection(request.host, request.port,
-                                                 self.is_secure, connection)
+                        self.put_http_connection(*(connection_key +
+                                                   (connection,)))
                     if self.request_hook is not None:
                         self.request_hook.handle_request_data(request, response)
+                    policy.record_success()
                     return response
                 else:
                     scheme, request.host, request.path, \
@@ -976,9 +1131,10 @@ class AWSAuthConnection(object):
                     msg = 'Redirecting: %s' % scheme + '://'
                     msg += request.host + request.path
                     boto.log.debug(msg)
-                    connection = self.get_http_connection(request.host,
-                                                          request.port,
-                                                          scheme == 'https')
+                    self.release_http_connection(*connection_key)
+                    connection_key = (request.host, request.port,
+                                      scheme == 'https')
+                    connection = self.get_http_connection(*connection_key)
                     response = None
                     continue
             except PleaseRetryException as e:
@@ -986,29 +1142,36 @@ class AWSAuthConnection(object):
                 connection = self.new_http_connection(request.host, request.port,
                                                       self.is_secure)
                 response = e.response
+                retry_kind = TRANSIENT
             except self.http_exceptions as e:
                 for unretryable in self.http_unretryable_exceptions:
                     if isinstance(e, unretryable):
                         boto.log.debug(
                             'encountered unretryable %s exception, re-raising' %
                             e.__class__.__name__)
+                        self.release_http_connection(*connection_key)
                         raise
                 boto.log.debug('encountered %s exception, reconnecting' % \
                                   e.__class__.__name__)
                 connection = self.new_http_connection(request.host, request.port,
                                                       self.is_secure)
-            time.sleep(next_sleep)
+                retry_kind = policy.classify_exception(e)
+                error = e
             i += 1
+            if i > num_retries or not policy.should_retry(retry_kind):
+                break
+            policy.sleep(next_sleep)
         # If we made it here, it's because we have exhausted our retries
         # and stil haven't succeeded.  So, if we have a response object,
         # use it to raise an exception.
         # Otherwise, raise the exception that must have already happened.
+        self.release_http_connection(*connection_key)
         if self.request_hook is not None:
             self.request_hook.handle_request_data(request, response, error=True)
         if response:
             raise BotoServerError(response.status, response.reason, body)
-        elif e:
-            raise
+        elif error:
+            raise error
         else:
             msg = 'Please report this exception as a Boto Issue!'
             raise BotoClientError(msg)
@@ -1148,6 +1311,31 @@ class AWSQueryConnection(AWSAuthConnection):
         if not parent:
             parent = self
         response = self.make_request(action, params, path, verb)
+        return self._parse_list_response(response, markers, parent)
+
+    def iter_list(self, action, params, result_set, path='/',
+                  parent=None, verb='GET'):
+        """
+        Like ``get_list``, but returns an iterator that yields the items
+        of the list while the response is still being read and parsed.
+
+        :type result_set: :py:class:`boto.resultset.ResultSet`
+        :param result_set: An empty result set built with the markers
+            ``get_list`` would take.  The items are not added to it, but
+            its other fields, such as ``next_token``, are set once the
+            iterator is exhausted.
+        """
+        if not parent:
+            parent = self
+        response = self.make_request(action, params, path, verb)
+        if response.status != 200:
+            body = response.read()
+            boto.log.error('%s %s' % (response.status, response.reason))
+            boto.log.error('%s' % body)
+            raise self.ResponseError(response.status, response.reason, body)
+        return boto.handler.XmlStreamParser(result_set, parent).parse(response)
+
+    def _parse_list_response(self, response, markers, parent):
         body = response.read()
         boto.log.debug(body)
         if not body:
@@ -1170,6 +1358,9 @@ class AWSQueryConnection(AWSAuthConnection):
         if not parent:
             parent = self
         response = self.make_request(action, params, path, verb)
+        return self._parse_object_response(response, cls, parent)
+
+    def _parse_object_response(self, response, cls, parent):
         body = response.read()
         boto.log.debug(body)
         if not body:
@@ -1191,6 +1382,9 @@ class AWSQueryConnection(AWSAuthConnection):
         if not parent:
             parent = self
         response = self.make_request(action, params, path, verb)
+        return self._parse_status_response(response, parent)
+
+    def _parse_status_response(self, response, parent):
         body = response.read()
         boto.log.debug(body)
         if not body:
@@ -29,6 +29,7 @@ from boto.exception import DynamoDBResponseError
 from boto.provider import Provider
 from boto.dynamodb import exceptions as dynamodb_exceptions
 from boto.compat import json
+from boto.retry import RetryPolicy
 
 
 class Layer1(AWSAuthConnection):
@@ -91,6 +92,10 @@ class Layer1(AWSAuthConnection):
                                    debug=debug, security_token=security_token,
                                    validate_certs=validate_certs,
                                    profile_name=profile_name)
+        # DynamoDB throttles aggressively, so back off from a much
+        # shorter first delay than other services.
+        self.retry_policy = RetryPolicy.from_config(jitter='none',
+                                                    base_delay=0.05)
         self.throughput_exceeded_events = 0
         self._validate_checksums = boto.config.getbool(
             'DynamoDB', 'validate_checksums', validate_checksums)
@@ -170,12 +175,7 @@ class Layer1(AWSAuthConnection):
         return status
 
     def _exponential_time(self, i):
-        if i == 0:
-            next_sleep = 0
-        else:
-            next_sleep = min(0.05 * (2 ** i),
-                             boto.config.get('Boto', 'max_retry_delay', 60))
-        return next_sleep
+        return self.retry_policy.delay(i)
 
     def list_tables(self, limit=None, start_table=None):
         """
@@ -31,6 +31,7 @@ from boto.connection import AWSQueryConnection
 from boto.regioninfo import RegionInfo
 from boto.exception import JSONResponseError
 from boto.dynamodb2 import exceptions
+from boto.retry import RetryPolicy
 
 
 class DynamoDBConnection(AWSQueryConnection):
@@ -182,6 +183,10 @@ class DynamoDBConnection(AWSQueryConnection):
 
         super(DynamoDBConnection, self).__init__(**kwargs)
         self.region = region
+        # DynamoDB throttles aggressively, so back off from a much
+        # shorter first delay than other services.
+        self.retry_policy = RetryPolicy.from_config(jitter='none',
+                                                    base_delay=0.05)
         self._validate_checksums = boto.config.getbool(
             'DynamoDB', 'validate_checksums', validate_checksums)
         self.throughput_exceeded_events = 0
@@ -2154,9 +2159,4 @@ class DynamoDBConnection(AWSQueryConnection):
         return status
 
     def _truncated_exponential_time(self, i):
-        if i == 0:
-            next_sleep = 0
-        else:
-            next_sleep = min(0.05 * (2 ** i),
-                             boto.config.get('Boto', 'max_retry_delay', 60))
-        return next_sleep
+        return self.retry_policy.delay(i)
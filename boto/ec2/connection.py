@@ -660,6 +660,41 @@ class EC2Connection(AWSQueryConnection):
         :rtype: list
         :return: A list of  :class:`boto.ec2.instance.Reservation`
         """
+        params = self._build_reservation_params(instance_ids, filters,
+                                                dry_run, max_results,
+                                                next_token)
+        return self.get_list('DescribeInstances', params,
+                             [('item', Reservation)], verb='POST')
+
+    def iter_reservations(self, instance_ids=None, filters=None,
+                          dry_run=False, max_results=None):
+        """
+        Iterate over all the instance reservations associated with your
+        account, following ``next_token`` from page to page.  Unlike
+        :py:meth:`get_all_reservations`, each reservation is yielded as
+        soon as it has been parsed, without waiting for (or holding on
+        to) the whole response.
+
+        The arguments are those of :py:meth:`get_all_reservations`.
+
+        :rtype: iterator
+        :return: An iterator of :class:`boto.ec2.instance.Reservation`
+        """
+        next_token = None
+        while True:
+            params = self._build_reservation_params(instance_ids, filters,
+                                                    dry_run, max_results,
+                                                    next_token)
+            rs = ResultSet([('item', Reservation)])
+            for reservation in self.iter_list('DescribeInstances', params,
+                                              rs, verb='POST'):
+                yield reservation
+            next_token = rs.next_token
+            if not next_token:
+                break
+
+    def _build_reservation_params(self, instance_ids, filters, dry_run,
+                                  max_results, next_token):
         params = {}
         if instance_ids:
             self.build_list_params(params, instance_ids, 'InstanceId')
@@ -679,8 +714,7 @@ class EC2Connection(AWSQueryConnection):
             params['MaxResults'] = max_results
         if next_token:
             params['NextToken'] = next_token
-        return self.get_list('DescribeInstances', params,
-                             [('item', Reservation)], verb='POST')
+        return params
 
     def get_all_instance_status(self, instance_ids=None,
                                 max_results=None, next_token=None,
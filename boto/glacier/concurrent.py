@@ -23,16 +23,20 @@ import os
 import math
 import threading
 import hashlib
+import json
 import time
 import logging
 from boto.compat import Queue
+from boto.vendored.six.moves.queue import Empty
 import binascii
 
 from boto.glacier.utils import DEFAULT_PART_SIZE, minimum_part_size, \
-                               chunk_hashes, tree_hash, bytes_to_hex
+                               chunk_hashes, tree_hash, bytes_to_hex, \
+                               TreeHash
 from boto.glacier.exceptions import UploadArchiveError, \
                                     DownloadArchiveError, \
                                     TreeHashDoesNotMatchError
+from boto.utils import MappedFileRegion, MultiHasher
 
 
 _END_SENTINEL = object()
@@ -65,14 +69,62 @@ class ConcurrentTransferer(object):
             thread.join()
         log.debug("Threads have exited.")
 
-    def _add_work_items_to_queue(self, total_parts, worker_queue, part_size):
+    def _add_work_items_to_queue(self, total_parts, worker_queue, part_size,
+                                 part_numbers=None):
         log.debug("Adding work items to queue.")
-        for i in range(total_parts):
+        if part_numbers is None:
+            part_numbers = range(total_parts)
+        for i in part_numbers:
             worker_queue.put((i, part_size))
         for i in range(self._num_threads):
             worker_queue.put(_END_SENTINEL)
 
 
+class UploadStats(object):
+    """
+    Counts what a :class:`ConcurrentUploader` upload did.  ``throughput``
+    is in bytes uploaded per second of the whole upload, and
+    ``hash_throughput`` in bytes hashed per second spent hashing, summed
+    over the threads that hashed.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.parts_uploaded = 0
+        self.parts_resumed = 0
+        self.bytes_uploaded = 0
+        self.bytes_hashed = 0
+        self.hash_time = 0.0
+        self.upload_time = 0.0
+        self.start_time = time.time()
+        self.end_time = None
+
+    def add(self, **counts):
+        with self.mutex:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    @property
+    def elapsed(self):
+        return (self.end_time or time.time()) - self.start_time
+
+    @property
+    def throughput(self):
+        return self.bytes_uploaded / max(self.elapsed, 1e-6)
+
+    @property
+    def hash_throughput(self):
+        return self.bytes_hashed / max(self.hash_time, 1e-6)
+
+    def __repr__(self):
+        return ('<UploadStats: %d parts uploaded (%d bytes), %d resumed, '
+                '%.1f MB/s>' % (self.parts_uploaded, self.bytes_uploaded,
+                                self.parts_resumed,
+                                self.throughput / (1024 * 1024)))
+
+
 class ConcurrentUploader(ConcurrentTransferer):
     """Concurrently upload an archive to glacier.
 
@@ -82,9 +134,15 @@ class ConcurrentUploader(ConcurrentTransferer):
     The threadpool is completely managed by this class and is
     transparent to the users of this class.
 
+    Parts are hashed by a separate pool of threads which runs ahead of
+    the uploads, so that a part's hashes are usually ready by the time a
+    thread is free to send it.  hashlib releases the GIL while it hashes
+    a large buffer, so the hashing threads run in parallel with each
+    other and with the uploads.
+
     """
     def __init__(self, api, vault_name, part_size=DEFAULT_PART_SIZE,
-                 num_threads=10):
+                 num_threads=10, hash_threads=2, max_pending_parts=None):
         """
         :type api: :class:`boto.glacier.layer1.Layer1`
         :param api: A layer1 glacier object.
@@ -102,12 +160,29 @@ class ConcurrentUploader(ConcurrentTransferer):
             The number of threads will control how much parts are being
             concurrently uploaded.
 
+        :type hash_threads: int
+        :param hash_threads: The number of threads that hash parts ahead
+            of their upload.  With 0, each upload thread hashes the part
+            it is about to send.
+
+        :type max_pending_parts: int
+        :param max_pending_parts: How many hashed parts may wait for an
+            upload thread, which bounds how much of the file is mapped
+            into memory at once.  Defaults to ``num_threads``.
+
         """
         super(ConcurrentUploader, self).__init__(part_size, num_threads)
         self._api = api
         self._vault_name = vault_name
-
-    def upload(self, filename, description=None):
+        self._hash_threads = hash_threads
+        if max_pending_parts is None:
+            max_pending_parts = num_threads
+        self._max_pending_parts = max(1, max_pending_parts)
+        self._part_hashes = None
+        self._state = None
+        self.stats = None
+
+    def upload(self, filename, description=None, state_file=None):
         """Concurrently create an archive.
 
         The part_size value specified when the class was constructed
@@ -116,12 +191,24 @@ class ConcurrentUploader(ConcurrentTransferer):
         the part size used will be the minimum part size required
         to properly upload the given file.
 
+        Once the upload finishes, ``self.stats`` is an
+        :class:`UploadStats` describing it.
+
         :type file: str
         :param file: The filename to upload
 
         :type description: str
         :param description: The description of the archive.
 
+        :type state_file: str
+        :param state_file: Where to record the upload id and the parts
+            uploaded so far.  If the file already describes an upload of
+            this file to this vault, that upload is resumed and only the
+            missing parts are sent; a failed upload is then left open
+            rather than aborted, so it can be resumed in turn.  The file
+            is removed once the archive is created.  Glacier discards
+            multipart uploads left unfinished for 24 hours.
+
         :rtype: str
         :return: The archive id of the newly created archive.
 
@@ -131,30 +218,58 @@ class ConcurrentUploader(ConcurrentTransferer):
         hash_chunks = [None] * total_parts
         worker_queue = Queue()
         result_queue = Queue()
-        response = self._api.initiate_multipart_upload(self._vault_name,
-                                                       part_size,
-                                                       description)
-        upload_id = response['UploadId']
+        self.stats = UploadStats()
+        self._state = None
+        upload_id = None
+        if state_file is not None:
+            self._state = _UploadState(state_file, self._vault_name, filename,
+                                       total_size, part_size)
+            upload_id = self._state.upload_id
+        if upload_id is None:
+            response = self._api.initiate_multipart_upload(self._vault_name,
+                                                           part_size,
+                                                           description)
+            upload_id = response['UploadId']
+            if self._state is not None:
+                self._state.start(upload_id)
+        else:
+            log.debug("Resuming upload %s.", upload_id)
+            for part_number, tree_sha256 in self._state.parts.items():
+                hash_chunks[part_number] = tree_sha256
+        pending = [i for i in range(total_parts) if hash_chunks[i] is None]
+        self.stats.add(parts_resumed=total_parts - len(pending))
         # The basic idea is to add the chunks (the offsets not the actual
         # contents) to a work queue, start up a thread pool, let the crank
         # through the items in the work queue, and then place their results
         # in a result queue which we use to complete the multipart upload.
-        self._add_work_items_to_queue(total_parts, worker_queue, part_size)
-        self._start_upload_threads(result_queue, upload_id,
-                                   worker_queue, filename)
+        self._add_work_items_to_queue(total_parts, worker_queue, part_size,
+                                      pending)
         try:
+            self._start_hash_threads(filename, pending, part_size)
+            self._start_upload_threads(result_queue, upload_id,
+                                       worker_queue, filename)
             self._wait_for_upload_threads(hash_chunks, result_queue,
-                                          total_parts)
+                                          len(pending))
         except UploadArchiveError as e:
-            log.debug("An error occurred while uploading an archive, "
-                      "aborting multipart upload.")
-            self._api.abort_multipart_upload(self._vault_name, upload_id)
+            if self._state is not None:
+                log.debug("An error occurred while uploading an archive, "
+                          "leaving multipart upload %s to be resumed.",
+                          upload_id)
+            else:
+                log.debug("An error occurred while uploading an archive, "
+                          "aborting multipart upload.")
+                self._api.abort_multipart_upload(self._vault_name, upload_id)
             raise e
+        finally:
+            self._stop_hash_threads()
         log.debug("Completing upload.")
         response = self._api.complete_multipart_upload(
             self._vault_name, upload_id, bytes_to_hex(tree_hash(hash_chunks)),
             total_size)
-        log.debug("Upload finished.")
+        if self._state is not None:
+            self._state.remove()
+        self.stats.end_time = time.time()
+        log.debug("Upload finished: %r", self.stats)
         return response['ArchiveId']
 
     def _wait_for_upload_threads(self, hash_chunks, result_queue, total_parts):
@@ -171,19 +286,95 @@ class ConcurrentUploader(ConcurrentTransferer):
             # the entire archive.
             part_number, tree_sha256 = result
             hash_chunks[part_number] = tree_sha256
+            if self._state is not None:
+                self._state.record(part_number, tree_sha256)
         self._shutdown_threads()
 
+    def _start_hash_threads(self, filename, part_numbers, part_size):
+        self._part_hashes = None
+        if not self._hash_threads or not part_numbers:
+            return
+        log.debug("Starting hash threads.")
+        self._part_hashes = _PartHashes(self._max_pending_parts)
+        hash_queue = Queue()
+        for i in part_numbers:
+            hash_queue.put((i, part_size))
+        for _ in range(min(self._hash_threads, len(part_numbers))):
+            thread = HashWorkerThread(filename, hash_queue, self._part_hashes,
+                                      self.stats)
+            thread.start()
+            self._part_hashes.threads.append(thread)
+
+    def _stop_hash_threads(self):
+        if self._part_hashes is not None:
+            self._part_hashes.close()
+            for thread in self._part_hashes.threads:
+                thread.join()
+            self._part_hashes = None
+
     def _start_upload_threads(self, result_queue, upload_id, worker_queue,
                               filename):
         log.debug("Starting threads.")
         for _ in range(self._num_threads):
             thread = UploadWorkerThread(self._api, self._vault_name, filename,
-                                        upload_id, worker_queue, result_queue)
+                                        upload_id, worker_queue, result_queue,
+                                        part_hashes=self._part_hashes,
+                                        stats=self.stats)
             time.sleep(0.2)
             thread.start()
             self._threads.append(thread)
 
 
+class _UploadState(object):
+    """
+    The upload id of a :class:`ConcurrentUploader` upload and the tree
+    hashes of the parts uploaded so far, saved as JSON to ``path``.  An
+    existing file is only used if it describes an upload of the same
+    file, unchanged, to the same vault with the same part size.
+    """
+
+    def __init__(self, path, vault_name, filename, size, part_size):
+        self.path = path
+        st = os.stat(filename)
+        self.identity = {'vault': vault_name,
+                         'filename': os.path.abspath(filename),
+                         'size': size,
+                         'mtime': st.st_mtime,
+                         'part_size': part_size}
+        self.upload_id = None
+        self.parts = {}
+        if os.path.exists(path):
+            with open(path) as fp:
+                saved = json.load(fp)
+            if all(saved.get(k) == v for k, v in self.identity.items()):
+                self.upload_id = saved['upload_id']
+                self.parts = dict(
+                    (int(i), binascii.unhexlify(h.encode('ascii')))
+                    for i, h in saved['parts'].items())
+
+    def start(self, upload_id):
+        self.upload_id = upload_id
+        self.parts = {}
+        self.save()
+
+    def record(self, part_number, tree_sha256):
+        self.parts[part_number] = tree_sha256
+        self.save()
+
+    def save(self):
+        data = dict(self.identity, upload_id=self.upload_id,
+                    parts=dict((str(i), bytes_to_hex(h).decode('ascii'))
+                               for i, h in self.parts.items()))
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump(data, fp, sort_keys=True)
+        os.rename(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
 class TransferThread(threading.Thread):
     def __init__(self, worker_queue, result_queue):
         super(TransferThread, self).__init__()
@@ -213,11 +404,141 @@ class TransferThread(threading.Thread):
         pass
 
 
+def _hash_part(fileobj, part_number, part_size):
+    """
+    Maps part ``part_number`` of ``fileobj`` (an open file or a filename)
+    into memory and hashes it in place.  Returns the mapped region, which
+    the caller must close, its hex linear hash and its tree hash.
+    """
+    contents = MappedFileRegion(fileobj, part_number * part_size, part_size)
+    try:
+        hasher = MultiHasher({'linear': hashlib.sha256, 'tree': TreeHash})
+        hasher.hash_file(contents)
+    except:
+        contents.close()
+        raise
+    return contents, hasher.hexdigest('linear'), hasher.digest('tree')
+
+
+class _PartHashes(object):
+    """
+    Parts hashed ahead of their upload, keyed by part number.  At most
+    ``max_pending`` parts are hashed or waiting to be taken at once.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self.threads = []
+        self.closed = False
+        self._parts = {}
+        self._taken = set()
+        self._pending = 0
+        self._cond = threading.Condition()
+
+    def reserve(self):
+        """
+        Waits for room to hash another part.  Returns False, without
+        waiting further, once :py:meth:`close` has been called.
+        """
+        with self._cond:
+            while self._pending >= self.max_pending and not self.closed:
+                self._cond.wait(1)
+            if self.closed:
+                return False
+            self._pending += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def put(self, part_number, hashed):
+        """
+        Stores the result of :py:func:`_hash_part` for ``part_number``,
+        or None if it could not be hashed.
+        """
+        with self._cond:
+            if self.closed:
+                if hashed is not None:
+                    hashed[0].close()
+                return
+            self._parts[part_number] = hashed
+            self._cond.notify_all()
+
+    def take(self, part_number):
+        """
+        Waits for ``part_number`` to be hashed and returns what
+        :py:func:`_hash_part` returned for it.  Returns None if it
+        couldn't be hashed, or if it has already been taken.
+        """
+        with self._cond:
+            if part_number in self._taken:
+                return None
+            while part_number not in self._parts and not self.closed:
+                self._cond.wait(1)
+            if part_number not in self._parts:
+                return None
+            self._taken.add(part_number)
+            hashed = self._parts.pop(part_number)
+            self._pending -= 1
+            self._cond.notify_all()
+            return hashed
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            for hashed in self._parts.values():
+                if hashed is not None:
+                    hashed[0].close()
+            self._parts.clear()
+            self._cond.notify_all()
+
+
+class HashWorkerThread(threading.Thread):
+    """
+    Hashes the parts in ``hash_queue``, in order, into ``part_hashes``
+    for the :class:`UploadWorkerThread` threads to send.
+    """
+
+    def __init__(self, filename, hash_queue, part_hashes, stats=None):
+        super(HashWorkerThread, self).__init__()
+        self.daemon = True
+        self._filename = filename
+        self._hash_queue = hash_queue
+        self._part_hashes = part_hashes
+        self._stats = stats
+
+    def run(self):
+        while self._part_hashes.reserve():
+            try:
+                part_number, part_size = self._hash_queue.get_nowait()
+            except Empty:
+                self._part_hashes.release()
+                return
+            start = time.time()
+            try:
+                hashed = _hash_part(self._filename, part_number, part_size)
+            except Exception as e:
+                # The upload thread hashes the part itself, and retries
+                # or reports the failure as it would any other.
+                log.debug("Could not hash part %s ahead of its upload: %s",
+                          part_number, e)
+                hashed = None
+            else:
+                if self._stats is not None:
+                    self._stats.add(bytes_hashed=len(hashed[0]),
+                                    hash_time=time.time() - start)
+            self._part_hashes.put(part_number, hashed)
+
+
 class UploadWorkerThread(TransferThread):
     def __init__(self, api, vault_name, filename, upload_id,
                  worker_queue, result_queue, num_retries=5,
                  time_between_retries=5,
-                 retry_exceptions=Exception):
+                 retry_exceptions=Exception, part_hashes=None, stats=None):
         super(UploadWorkerThread, self).__init__(worker_queue, result_queue)
         self._api = api
         self._vault_name = vault_name
@@ -227,6 +548,8 @@ class UploadWorkerThread(TransferThread):
         self._num_retries = num_retries
         self._time_between_retries = time_between_retries
         self._retry_exceptions = retry_exceptions
+        self._part_hashes = part_hashes
+        self._stats = stats
 
     def _process_chunk(self, work):
         result = None
@@ -247,18 +570,33 @@ class UploadWorkerThread(TransferThread):
     def _upload_chunk(self, work):
         part_number, part_size = work
         start_byte = part_number * part_size
-        self._fileobj.seek(start_byte)
-        contents = self._fileobj.read(part_size)
-        linear_hash = hashlib.sha256(contents).hexdigest()
-        tree_hash_bytes = tree_hash(chunk_hashes(contents))
-        byte_range = (start_byte, start_byte + len(contents) - 1)
-        log.debug("Uploading chunk %s of size %s", part_number, part_size)
-        response = self._api.upload_part(self._vault_name, self._upload_id,
-                                         linear_hash,
-                                         bytes_to_hex(tree_hash_bytes),
-                                         byte_range, contents)
-        # Reading the response allows the connection to be reused.
-        response.read()
+        # The part is hashed and sent from a memory map of its range of the
+        # file rather than being read into memory.  If a hash thread has
+        # already done so, its map and hashes are used.
+        hashed = None
+        if self._part_hashes is not None:
+            hashed = self._part_hashes.take(part_number)
+        if hashed is None:
+            start = time.time()
+            hashed = _hash_part(self._fileobj, part_number, part_size)
+            if self._stats is not None:
+                self._stats.add(bytes_hashed=len(hashed[0]),
+                                hash_time=time.time() - start)
+        contents, linear_hash, tree_hash_bytes = hashed
+        with contents:
+            byte_range = (start_byte, start_byte + len(contents) - 1)
+            log.debug("Uploading chunk %s of size %s", part_number, part_size)
+            start = time.time()
+            response = self._api.upload_part(self._vault_name,
+                                             self._upload_id, linear_hash,
+                                             bytes_to_hex(tree_hash_bytes),
+                                             byte_range, contents)
+            # Reading the response allows the connection to be reused.
+            response.read()
+            if self._stats is not None:
+                self._stats.add(parts_uploaded=1,
+                                bytes_uploaded=len(contents),
+                                upload_time=time.time() - start)
         return (part_number, tree_hash_bytes)
 
     def _cleanup(self):
@@ -1266,14 +1266,22 @@ class Layer1(AWSAuthConnection):
             The format of this header follows RFC 2616. An example header is
             Content-Range:bytes 0-4194303/*.
 
-        :type part_data: bytes
-        :param part_data: The data to be uploaded for the part
+        :type part_data: bytes or file
+        :param part_data: The data to be uploaded for the part, or a
+            file-like object, such as a
+            :py:class:`boto.utils.MappedFileRegion`, that supports
+            ``len()`` and is read from its current position.
         """
         headers = {'x-amz-content-sha256': linear_hash,
                    'x-amz-sha256-tree-hash': tree_hash,
                    'Content-Range': 'bytes %d-%d/*' % byte_range}
         response_headers = [('x-amz-sha256-tree-hash', u'TreeHash')]
         uri = 'vaults/%s/multipart-uploads/%s' % (vault_name, upload_id)
+        if self._is_file_like(part_data):
+            sender = ResettingFileSender(part_data)
+        else:
+            sender = None
         return self.make_request('PUT', uri, headers=headers,
+                                 sender=sender,
                                  data=part_data, ok_responses=(204,),
                                  response_headers=response_headers)
@@ -24,6 +24,7 @@ import math
 import binascii
 
 from boto.compat import six
+from boto.utils import MultiHasher
 
 
 _MEGABYTE = 1024 * 1024
@@ -107,6 +108,45 @@ def tree_hash(fo):
     return hashes[0]
 
 
+class TreeHash(object):
+    """
+    A hash object, with the interface of those in :py:mod:`hashlib`, for
+    the tree hash of the data: the digest is that of
+    ``tree_hash(chunk_hashes(data, chunk_size))``, computed as the data
+    arrives.
+    """
+
+    def __init__(self, data=b'', chunk_size=_MEGABYTE):
+        self.chunk_size = chunk_size
+        self.hashes = []
+        self._chunk = hashlib.sha256()
+        self._chunk_len = 0
+        if data:
+            self.update(data)
+
+    def update(self, data):
+        view = memoryview(data)
+        offset = 0
+        while offset < len(view):
+            take = min(self.chunk_size - self._chunk_len, len(view) - offset)
+            self._chunk.update(view[offset:offset + take])
+            self._chunk_len += take
+            offset += take
+            if self._chunk_len == self.chunk_size:
+                self.hashes.append(self._chunk.digest())
+                self._chunk = hashlib.sha256()
+                self._chunk_len = 0
+
+    def digest(self):
+        hashes = list(self.hashes)
+        if self._chunk_len or not hashes:
+            hashes.append(self._chunk.digest())
+        return tree_hash(hashes)
+
+    def hexdigest(self):
+        return bytes_to_hex(self.digest())
+
+
 def compute_hashes_from_fileobj(fileobj, chunk_size=1024 * 1024):
     """Compute the linear and tree hash from a fileobj.
 
@@ -128,21 +168,16 @@ def compute_hashes_from_fileobj(fileobj, chunk_size=1024 * 1024):
     if six.PY3 and hasattr(fileobj, 'mode') and 'b' not in fileobj.mode:
         raise ValueError('File-like object must be opened in binary mode!')
 
-    linear_hash = hashlib.sha256()
-    chunks = []
-    chunk = fileobj.read(chunk_size)
-    while chunk:
-        # It's possible to get a file-like object that has no mode (checked
-        # above) and returns something other than bytes (e.g. str). So here
-        # we try to catch that and encode to bytes.
-        if not isinstance(chunk, bytes):
-            chunk = chunk.encode(getattr(fileobj, 'encoding', '') or 'utf-8')
-        linear_hash.update(chunk)
-        chunks.append(hashlib.sha256(chunk).digest())
-        chunk = fileobj.read(chunk_size)
-    if not chunks:
-        chunks = [hashlib.sha256(b'').digest()]
-    return linear_hash.hexdigest(), bytes_to_hex(tree_hash(chunks))
+    # It's possible to get a file-like object that has no mode (checked
+    # above) and returns something other than bytes (e.g. str), which is
+    # encoded to bytes for hashing.
+    hasher = MultiHasher(
+        {'linear': hashlib.sha256,
+         'tree': lambda: TreeHash(chunk_size=chunk_size)},
+        buf_size=chunk_size)
+    hasher.hash_file(fileobj, rewind=False,
+                     encoding=getattr(fileobj, 'encoding', '') or 'utf-8')
+    return hasher.hexdigest('linear'), bytes_to_hex(hasher.digest('tree'))
 
 
 def bytes_to_hex(str_as_bytes):
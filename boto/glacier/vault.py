@@ -236,7 +236,7 @@ class Vault(object):
             self, upload_id, part_size, file_obj, part_hash_map)
 
     def concurrent_create_archive_from_file(self, filename, description,
-                                            **kwargs):
+                                            state_file=None, **kwargs):
         """
         Create a new archive from a file and upload the given
         file.
@@ -249,6 +249,11 @@ class Vault(object):
         :type filename: str
         :param filename: A filename to upload
 
+        :type state_file: str
+        :param state_file: Where to record the progress of the upload so
+            that it can be resumed if it fails.  See
+            :py:meth:`boto.glacier.concurrent.ConcurrentUploader.upload`.
+
         :param kwargs: Additional kwargs to pass through to
             :py:class:`boto.glacier.concurrent.ConcurrentUploader`.
             You can pass any argument besides the ``api`` and
@@ -263,6 +268,9 @@ class Vault(object):
 
         """
         uploader = ConcurrentUploader(self.layer1, self.name, **kwargs)
+        if state_file is not None:
+            return uploader.upload(filename, description,
+                                   state_file=state_file)
         archive_id = uploader.upload(filename, description)
         return archive_id
 
@@ -166,7 +166,8 @@ class Key(S3Key):
 
     def get_file(self, fp, headers=None, cb=None, num_cb=10,
                  torrent=False, version_id=None, override_num_retries=None,
-                 response_headers=None, hash_algs=None):
+                 response_headers=None, hash_algs=None, buffer_size=None,
+                 decompress=False):
         query_args = None
         if self.generation:
             query_args = ['generation=%s' % self.generation]
@@ -174,7 +175,9 @@ class Key(S3Key):
                                 override_num_retries=override_num_retries,
                                 response_headers=response_headers,
                                 hash_algs=hash_algs,
-                                query_args=query_args)
+                                query_args=query_args,
+                                buffer_size=buffer_size,
+                                decompress=decompress)
 
     def get_contents_to_file(self, fp, headers=None,
                              cb=None, num_cb=10,
@@ -182,7 +185,8 @@ class Key(S3Key):
                              version_id=None,
                              res_download_handler=None,
                              response_headers=None,
-                             hash_algs=None):
+                             hash_algs=None, buffer_size=None,
+                             decompress=False):
         """
         Retrieve an object from GCS using the name of the Key object as the
         key in GCS. Write the contents of the object to the file pointed
@@ -222,6 +226,18 @@ class Key(S3Key):
             headers/values that will override any headers associated
             with the stored object in the response. See
             http://goo.gl/sMkcC for details.
+
+        :type buffer_size: int or string
+        :param buffer_size: (optional) How many bytes to read from the response per call, or
+            'adaptive' to start at ``BufferSize`` and grow the reads while
+            the transfer keeps up.  Defaults to the connection's
+            ``key_buffer_size`` and then to ``BufferSize``.
+
+        :type decompress: bool
+        :param decompress: (optional) If True and the object's
+            ``Content-Encoding`` is gzip or zstd, the contents are
+            decompressed as they are written to ``fp``.  Ignored for
+            ranged requests and resumable downloads.
         """
         if self.bucket is not None:
             if res_download_handler:
@@ -233,7 +249,8 @@ class Key(S3Key):
                 self.get_file(fp, headers, cb, num_cb, torrent=torrent,
                               version_id=version_id,
                               response_headers=response_headers,
-                              hash_algs=hash_algs)
+                              hash_algs=hash_algs, buffer_size=buffer_size,
+                              decompress=decompress)
 
     def compute_hash(self, fp, algorithm, size=None):
         """
@@ -264,7 +281,7 @@ class Key(S3Key):
 
     def send_file(self, fp, headers=None, cb=None, num_cb=10,
                   query_args=None, chunked_transfer=False, size=None,
-                  hash_algs=None):
+                  hash_algs=None, buffer_size=None):
         """
         Upload a file to GCS.
 
@@ -306,11 +323,17 @@ class Key(S3Key):
         :param hash_algs: (optional) Dictionary of hash algorithms and
             corresponding hashing class that implements update() and digest().
             Defaults to {'md5': hashlib.md5}.
+
+        :type buffer_size: int or string
+        :param buffer_size: (optional) How many bytes to read from the file per call, or
+            'adaptive' to start at ``BufferSize`` and grow the reads while
+            the transfer keeps up.  Defaults to the connection's
+            ``key_buffer_size`` and then to ``BufferSize``.
         """
         self._send_file_internal(fp, headers=headers, cb=cb, num_cb=num_cb,
                                  query_args=query_args,
                                  chunked_transfer=chunked_transfer, size=size,
-                                 hash_algs=hash_algs)
+                                 hash_algs=hash_algs, buffer_size=buffer_size)
 
     def delete(self, headers=None):
         return self.bucket.delete_key(self.name, version_id=self.version_id,
@@ -404,7 +427,7 @@ class Key(S3Key):
     def set_contents_from_file(self, fp, headers=None, replace=True,
                                cb=None, num_cb=10, policy=None, md5=None,
                                res_upload_handler=None, size=None, rewind=False,
-                               if_generation=None):
+                               if_generation=None, buffer_size=None):
         """
         Store an object in GS using the name of the Key object as the
         key in GS and the contents of the file pointed to by 'fp' as the
@@ -482,6 +505,12 @@ class Key(S3Key):
             this value. If set to the value 0, the object will only be written
             if it doesn't already exist.
 
+        :type buffer_size: int or string
+        :param buffer_size: (optional) How many bytes to read from the file per call, or
+            'adaptive' to start at ``BufferSize`` and grow the reads while
+            the transfer keeps up.  Defaults to the connection's
+            ``key_buffer_size`` and then to ``BufferSize``.
+
         :rtype: int
         :return: The number of bytes written to the key.
 
@@ -577,7 +606,8 @@ class Key(S3Key):
                 res_upload_handler.send_file(self, fp, headers, cb, num_cb)
             else:
                 # Not a resumable transfer so use basic send_file mechanism.
-                self.send_file(fp, headers, cb, num_cb, size=size)
+                self.send_file(fp, headers, cb, num_cb, size=size,
+                               buffer_size=buffer_size)
 
     def set_contents_from_filename(self, filename, headers=None, replace=True,
                                    cb=None, num_cb=10, policy=None, md5=None,
@@ -29,6 +29,9 @@ class XmlHandler(xml.sax.ContentHandler):
         self.connection = connection
         self.nodes = [('root', root_node)]
         self.current_text = ''
+        # If set to a list, collects every node closed directly under the
+        # root node; see XmlStreamParser.
+        self.finished = None
 
     def startElement(self, name, attrs):
         self.current_text = ''
@@ -41,7 +44,9 @@ class XmlHandler(xml.sax.ContentHandler):
         if self.nodes[-1][0] == name:
             if hasattr(self.nodes[-1][1], 'endNode'):
                 self.nodes[-1][1].endNode(self.connection)
-            self.nodes.pop()
+            node = self.nodes.pop()[1]
+            if self.finished is not None and len(self.nodes) == 1:
+                self.finished.append(node)
         self.current_text = ''
 
     def characters(self, content):
@@ -57,3 +62,49 @@ class XmlHandlerWrapper(object):
 
     def parseString(self, content):
         return self.parser.parse(StringIO(content))
+
+
+class XmlStreamParser(object):
+    """
+    Parses an XML response as it is read instead of all at once.
+
+    ``root_node`` is a :py:class:`boto.resultset.ResultSet`.  Iterating
+    over ``parse(fp)`` feeds the parser ``chunk_size`` bytes at a time from
+    ``fp.read`` and yields each item of the result set as soon as its
+    element has been closed.  The items are handed over rather than kept
+    in ``root_node``, so a long listing is never held in memory at once;
+    the other fields of ``root_node`` (``is_truncated``, ``next_token``
+    and so on) are complete once the iterator is exhausted.
+    """
+
+    ChunkSize = 64 * 1024
+
+    def __init__(self, root_node, connection, chunk_size=None):
+        self.root_node = root_node
+        self.handler = XmlHandler(root_node, connection)
+        self.handler.finished = []
+        self.parser = xml.sax.make_parser()
+        self.parser.setContentHandler(self.handler)
+        self.parser.setFeature(xml.sax.handler.feature_external_ges, 0)
+        self.chunk_size = chunk_size or self.ChunkSize
+
+    def _take_finished(self):
+        finished, self.handler.finished = self.handler.finished, []
+        members = set(id(item) for item in self.root_node)
+        items = [node for node in finished if id(node) in members]
+        # Items are appended when their element opens, so the finished
+        # ones are always at the front.
+        del self.root_node[:len(items)]
+        return items
+
+    def parse(self, fp):
+        while True:
+            chunk = fp.read(self.chunk_size)
+            if chunk:
+                self.parser.feed(chunk)
+            else:
+                self.parser.close()
+            for item in self._take_finished():
+                yield item
+            if not chunk:
+                break
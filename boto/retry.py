@@ -0,0 +1,274 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+Retry policies shared by all connections.
+
+A :py:class:`RetryPolicy` decides which failures are worth retrying, how
+long to back off before each retry and whether the connection still has
+budget to retry at all.  It never sleeps on its own initiative: callers
+ask it for a delay and then wait however suits them (``_mexe`` uses
+``RetryPolicy.sleep``, the asyncio connections ``asyncio.sleep``).
+"""
+import random
+import time
+
+import boto
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+
+# Kinds of retryable failures.
+THROTTLING = 'throttling'
+TRANSIENT = 'transient'
+CONNECTION = 'connection'
+
+
+def no_jitter(attempt, base, cap, previous):
+    """Plain truncated exponential backoff; the first retry is immediate."""
+    if attempt == 0:
+        return 0
+    return min(cap, base * (2 ** attempt))
+
+
+def full_jitter(attempt, base, cap, previous):
+    """A random delay between zero and the exponential backoff."""
+    return random.random() * min(cap, base * (2 ** attempt))
+
+
+def equal_jitter(attempt, base, cap, previous):
+    """Half the exponential backoff plus a random half."""
+    delay = min(cap, base * (2 ** attempt)) / 2.0
+    return delay + random.random() * delay
+
+
+def decorrelated_jitter(attempt, base, cap, previous):
+    """A random delay between ``base`` and three times the previous one."""
+    if previous is None:
+        previous = base
+    return min(cap, random.uniform(base, previous * 3))
+
+
+JITTER_STRATEGIES = {
+    'none': no_jitter,
+    'full': full_jitter,
+    'equal': equal_jitter,
+    'decorrelated': decorrelated_jitter,
+}
+
+
+class RetryBudget(object):
+    """
+    A token bucket shared by every request made through a connection.
+
+    Each retry withdraws tokens (more for connection errors than for
+    error responses) and each successful request deposits some back.
+    Once the bucket is empty, failed requests are no longer retried
+    until enough requests succeed again, so a service brownout does not
+    get multiplied by every client retrying every request.
+
+    This class is thread-safe.
+    """
+
+    DEFAULT_COSTS = {THROTTLING: 5, TRANSIENT: 5, CONNECTION: 10}
+
+    def __init__(self, capacity=500, costs=None, success_refill=1):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.costs = dict(self.DEFAULT_COSTS)
+        if costs:
+            self.costs.update(costs)
+        self.success_refill = success_refill
+        self.mutex = threading.Lock()
+
+    def __getstate__(self):
+        pickled_dict = self.__dict__.copy()
+        del pickled_dict['mutex']
+        return pickled_dict
+
+    def __setstate__(self, dct):
+        self.__dict__.update(dct)
+        self.mutex = threading.Lock()
+
+    def acquire(self, kind):
+        """
+        Withdraws the cost of retrying a ``kind`` failure.  Returns False,
+        withdrawing nothing, if there are not enough tokens left.
+        """
+        cost = self.costs.get(kind, self.costs[TRANSIENT])
+        with self.mutex:
+            if cost > self.tokens:
+                return False
+            self.tokens -= cost
+            return True
+
+    def release(self):
+        """Deposits tokens for a successful request."""
+        with self.mutex:
+            self.tokens = min(self.capacity, self.tokens + self.success_refill)
+
+
+class RetryPolicy(object):
+    """
+    Classifies failures and schedules retries for a connection.
+
+    :type jitter: string
+    :param jitter: One of the names in ``JITTER_STRATEGIES``.
+
+    :type base_delay: float
+    :param base_delay: The backoff for the first attempt, in seconds.
+
+    :type max_delay: float
+    :param max_delay: Upper bound on any single delay.  Defaults to the
+        ``max_retry_delay`` option in the ``Boto`` config section.
+
+    :type budget: :py:class:`RetryBudget`
+    :param budget: If given, every retry must be paid for from this
+        budget.
+
+    The policy counts ``attempts``, ``retries``, ``sleep_time`` (seconds
+    spent backing off) and ``budget_exhausted`` (retries refused because
+    the budget ran out); see ``stats``.
+
+    This class is thread-safe.
+    """
+
+    # HTTP statuses that are retried, and how they are classified.
+    RETRYABLE_STATUSES = {
+        500: TRANSIENT,
+        502: TRANSIENT,
+        503: THROTTLING,
+        504: TRANSIENT,
+    }
+
+    def __init__(self, jitter='full', base_delay=1.0, max_delay=None,
+                 budget=None):
+        if jitter not in JITTER_STRATEGIES:
+            raise ValueError('Unknown jitter strategy %r, expected one of %s'
+                             % (jitter, ', '.join(sorted(JITTER_STRATEGIES))))
+        self.jitter = jitter
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.mutex = threading.Lock()
+        self.attempts = 0
+        self.retries = 0
+        self.sleep_time = 0.0
+        self.budget_exhausted = 0
+
+    def __getstate__(self):
+        pickled_dict = self.__dict__.copy()
+        del pickled_dict['mutex']
+        return pickled_dict
+
+    def __setstate__(self, dct):
+        self.__dict__.update(dct)
+        self.mutex = threading.Lock()
+
+    @classmethod
+    def from_config(cls, **kwargs):
+        """
+        Builds a policy from the ``retry_jitter`` and ``retry_budget``
+        options in the ``Boto`` config section.  Keyword arguments
+        override the config.
+        """
+        if 'jitter' not in kwargs:
+            kwargs['jitter'] = boto.config.get('Boto', 'retry_jitter',
+                                               None) or 'full'
+        if 'budget' not in kwargs:
+            capacity = boto.config.getint('Boto', 'retry_budget', 0)
+            if capacity:
+                kwargs['budget'] = RetryBudget(capacity)
+        return cls(**kwargs)
+
+    def classify_response(self, response):
+        """
+        Returns the kind of failure ``response`` represents, or None if
+        it should not be retried.
+        """
+        return self.RETRYABLE_STATUSES.get(response.status)
+
+    def classify_exception(self, exception):
+        """
+        Returns the kind of failure ``exception`` represents.  Connections
+        only ask about exceptions they already consider retryable.
+        """
+        return CONNECTION
+
+    def delay(self, attempt, previous=None):
+        """
+        Returns how many seconds to wait before retry number ``attempt``
+        (counting from zero).  ``previous`` is the delay used before the
+        last retry of the same request, if any.
+        """
+        max_delay = self.max_delay
+        if max_delay is None:
+            max_delay = boto.config.get('Boto', 'max_retry_delay', 60)
+        strategy = JITTER_STRATEGIES[self.jitter]
+        return strategy(attempt, self.base_delay, float(max_delay), previous)
+
+    def record_attempt(self):
+        with self.mutex:
+            self.attempts += 1
+
+    def record_success(self):
+        if self.budget is not None:
+            self.budget.release()
+
+    def should_retry(self, kind):
+        """
+        Returns True if a ``kind`` failure may be retried, paying for the
+        retry out of the budget.
+        """
+        if self.budget is not None and not self.budget.acquire(kind):
+            with self.mutex:
+                self.budget_exhausted += 1
+            boto.log.debug('Retry budget exhausted, not retrying %s error'
+                           % kind)
+            return False
+        with self.mutex:
+            self.retries += 1
+        return True
+
+    def record_sleep(self, seconds):
+        with self.mutex:
+            self.sleep_time += seconds
+
+    def sleep(self, seconds):
+        """Blocks the calling thread for ``seconds`` and records it."""
+        self.record_sleep(seconds)
+        time.sleep(seconds)
+
+    def stats(self):
+        with self.mutex:
+            stats = {
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'sleep_time': self.sleep_time,
+                'budget_exhausted': self.budget_exhausted,
+            }
+        if self.budget is not None:
+            stats['budget_tokens'] = self.budget.tokens
+        return stats
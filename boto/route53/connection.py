@@ -25,7 +25,6 @@
 #
 
 from boto.route53 import exception
-import random
 import uuid
 import xml.sax
 
@@ -530,8 +529,7 @@ class Route53Connection(AWSAuthConnection):
                     'PriorRequestNotComplete',
                     i
                 )
-                next_sleep = min(random.random() * (2 ** i),
-                                 boto.config.get('Boto', 'max_retry_delay', 60))
+                next_sleep = self.retry_policy.delay(i)
                 i += 1
                 status = (msg, i, next_sleep)
 
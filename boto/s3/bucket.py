@@ -40,6 +40,7 @@ from boto.s3.lifecycle import Lifecycle
 from boto.s3.tagging import Tags
 from boto.s3.cors import CORSConfiguration
 from boto.s3.bucketlogging import BucketLogging
+from boto.s3.transfer import ParallelCopier, run_pipelined
 from boto.s3 import website
 import boto.jsonresponse
 import boto.utils
@@ -47,6 +48,7 @@ import xml.sax
 import xml.sax.saxutils
 import re
 import base64
+import threading
 from collections import defaultdict
 from boto.compat import BytesIO, six, StringIO, urllib
 
@@ -234,7 +236,7 @@ class Bucket(object):
                     response.status, response.reason, '')
 
     def list(self, prefix='', delimiter='', marker='', headers=None,
-             encoding_type=None):
+             encoding_type=None, parallel=None, ordered=True):
         """
         List key objects within a bucket.  This returns an instance of an
         BucketListResultSet that automatically handles all of the result
@@ -278,11 +280,23 @@ class Bucket(object):
             Valid options: ``url``
         :type encoding_type: string
 
+        :type parallel: int
+        :param parallel: (optional) If greater than 1, the keyspace is
+            split into shards that are listed by this many threads at
+            once. See
+            :py:func:`boto.s3.bucketlistresultset.parallel_bucket_lister`.
+
+        :type ordered: bool
+        :param ordered: (optional) With ``parallel``, whether keys are
+            returned in lexical order (the default) or as soon as any
+            shard has listed them.
+
         :rtype: :class:`boto.s3.bucketlistresultset.BucketListResultSet`
         :return: an instance of a BucketListResultSet that handles paging, etc
         """
         return BucketListResultSet(self, prefix, delimiter, marker, headers,
-                                   encoding_type=encoding_type)
+                                   encoding_type=encoding_type,
+                                   parallel=parallel, ordered=ordered)
 
     def list_versions(self, prefix='', delimiter='', key_marker='',
                       version_id_marker='', headers=None, encoding_type=None):
@@ -411,6 +425,28 @@ class Bucket(object):
             raise self.connection.provider.storage_response_error(
                 response.status, response.reason, body)
 
+    def _iter_all(self, element_map, initial_query_string='',
+                  headers=None, **params):
+        """
+        Like ``_get_all``, but parses the listing as it is read.  Returns
+        a ResultSet that is filled in with everything but the items once
+        the listing has been read, and an iterator over the items.
+        """
+        query_args = self._get_all_query_args(
+            params,
+            initial_query_string=initial_query_string
+        )
+        response = self.connection.make_request('GET', self.name,
+                                                headers=headers,
+                                                query_args=query_args)
+        if response.status != 200:
+            body = response.read()
+            boto.log.debug(body)
+            raise self.connection.provider.storage_response_error(
+                response.status, response.reason, body)
+        rs = ResultSet(element_map)
+        return rs, handler.XmlStreamParser(rs, self).parse(response)
+
     def validate_kwarg_names(self, kwargs, names):
         """
         Checks that all named arguments are in the specified list of names.
@@ -473,6 +509,27 @@ class Bucket(object):
                               ('CommonPrefixes', Prefix)],
                              '', headers, **params)
 
+    def iter_all_keys(self, headers=None, **params):
+        """
+        A streaming version of :py:meth:`get_all_keys`, which takes the
+        same arguments.  Keys are parsed from the response as it arrives
+        and handed out one at a time, so the first ones are available
+        before the whole page has been read and the page is never held
+        in memory at once.
+
+        :rtype: tuple
+        :return: A ResultSet and an iterator over the keys (and
+            prefixes) of the page.  The ResultSet stays empty, but its
+            ``is_truncated`` and ``next_marker`` are set once the iterator
+            is exhausted.
+        """
+        self.validate_kwarg_names(params, ['maxkeys', 'max_keys', 'prefix',
+                                           'marker', 'delimiter',
+                                           'encoding_type'])
+        return self._iter_all([('Contents', self.key_class),
+                               ('CommonPrefixes', Prefix)],
+                              '', headers, **params)
+
     def get_all_versions(self, headers=None, **params):
         """
         A lower-level, version-aware method for listing contents of a
@@ -633,22 +690,28 @@ class Bucket(object):
                                             response_headers=response_headers,
                                             expires_in_absolute=expires_in_absolute)
 
-    def delete_keys(self, keys, quiet=False, mfa_token=None, headers=None):
+    def delete_keys(self, keys, quiet=False, mfa_token=None, headers=None,
+                    parallel=None):
         """
         Deletes a set of keys using S3's Multi-object delete API. If a
         VersionID is specified for that key then that version is removed.
         Returns a MultiDeleteResult Object, which contains Deleted
         and Error elements for each key you ask to delete.
 
-        :type keys: list
-        :param keys: A list of either key_names or (key_name, versionid) pairs
-            or a list of Key instances.
+        :type keys: iterable
+        :param keys: A list or other iterable of either key_names or
+            (key_name, versionid) pairs or Key instances.  It is read
+            1000 keys at a time, so it can be a generator over far more
+            keys than would fit in memory, such as ``bucket.list()``.
 
         :type quiet: boolean
         :param quiet: In quiet mode the response includes only keys
             where the delete operation encountered an error. For a
             successful deletion, the operation does not return any
-            information about the delete in the response body.
+            information about the delete in the response body.  The
+            result then only holds the errors, and the number of keys
+            deleted in ``deleted_count``, so its size doesn't grow with
+            the number of keys.
 
         :type mfa_token: tuple or list of strings
         :param mfa_token: A tuple or list consisting of the serial
@@ -657,25 +720,47 @@ class Bucket(object):
             required anytime you are deleting versioned objects from a
             bucket that has the MFADelete option on the bucket.
 
+        :type parallel: int
+        :param parallel: (optional) The number of delete requests to
+            keep in flight at once, each from its own thread.  The next
+            batches are built while they are sent.
+
         :returns: An instance of MultiDeleteResult
         """
-        ikeys = iter(keys)
         result = MultiDeleteResult(self)
-        provider = self.connection.provider
-        query_args = 'delete'
+        mutex = threading.Lock()
+
+        def send(batch):
+            data, sent, invalid = batch
+            if sent:
+                batch_result = self._delete_batch(data, mfa_token, headers)
+            else:
+                batch_result = MultiDeleteResult(self)
+            with mutex:
+                result.errors.extend(invalid)
+                result.merge(batch_result, sent)
+
+        batches = self._delete_batches(iter(keys), quiet)
+        if parallel and parallel > 1:
+            run_pipelined(send, batches, parallel)
+        else:
+            for batch in batches:
+                send(batch)
+        return result
 
-        def delete_keys2(hdrs):
-            hdrs = hdrs or {}
-            data = u"""<?xml version="1.0" encoding="UTF-8"?>"""
-            data += u"<Delete>"
+    def _delete_batches(self, ikeys, quiet):
+        """
+        Yields ``(body, count, invalid)`` for each Multi-object delete
+        request needed to delete ``ikeys``: the request body, the number
+        of keys in it, and Errors for the items that can't be deleted.
+        """
+        while True:
+            parts = [u'<?xml version="1.0" encoding="UTF-8"?><Delete>']
             if quiet:
-                data += u"<Quiet>true</Quiet>"
+                parts.append(u'<Quiet>true</Quiet>')
             count = 0
-            while count < 1000:
-                try:
-                    key = next(ikeys)
-                except StopIteration:
-                    break
+            invalid = []
+            for key in ikeys:
                 if isinstance(key, six.string_types):
                     key_name = key
                     version_id = None
@@ -692,42 +777,47 @@ class Bucket(object):
                         key_name = repr(key)   # try get a string
                         code = 'InvalidArgument'  # other unknown type
                     message = 'Invalid. No delete action taken for this object.'
-                    error = Error(key_name, code=code, message=message)
-                    result.errors.append(error)
+                    invalid.append(Error(key_name, code=code,
+                                         message=message))
                     continue
                 count += 1
-                data += u"<Object><Key>%s</Key>" % xml.sax.saxutils.escape(key_name)
+                parts.append(u'<Object><Key>%s</Key>' %
+                             xml.sax.saxutils.escape(key_name))
                 if version_id:
-                    data += u"<VersionId>%s</VersionId>" % version_id
-                data += u"</Object>"
-            data += u"</Delete>"
-            if count <= 0:
-                return False  # no more
-            data = data.encode('utf-8')
-            fp = BytesIO(data)
-            md5 = boto.utils.compute_md5(fp)
-            hdrs['Content-MD5'] = md5[1]
-            hdrs['Content-Type'] = 'text/xml'
-            if mfa_token:
-                hdrs[provider.mfa_header] = ' '.join(mfa_token)
-            response = self.connection.make_request('POST', self.name,
-                                                    headers=hdrs,
-                                                    query_args=query_args,
-                                                    data=data)
-            body = response.read()
-            if response.status == 200:
-                h = handler.XmlHandler(result, self)
-                if not isinstance(body, bytes):
-                    body = body.encode('utf-8')
-                xml.sax.parseString(body, h)
-                return count >= 1000  # more?
-            else:
-                raise provider.storage_response_error(response.status,
-                                                      response.reason,
-                                                      body)
-        while delete_keys2(headers):
-            pass
-        return result
+                    parts.append(u'<VersionId>%s</VersionId>' % version_id)
+                parts.append(u'</Object>')
+                if count >= 1000:
+                    break
+            parts.append(u'</Delete>')
+            if count or invalid:
+                yield u''.join(parts).encode('utf-8'), count, invalid
+            if count < 1000:
+                return
+
+    def _delete_batch(self, data, mfa_token=None, headers=None):
+        provider = self.connection.provider
+        hdrs = dict(headers or {})
+        md5 = boto.utils.compute_md5(BytesIO(data))
+        hdrs['Content-MD5'] = md5[1]
+        hdrs['Content-Type'] = 'text/xml'
+        if mfa_token:
+            hdrs[provider.mfa_header] = ' '.join(mfa_token)
+        response = self.connection.make_request('POST', self.name,
+                                                headers=hdrs,
+                                                query_args='delete',
+                                                data=data)
+        body = response.read()
+        if response.status == 200:
+            result = MultiDeleteResult(self)
+            h = handler.XmlHandler(result, self)
+            if not isinstance(body, bytes):
+                body = body.encode('utf-8')
+            xml.sax.parseString(body, h)
+            return result
+        else:
+            raise provider.storage_response_error(response.status,
+                                                  response.reason,
+                                                  body)
 
     def delete_key(self, key_name, headers=None, version_id=None,
                    mfa_token=None):
@@ -790,7 +880,8 @@ class Bucket(object):
     def copy_key(self, new_key_name, src_bucket_name,
                  src_key_name, metadata=None, src_version_id=None,
                  storage_class='STANDARD', preserve_acl=False,
-                 encrypt_key=False, headers=None, query_args=None):
+                 encrypt_key=False, headers=None, query_args=None,
+                 parallel=None, part_size=None):
         """
         Create a new key in the bucket by copying another existing key.
 
@@ -841,9 +932,29 @@ class Bucket(object):
         :param query_args: A string of additional querystring arguments
             to append to the request
 
+        :type parallel: int
+        :param parallel: (optional) If greater than 1, a source larger
+            than one part is copied as a multipart upload, with this
+            many parts copied by S3 at once.  This is also how objects
+            over 5GB are copied.  See
+            :class:`boto.s3.transfer.ParallelCopier`.
+
+        :type part_size: int
+        :param part_size: (optional) With ``parallel``, the size of each
+            part in bytes.
+
         :rtype: :class:`boto.s3.key.Key` or subclass
         :returns: An instance of the newly created key object
         """
+        if parallel and parallel > 1 and not query_args:
+            copier = ParallelCopier(self, num_threads=parallel,
+                                    part_size=part_size)
+            return copier.copy(new_key_name, src_bucket_name, src_key_name,
+                               metadata=metadata,
+                               src_version_id=src_version_id,
+                               storage_class=storage_class,
+                               preserve_acl=preserve_acl,
+                               encrypt_key=encrypt_key, headers=headers)
         headers = headers or {}
         provider = self.connection.provider
         src_key_name = boto.utils.get_utf8_value(src_key_name)
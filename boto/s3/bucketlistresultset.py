@@ -19,6 +19,16 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 
+import os
+import sys
+import threading
+
+from boto.compat import Queue, six, urllib
+from boto.s3.prefix import Prefix
+from boto.s3.transfer import run_in_threads
+from boto.vendored.six.moves.queue import Empty, Full
+
+
 def bucket_lister(bucket, prefix='', delimiter='', marker='', headers=None,
                   encoding_type=None):
     """
@@ -26,16 +36,194 @@ def bucket_lister(bucket, prefix='', delimiter='', marker='', headers=None,
     """
     more_results = True
     k = None
+    # Buckets that can stream their listings hand out each key as soon
+    # as it has been parsed.
+    lister = getattr(bucket, 'iter_all_keys', None)
     while more_results:
-        rs = bucket.get_all_keys(prefix=prefix, marker=marker,
-                                 delimiter=delimiter, headers=headers,
-                                 encoding_type=encoding_type)
-        for k in rs:
+        if lister is not None:
+            rs, keys = lister(prefix=prefix, marker=marker,
+                              delimiter=delimiter, headers=headers,
+                              encoding_type=encoding_type)
+        else:
+            rs = keys = bucket.get_all_keys(prefix=prefix, marker=marker,
+                                            delimiter=delimiter,
+                                            headers=headers,
+                                            encoding_type=encoding_type)
+        for k in keys:
             yield k
         if k:
             marker = rs.next_marker or k.name
         more_results= rs.is_truncated
 
+# The characters after the prefix at which parallel listings probe for
+# shard boundaries, in the order S3 lists them.
+PROBE_CHARACTERS = ('!-./0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_'
+                    'abcdefghijklmnopqrstuvwxyz~')
+
+# How many times find_shards may narrow down its probes.
+MAX_PROBE_ROUNDS = 32
+
+# Pages a shard may list ahead of the consumer.
+SHARD_QUEUE_SIZE = 4
+
+_SHARD_DONE = object()
+
+
+def _key_name(name, encoding_type):
+    # Markers and shard bounds compare raw key names, not encoded ones.
+    if encoding_type == 'url':
+        return urllib.parse.unquote_plus(name)
+    return name
+
+
+def find_shards(bucket, prefix='', marker='', headers=None,
+                encoding_type=None, num_shards=40, num_threads=10):
+    """
+    Splits the keys of a bucket after ``marker`` into up to ``num_shards``
+    ranges that can be listed independently.
+
+    The boundaries are real key names, found by asking (concurrently) for
+    the first key after ``prefix`` plus each of ``PROBE_CHARACTERS``.
+    When that finds too few keys because they all share a longer prefix
+    (``logs/2014/...``), the probes are repeated under it.
+
+    :rtype: list
+    :return: A list of ``(marker, last)`` tuples; a shard holds the keys
+        after ``marker`` up to and including ``last``, or to the end of
+        the listing if ``last`` is None.
+    """
+    root = prefix
+    boundaries = []
+    for i in range(MAX_PROBE_ROUNDS):
+        def probe(character):
+            start = max(root + character, marker)
+            rs = bucket.get_all_keys(prefix=prefix, marker=start, max_keys=1,
+                                     headers=headers,
+                                     encoding_type=encoding_type)
+            for key in rs:
+                return _key_name(key.name, encoding_type)
+        found = set(run_in_threads(probe, PROBE_CHARACTERS, num_threads))
+        found.discard(None)
+        if len(found) < len(boundaries):
+            break
+        boundaries = sorted(found)
+        if len(boundaries) > 2:
+            break
+        if len(boundaries) == 1:
+            # All we know is that the keys continue with this character.
+            common = boundaries[0][:len(root) + 1]
+        else:
+            common = os.path.commonprefix(boundaries)
+        if len(common) <= len(root):
+            break
+        root = common
+    if len(boundaries) >= num_shards:
+        step = len(boundaries) / float(num_shards)
+        boundaries = [boundaries[int(i * step)] for i in range(num_shards)]
+    shards = []
+    for last in boundaries[:-1] + [None]:
+        shards.append((marker, last))
+        marker = last
+    return shards
+
+
+def _list_shard(bucket, shard, prefix, delimiter, headers, encoding_type,
+                emit):
+    marker, last = shard
+    while True:
+        rs = bucket.get_all_keys(prefix=prefix, marker=marker,
+                                 delimiter=delimiter, headers=headers,
+                                 encoding_type=encoding_type)
+        page = []
+        for k in rs:
+            if (last is not None and
+                    _key_name(k.name, encoding_type) > last):
+                emit(page)
+                return
+            page.append(k)
+        emit(page)
+        if not rs.is_truncated or not page:
+            return
+        marker = _key_name(rs.next_marker or page[-1].name, encoding_type)
+
+
+def parallel_bucket_lister(bucket, prefix='', delimiter='', marker='',
+                           headers=None, encoding_type=None, num_threads=10,
+                           ordered=True):
+    """
+    A generator function for listing keys in a bucket with several
+    requests in flight at once.
+
+    The keyspace is split into shards by :py:func:`find_shards` and the
+    shards are listed by ``num_threads`` threads over the bucket's shared
+    connection pool.  With ``ordered`` the keys come out in the same
+    (lexical) order as :py:func:`bucket_lister`; threads list at most
+    ``SHARD_QUEUE_SIZE`` pages ahead of the shard being consumed.
+    Otherwise keys are yielded as soon as any shard has listed them.
+    """
+    shards = find_shards(bucket, prefix=prefix, marker=marker,
+                         headers=headers, encoding_type=encoding_type,
+                         num_shards=num_threads * 4, num_threads=num_threads)
+    stop = threading.Event()
+    if ordered:
+        queues = [Queue(SHARD_QUEUE_SIZE) for shard in shards]
+    else:
+        queues = [Queue(SHARD_QUEUE_SIZE * num_threads)] * len(shards)
+    work = Queue()
+    for i in range(len(shards)):
+        work.put(i)
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def worker():
+        while not stop.is_set():
+            try:
+                i = work.get_nowait()
+            except Empty:
+                return
+            try:
+                _list_shard(bucket, shards[i], prefix, delimiter, headers,
+                            encoding_type, lambda page: put(queues[i], page))
+            except Exception:
+                put(queues[i], sys.exc_info())
+            put(queues[i], _SHARD_DONE)
+
+    threads = [threading.Thread(target=worker)
+               for i in range(min(num_threads, len(shards)))]
+    for t in threads:
+        t.daemon = True
+        t.start()
+
+    # With a delimiter, a common prefix can straddle two shards.
+    prefixes = set()
+    try:
+        if ordered:
+            sources = queues
+        else:
+            sources = queues[:1] * len(shards)
+        for q in sources:
+            while True:
+                page = q.get()
+                if page is _SHARD_DONE:
+                    break
+                if isinstance(page, tuple):
+                    six.reraise(*page)
+                for k in page:
+                    if isinstance(k, Prefix):
+                        if k.name in prefixes:
+                            continue
+                        prefixes.add(k.name)
+                    yield k
+    finally:
+        stop.set()
+
+
 class BucketListResultSet(object):
     """
     A resultset for listing keys within a bucket.  Uses the bucket_lister
@@ -46,15 +234,26 @@ class BucketListResultSet(object):
     """
 
     def __init__(self, bucket=None, prefix='', delimiter='', marker='',
-                 headers=None, encoding_type=None):
+                 headers=None, encoding_type=None, parallel=None,
+                 ordered=True):
         self.bucket = bucket
         self.prefix = prefix
         self.delimiter = delimiter
         self.marker = marker
         self.headers = headers
         self.encoding_type = encoding_type
+        self.parallel = parallel
+        self.ordered = ordered
 
     def __iter__(self):
+        if self.parallel and self.parallel > 1:
+            return parallel_bucket_lister(self.bucket, prefix=self.prefix,
+                                          delimiter=self.delimiter,
+                                          marker=self.marker,
+                                          headers=self.headers,
+                                          encoding_type=self.encoding_type,
+                                          num_threads=self.parallel,
+                                          ordered=self.ordered)
         return bucket_lister(self.bucket, prefix=self.prefix,
                              delimiter=self.delimiter, marker=self.marker,
                              headers=self.headers,
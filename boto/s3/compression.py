@@ -0,0 +1,198 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+Streaming compression of key contents.
+
+:py:class:`CompressingReader` wraps a file so that reading it returns the
+compressed contents, which lets an upload compress as it sends instead of
+staging a compressed copy first; :py:class:`DecompressingWriter` wraps one
+so that the compressed contents written to it are stored decompressed.
+Both hold only a buffer's worth of data at a time.
+
+``gzip`` uses :py:mod:`zlib`; ``zstd`` needs the ``zstandard`` package.
+"""
+import zlib
+
+from boto.exception import BotoClientError, StorageDataError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+ENCODINGS = ('gzip', 'zstd')
+
+# Tells zlib to write (or expect) a gzip header and trailer.
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def _check_encoding(encoding):
+    if encoding not in ENCODINGS:
+        raise BotoClientError('Unsupported content encoding: %s' % encoding)
+    if encoding == 'zstd' and zstandard is None:
+        raise BotoClientError('The zstandard package is needed for zstd '
+                              'content encoding')
+
+
+def decodable_encoding(content_encoding):
+    """
+    Returns the one of :py:data:`ENCODINGS` that a ``Content-Encoding``
+    header value names, or None if it names none of them, or several.
+    """
+    if not content_encoding:
+        return None
+    encoding = content_encoding.strip().lower()
+    if encoding == 'x-gzip':
+        encoding = 'gzip'
+    if encoding not in ENCODINGS:
+        return None
+    return encoding
+
+
+def compressor(encoding, level=None):
+    """
+    Returns an object with ``compress(data)`` and ``flush()`` methods
+    that produce a stream in ``encoding``.
+    """
+    _check_encoding(encoding)
+    if encoding == 'gzip':
+        if level is None:
+            level = 6
+        return zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+    if level is None:
+        level = 3
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+def decompressor(encoding):
+    """
+    Returns an object with a ``decompress(data)`` method that decodes a
+    stream in ``encoding``, and an ``eof`` attribute that becomes true at
+    its end.
+    """
+    _check_encoding(encoding)
+    if encoding == 'gzip':
+        return zlib.decompressobj(_GZIP_WBITS)
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+class CompressingReader(object):
+    """
+    A read-only file whose contents are those of ``fp``, from its current
+    position and up to ``size`` bytes if given, compressed with
+    ``encoding``.
+
+    It can be rewound, by seeking back to the start, if ``fp`` can be;
+    ``fp`` is then read and compressed again.
+    """
+
+    def __init__(self, fp, encoding, size=None, level=None,
+                 read_size=64 * 1024):
+        self.fp = fp
+        self.encoding = encoding
+        self.size = size
+        self.level = level
+        self.read_size = read_size
+        try:
+            self.start = fp.tell()
+        except (AttributeError, IOError):
+            self.start = None
+        self._reset()
+
+    def _reset(self):
+        self.compressor = compressor(self.encoding, self.level)
+        self.buffer = b''
+        self.position = 0
+        self.bytes_read = 0
+        self.finished = False
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=0):
+        if whence != 0 or offset != 0:
+            raise IOError('A CompressingReader can only seek to the start')
+        if self.position:
+            if self.start is None:
+                raise IOError('Cannot rewind: fp does not support seeking')
+            self.fp.seek(self.start)
+            self._reset()
+
+    def _fill(self, amount):
+        chunks = [self.buffer]
+        buffered = len(self.buffer)
+        while buffered < amount and not self.finished:
+            want = self.read_size
+            if self.size is not None:
+                want = min(want, self.size - self.bytes_read)
+            data = self.fp.read(want) if want > 0 else b''
+            if data and not isinstance(data, bytes):
+                data = data.encode('utf-8')
+            if data:
+                self.bytes_read += len(data)
+                out = self.compressor.compress(data)
+            else:
+                out = self.compressor.flush()
+                self.finished = True
+            chunks.append(out)
+            buffered += len(out)
+        self.buffer = b''.join(chunks)
+
+    def read(self, amount=-1):
+        if amount is None or amount < 0:
+            amount = float('inf')
+        self._fill(amount)
+        if amount >= len(self.buffer):
+            data, self.buffer = self.buffer, b''
+        else:
+            data = self.buffer[:amount]
+            self.buffer = self.buffer[amount:]
+        self.position += len(data)
+        return data
+
+
+class DecompressingWriter(object):
+    """
+    A write-only file that decompresses what is written to it, a stream
+    in ``encoding``, into ``fp``.  :py:meth:`finish` must be called at
+    the end of the stream.
+    """
+
+    def __init__(self, fp, encoding):
+        self.fp = fp
+        self.name = getattr(fp, 'name', None)
+        self.decompressor = decompressor(encoding)
+
+    def write(self, data):
+        data = self.decompressor.decompress(data)
+        if data:
+            self.fp.write(data)
+
+    def finish(self):
+        """
+        Raises :py:class:`boto.exception.StorageDataError` if the stream
+        written so far was cut short.
+        """
+        if not getattr(self.decompressor, 'eof', True):
+            raise StorageDataError('Compressed content ended unexpectedly')
@@ -163,6 +163,8 @@ class S3Connection(AWSAuthConnection):
     DefaultHost = boto.config.get('s3', 'host', 's3.amazonaws.com')
     DefaultCallingFormat = boto.config.get('s3', 'calling_format', 'boto.s3.connection.SubdomainCallingFormat')
     QueryString = 'Signature=%s&Expires=%d&AWSAccessKeyId=%s'
+    # How SigV4 uploads sign their payload; see ``payload_signing``.
+    PayloadSigningModes = ('signed', 'streaming', 'unsigned')
 
     def __init__(self, aws_access_key_id=None, aws_secret_access_key=None,
                  is_secure=True, port=None, proxy=None, proxy_port=None,
@@ -171,7 +173,8 @@ class S3Connection(AWSAuthConnection):
                  calling_format=DefaultCallingFormat, path='/',
                  provider='aws', bucket_class=Bucket, security_token=None,
                  suppress_consec_slashes=True, anon=False,
-                 validate_certs=None, profile_name=None):
+                 validate_certs=None, profile_name=None,
+                 payload_signing=None, key_buffer_size=None):
         no_host_provided = False
         if host is NoHostProvided:
             no_host_provided = True
@@ -181,6 +184,27 @@ class S3Connection(AWSAuthConnection):
         self.calling_format = calling_format
         self.bucket_class = bucket_class
         self.anon = anon
+        # With SigV4, 'signed' hashes an upload before sending it,
+        # 'streaming' signs it chunk by chunk as it is sent and 'unsigned'
+        # leaves the payload out of the signature (HTTPS only).
+        if payload_signing is None:
+            payload_signing = boto.config.get('s3', 'payload_signing',
+                                              None) or 'signed'
+        if payload_signing not in self.PayloadSigningModes:
+            raise ValueError('payload_signing must be one of %s, not %r' %
+                             (', '.join(self.PayloadSigningModes),
+                              payload_signing))
+        self.payload_signing = payload_signing
+        # How many bytes keys read per call when transferring data, or
+        # 'adaptive'; None leaves it to ``Key.BufferSize``.
+        if key_buffer_size is None:
+            key_buffer_size = boto.config.get('s3', 'key_buffer_size', None)
+        if key_buffer_size is not None and key_buffer_size != 'adaptive':
+            key_buffer_size = int(key_buffer_size)
+            if key_buffer_size <= 0:
+                raise ValueError('key_buffer_size must be positive or '
+                                 "'adaptive', not %r" % key_buffer_size)
+        self.key_buffer_size = key_buffer_size
         super(S3Connection, self).__init__(host,
                 aws_access_key_id, aws_secret_access_key,
                 is_secure, port, proxy, proxy_port, proxy_user, proxy_pass,
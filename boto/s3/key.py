@@ -26,25 +26,106 @@ import hashlib
 import mimetypes
 import os
 import re
+import stat
 import base64
 import binascii
-import math
+import time
 from hashlib import md5
+try:
+    import ssl
+except ImportError:
+    ssl = None
 import boto.utils
 from boto.compat import BytesIO, six, urllib, encodebytes
 
 from boto.exception import BotoClientError
 from boto.exception import StorageDataError
 from boto.exception import PleaseRetryException
+from boto.auth import S3HmacAuthV4Handler
 from boto.provider import Provider
+from boto.s3.compression import CompressingReader, DecompressingWriter
+from boto.s3.compression import decodable_encoding
 from boto.s3.keyfile import KeyFile
+from boto.s3.transfer import DEFAULT_PART_SIZE, complete_xml
+from boto.s3.transfer import ParallelDownloader, ParallelUploader
 from boto.s3.user import User
 from boto import UserAgent
-from boto.utils import compute_md5, compute_hash
+from boto.utils import compute_md5, compute_hash, MultiHasher
 from boto.utils import find_matching_headers
 from boto.utils import merge_headers_by_name
 
 
+class _ReadSizer(object):
+    """
+    Decides how many bytes each read of a transfer asks for.
+
+    A fixed sizer always uses ``size``.  An adaptive one starts there and
+    doubles the size whenever a whole read, together with the send or
+    write that followed it, took less than ``target`` seconds, up to
+    ``max_size``; it halves it again, never below the starting size, when
+    one takes more than four times that.  Fast links so end up moving
+    data in fewer, larger calls.
+    """
+
+    def __init__(self, size, adaptive=False, max_size=1024 * 1024,
+                 target=0.01):
+        self.size = self.min_size = size
+        self.adaptive = adaptive
+        self.max_size = max(max_size, size)
+        self.target = target
+        self.last = time.time()
+
+    def record(self, amount):
+        """Records that ``amount`` bytes were just transferred."""
+        if not self.adaptive:
+            return
+        now = time.time()
+        elapsed = now - self.last
+        self.last = now
+        if amount >= self.size and elapsed < self.target:
+            self.size = min(self.size * 2, self.max_size)
+        elif elapsed > self.target * 4:
+            self.size = max(self.size // 2, self.min_size)
+
+
+class _ProgressReporter(object):
+    """
+    Calls a ``cb(transferred, total)`` progress callback at the start of a
+    transfer and then at most ``num_cb - 1`` more times, spaced by bytes
+    transferred so that it doesn't depend on how much each read returns.
+    A negative ``num_cb`` reports after every read; when ``total`` is
+    unknown (0), progress is reported every megabyte.
+    """
+
+    def __init__(self, cb, num_cb, total):
+        self.cb = cb
+        self.total = total
+        self.reported = 0
+        if not cb:
+            self.interval = None
+        elif num_cb < 0:
+            self.interval = 0
+        elif not total:
+            self.interval = 1024 * 1024
+        elif num_cb > 1:
+            self.interval = total / (num_cb - 1.0)
+        else:
+            self.interval = None
+        if cb:
+            cb(0, total)
+
+    def update(self, transferred):
+        if (self.interval is not None and
+                transferred - self.reported >= self.interval):
+            self.reported = transferred
+            self.cb(transferred, self.total)
+
+    def done(self, transferred):
+        if self.cb and transferred > 0 and transferred != self.reported:
+            self.reported = transferred
+            self.cb(transferred, self.total)
+
+
 class Key(object):
     """
     Represents a key (object) in an S3 bucket.
@@ -84,6 +165,12 @@ class Key(object):
 
     BufferSize = boto.config.getint('Boto', 'key_buffer_size', 8192)
 
+    # The largest read an adaptive transfer grows to.
+    MaxBufferSize = 1024 * 1024
+
+    # Size of the signed chunks of a streaming SigV4 upload.
+    StreamingChunkSize = 64 * 1024
+
     # The object metadata fields a user can set, other than custom metadata
     # fields (i.e., those beginning with a provider-specific prefix like
     # x-amz-meta).
@@ -119,6 +206,9 @@ class Key(object):
         self.source_version_id = None
         self.delete_marker = False
         self.encrypted = None
+        # The SHA-256 of the next upload's payload, when it was computed
+        # along with its MD5.
+        self._payload_sha256 = None
         # If the object is being restored, this attribute will be set to True.
         # If the object is restored, it will be set to False.  Otherwise this
         # value will be None. If the restore is completed (ongoing_restore =
@@ -703,7 +793,8 @@ class Key(object):
                                                    version_id)
 
     def send_file(self, fp, headers=None, cb=None, num_cb=10,
-                  query_args=None, chunked_transfer=False, size=None):
+                  query_args=None, chunked_transfer=False, size=None,
+                  buffer_size=None):
         """
         Upload a file to a key into a bucket on S3.
 
@@ -740,14 +831,90 @@ class Key(object):
             up into different ranges to be uploaded. If not specified,
             the default behaviour is to read all bytes from the file
             pointer. Less bytes may be available.
+
+        :type buffer_size: int or string
+        :param buffer_size: (optional) How many bytes to read from the file per call, or
+            'adaptive' to start at ``BufferSize`` and grow the reads while
+            the transfer keeps up.  Defaults to the connection's
+            ``key_buffer_size`` and then to ``BufferSize``.
         """
         self._send_file_internal(fp, headers=headers, cb=cb, num_cb=num_cb,
                                  query_args=query_args,
-                                 chunked_transfer=chunked_transfer, size=size)
+                                 chunked_transfer=chunked_transfer, size=size,
+                                 buffer_size=buffer_size)
+
+    def _read_sizer(self, buffer_size=None):
+        """
+        Returns the :py:class:`_ReadSizer` for a transfer.  ``buffer_size``
+        (an int or 'adaptive') defaults to the connection's
+        ``key_buffer_size`` and then to ``BufferSize``.
+        """
+        if buffer_size is None:
+            connection = getattr(self.bucket, 'connection', None)
+            buffer_size = getattr(connection, 'key_buffer_size', None)
+        if buffer_size == 'adaptive':
+            return _ReadSizer(self.BufferSize, adaptive=True,
+                              max_size=self.MaxBufferSize)
+        if buffer_size is None:
+            buffer_size = self.BufferSize
+        return _ReadSizer(int(buffer_size))
+
+    def _payload_signing(self):
+        """
+        Returns how the payload of an upload is signed: None when SigV4
+        isn't in use, otherwise 'signed', 'streaming' or 'unsigned'.
+        'unsigned' falls back to 'signed' on plain HTTP connections.
+        """
+        conn = self.bucket.connection
+        if 'hmac-v4-s3' not in conn._required_auth_capability():
+            return None
+        mode = getattr(conn, 'payload_signing', 'signed')
+        if mode == 'unsigned' and not conn.is_secure:
+            mode = 'signed'
+        return mode
+
+    def _streaming_content_length(self, size):
+        """
+        Returns the Content-Length of a ``size`` byte body once it is
+        framed into signed chunks of ``StreamingChunkSize`` bytes.
+        """
+        # ";chunk-signature=" + 64 hex digits + two CRLFs.
+        framing = 17 + 64 + 4
+        chunk_size = self.StreamingChunkSize
+        full_chunks, remainder = divmod(size, chunk_size)
+        length = full_chunks * (len('%x' % chunk_size) + framing + chunk_size)
+        if remainder:
+            length += len('%x' % remainder) + framing + remainder
+        # The body ends with a signed, zero-length chunk.
+        return length + 1 + framing
+
+    def _sendfile_socket(self, http_conn, fp):
+        """
+        Returns the socket to ``sendfile`` the body to, or None unless
+        ``fp`` is a regular file opened in binary mode and the connection
+        is plain HTTP on a Python with ``socket.sendfile``.
+        """
+        sock = getattr(http_conn, 'sock', None)
+        if sock is None or not hasattr(sock, 'sendfile'):
+            return None
+        if ssl is not None and isinstance(sock, ssl.SSLSocket):
+            return None
+        if 'b' not in getattr(fp, 'mode', 'b'):
+            return None
+        try:
+            if not stat.S_ISREG(os.fstat(fp.fileno()).st_mode):
+                return None
+        except (AttributeError, ValueError, EnvironmentError):
+            return None
+        return sock
+
+    def _chunk_header(self, chunk, sign_chunk):
+        return ('%x;chunk-signature=%s\r\n' %
+                (len(chunk), sign_chunk(chunk))).encode('ascii')
 
     def _send_file_internal(self, fp, headers=None, cb=None, num_cb=10,
                             query_args=None, chunked_transfer=False, size=None,
-                            hash_algs=None):
+                            hash_algs=None, buffer_size=None):
         provider = self.bucket.connection.provider
         try:
             spos = fp.tell()
@@ -761,6 +928,19 @@ class Key(object):
             hash_algs = {'md5': md5}
         digesters = dict((alg, hash_algs[alg]()) for alg in hash_algs or {})
 
+        # Set by set_contents_from_file when it hashed the data already.
+        payload_sha256, self._payload_sha256 = self._payload_sha256, None
+
+        payload_signing = None
+        if not chunked_transfer:
+            payload_signing = self._payload_signing()
+            if payload_signing == 'streaming' and self.size is None:
+                # The framed Content-Length can't be known up front.
+                payload_signing = 'signed'
+        if payload_signing == 'streaming':
+            # Every chunk is signed, so they all have to be the same size.
+            buffer_size = self.StreamingChunkSize
+
         def sender(http_conn, method, path, data, headers):
             # This function is called repeatedly for temporary retries
             # so we must be sure the file pointer is pointing at the
@@ -795,47 +975,77 @@ class Key(object):
             if getattr(http_conn, 'debuglevel', 0) < 4:
                 http_conn.set_debuglevel(0)
 
+            sign_chunk = None
+            if payload_signing == 'streaming':
+                auth_handler = self.bucket.connection._auth_handler
+                sign_chunk = auth_handler.chunk_signer(headers)
+
             data_len = 0
-            if cb:
-                if size:
-                    cb_size = size
-                elif self.size:
-                    cb_size = self.size
-                else:
-                    cb_size = 0
-                if chunked_transfer and cb_size == 0:
-                    # For chunked Transfer, we call the cb for every 1MB
-                    # of data transferred, except when we know size.
-                    cb_count = (1024 * 1024) / self.BufferSize
-                elif num_cb > 1:
-                    cb_count = int(
-                        math.ceil(cb_size / self.BufferSize / (num_cb - 1.0)))
-                elif num_cb < 0:
-                    cb_count = -1
-                else:
-                    cb_count = 0
-                i = 0
-                cb(data_len, cb_size)
+            sizer = self._read_sizer(buffer_size)
+            progress = _ProgressReporter(cb, num_cb, size or self.size or 0)
 
             bytes_togo = size
-            if bytes_togo and bytes_togo < self.BufferSize:
-                chunk = fp.read(bytes_togo)
-            else:
-                chunk = fp.read(self.BufferSize)
-
-            if not isinstance(chunk, bytes):
-                chunk = chunk.encode('utf-8')
-
             if spos is None:
                 # read at least something from a non-seekable fp.
                 self.read_from_stream = True
+
+            sock = None
+            if not (chunked_transfer or sign_chunk or digesters):
+                sock = self._sendfile_socket(http_conn, fp)
+            if sock is not None:
+                # Nothing needs to see the data, so let the kernel copy the
+                # file straight to the socket, in one go or, if progress is
+                # reported, in runs of the reporting interval.
+                segment = None
+                if progress.interval is not None:
+                    segment = max(int(progress.interval), sizer.size)
+                while True:
+                    count = segment
+                    if bytes_togo:
+                        count = min(count or bytes_togo, bytes_togo)
+                    sent = sock.sendfile(fp, fp.tell(), count)
+                    data_len += sent
+                    if bytes_togo:
+                        bytes_togo -= sent
+                    if (not sent or segment is None or
+                            (bytes_togo is not None and bytes_togo <= 0)):
+                        break
+                    progress.update(data_len)
+                chunk = None
+            elif hasattr(fp, 'readinto'):
+                # Read into one reusable buffer rather than a new bytes
+                # object per chunk, and hash and send slices of it.  The
+                # buffer is only replaced when an adaptive read outgrows it.
+                buf = [memoryview(bytearray(sizer.size))]
+
+                def read_chunk(amount):
+                    if amount > len(buf[0]):
+                        buf[0] = memoryview(bytearray(amount))
+                    view = buf[0]
+                    return view[:fp.readinto(view[:amount]) or 0]
+            else:
+                def read_chunk(amount):
+                    chunk = fp.read(amount)
+                    if isinstance(chunk, six.text_type):
+                        chunk = chunk.encode('utf-8')
+                    return chunk
+
+            if sock is None:
+                if bytes_togo and bytes_togo < sizer.size:
+                    chunk = read_chunk(bytes_togo)
+                else:
+                    chunk = read_chunk(sizer.size)
             while chunk:
                 chunk_len = len(chunk)
                 data_len += chunk_len
                 if chunked_transfer:
-                    http_conn.send('%x;\r\n' % chunk_len)
+                    http_conn.send(('%x;\r\n' % chunk_len).encode('ascii'))
+                    http_conn.send(chunk)
+                    http_conn.send(b'\r\n')
+                elif sign_chunk:
+                    http_conn.send(self._chunk_header(chunk, sign_chunk))
                     http_conn.send(chunk)
-                    http_conn.send('\r\n')
+                    http_conn.send(b'\r\n')
                 else:
                     http_conn.send(chunk)
                 for alg in digesters:
@@ -844,31 +1054,27 @@ class Key(object):
                     bytes_togo -= chunk_len
                     if bytes_togo <= 0:
                         break
-                if cb:
-                    i += 1
-                    if i == cb_count or cb_count == -1:
-                        cb(data_len, cb_size)
-                        i = 0
-                if bytes_togo and bytes_togo < self.BufferSize:
-                    chunk = fp.read(bytes_togo)
+                progress.update(data_len)
+                sizer.record(chunk_len)
+                if bytes_togo and bytes_togo < sizer.size:
+                    chunk = read_chunk(bytes_togo)
                 else:
-                    chunk = fp.read(self.BufferSize)
-
-                if not isinstance(chunk, bytes):
-                    chunk = chunk.encode('utf-8')
+                    chunk = read_chunk(sizer.size)
 
             self.size = data_len
 
             for alg in digesters:
                 self.local_hashes[alg] = digesters[alg].digest()
 
+            if sign_chunk:
+                http_conn.send(self._chunk_header(b'', sign_chunk) + b'\r\n')
+
             if chunked_transfer:
-                http_conn.send('0\r\n')
+                http_conn.send(b'0\r\n')
                     # http_conn.send("Content-MD5: %s\r\n" % self.base64md5)
-                http_conn.send('\r\n')
+                http_conn.send(b'\r\n')
 
-            if cb and (cb_count <= 1 or i > 0) and data_len > 0:
-                cb(data_len, cb_size)
+            progress.done(data_len)
 
             http_conn.set_debuglevel(save_debug)
             self.bucket.connection.debug = save_debug
@@ -925,14 +1131,37 @@ class Key(object):
             headers['Transfer-Encoding'] = 'chunked'
             #if not self.base64md5:
             #    headers['Trailer'] = "Content-MD5"
+        elif payload_signing == 'streaming':
+            headers['Content-Length'] = str(
+                self._streaming_content_length(self.size))
+            headers['x-amz-decoded-content-length'] = str(self.size)
+            encodings = ['aws-chunked']
+            if find_matching_headers('Content-Encoding', headers):
+                encodings.append(merge_headers_by_name(
+                    'Content-Encoding', headers))
+                for header in find_matching_headers('Content-Encoding',
+                                                    headers):
+                    del headers[header]
+            headers['Content-Encoding'] = ','.join(encodings)
         else:
             headers['Content-Length'] = str(self.size)
-        # This is terrible. We need a SHA256 of the body for SigV4, but to do
-        # the chunked ``sender`` behavior above, the ``fp`` isn't available to
-        # the auth mechanism (because closures). Detect if it's SigV4 & embelish
-        # while we can before the auth calculations occur.
-        if 'hmac-v4-s3' in self.bucket.connection._required_auth_capability():
-            headers['_sha256'] = compute_hash(fp, hash_algorithm=hashlib.sha256)[0]
+        if payload_signing == 'streaming':
+            headers['x-amz-content-sha256'] = \
+                S3HmacAuthV4Handler.STREAMING_PAYLOAD
+        elif payload_signing == 'unsigned':
+            headers['x-amz-content-sha256'] = \
+                S3HmacAuthV4Handler.UNSIGNED_PAYLOAD
+        elif payload_signing == 'signed':
+            # This is terrible. We need a SHA256 of the body for SigV4, but to
+            # do the chunked ``sender`` behavior above, the ``fp`` isn't
+            # available to the auth mechanism (because closures). Detect if
+            # it's SigV4 & embelish while we can before the auth calculations
+            # occur.
+            if payload_sha256 is not None:
+                headers['_sha256'] = payload_sha256
+            else:
+                headers['_sha256'] = compute_hash(
+                    fp, size=size, hash_algorithm=hashlib.sha256)[0]
         headers['Expect'] = '100-Continue'
         headers = boto.utils.merge_meta(headers, self.metadata, provider)
         resp = self.bucket.connection.make_request(
@@ -1021,6 +1250,17 @@ class Key(object):
         self.size = data_size
         return (hex_digest, b64_digest)
 
+    def _compute_md5_and_sha256(self, fp, size=None):
+        """
+        Like :meth:`compute_md5`, but also keeps the SHA-256 of the data
+        for the SigV4 signature of the upload that follows, so that the
+        file is read once for both.
+        """
+        hasher = MultiHasher({'md5': md5, 'sha256': hashlib.sha256})
+        self.size = hasher.hash_file(fp, size=size)
+        self._payload_sha256 = hasher.hexdigest('sha256')
+        return (hasher.hexdigest('md5'), hasher.base64digest('md5'))
+
     def set_contents_from_stream(self, fp, headers=None, replace=True,
                                  cb=None, num_cb=10, policy=None,
                                  reduced_redundancy=False, query_args=None,
@@ -1112,7 +1352,8 @@ class Key(object):
     def set_contents_from_file(self, fp, headers=None, replace=True,
                                cb=None, num_cb=10, policy=None, md5=None,
                                reduced_redundancy=False, query_args=None,
-                               encrypt_key=False, size=None, rewind=False):
+                               encrypt_key=False, size=None, rewind=False,
+                               buffer_size=None, compress=None):
         """
         Store an object in S3 using the name of the Key object as the
         key in S3 and the contents of the file pointed to by 'fp' as the
@@ -1185,6 +1426,19 @@ class Key(object):
             it. The default behaviour is False which reads from the
             current position of the file pointer (fp).
 
+        :type buffer_size: int or string
+        :param buffer_size: (optional) How many bytes to read from the file per call, or
+            'adaptive' to start at ``BufferSize`` and grow the reads while
+            the transfer keeps up.  Defaults to the connection's
+            ``key_buffer_size`` and then to ``BufferSize``.
+
+        :type compress: string
+        :param compress: (optional) 'gzip' or 'zstd' to compress the
+            contents as they are sent and set ``Content-Encoding``
+            accordingly.  ``md5`` is ignored; the MD5 of the compressed
+            bytes is computed as they are sent.  See
+            :meth:`_send_compressed`.
+
         :rtype: int
         :return: The number of bytes written to the key.
         """
@@ -1236,6 +1490,16 @@ class Key(object):
                 # What if different providers provide different classes?
         if hasattr(fp, 'name'):
             self.path = fp.name
+        if self.bucket is not None and compress:
+            if not self.name:
+                raise BotoClientError('Cannot determine the destination '
+                                      'object name for compressed contents')
+            if not replace:
+                if self.bucket.lookup(self.name):
+                    return
+            return self._send_compressed(fp, compress, headers=headers, cb=cb,
+                                         num_cb=num_cb, query_args=query_args,
+                                         size=size, buffer_size=buffer_size)
         if self.bucket is not None:
             if not md5 and provider.supports_chunked_transfer():
                 # defer md5 calculation to on the fly and
@@ -1256,10 +1520,19 @@ class Key(object):
                     if (re.match('^"[a-fA-F0-9]{32}"$', key.etag)):
                         etag = key.etag.strip('"')
                         md5 = (etag, base64.b64encode(binascii.unhexlify(etag)))
-                if not md5:
+                # When the SigV4 payload hash isn't computed up front either,
+                # the MD5 is computed while sending and checked against the
+                # ETag, so the file is only read once.
+                single_pass = (not md5 and self.name is not None and
+                               self._payload_signing() in ('streaming',
+                                                           'unsigned'))
+                if not md5 and not single_pass:
                     # compute_md5() and also set self.size to actual
                     # size of the bytes read computing the md5.
-                    md5 = self.compute_md5(fp, size)
+                    if self._payload_signing() == 'signed':
+                        md5 = self._compute_md5_and_sha256(fp, size)
+                    else:
+                        md5 = self.compute_md5(fp, size)
                     # adjust size if required
                     size = self.size
                 elif size:
@@ -1272,25 +1545,109 @@ class Key(object):
                     self.size = fp.tell() - spos
                     fp.seek(spos)
                     size = self.size
-                self.md5 = md5[0]
-                self.base64md5 = md5[1]
+                if single_pass:
+                    self.md5 = None
+                else:
+                    self.md5 = md5[0]
+                    self.base64md5 = md5[1]
 
             if self.name is None:
                 self.name = self.md5
             if not replace:
                 if self.bucket.lookup(self.name):
+                    self._payload_sha256 = None
                     return
 
             self.send_file(fp, headers=headers, cb=cb, num_cb=num_cb,
                            query_args=query_args,
-                           chunked_transfer=chunked_transfer, size=size)
+                           chunked_transfer=chunked_transfer, size=size,
+                           buffer_size=buffer_size)
             # return number of bytes written.
             return self.size
 
+    def _send_compressed(self, fp, compress, headers=None, cb=None, num_cb=10,
+                         query_args=None, size=None, buffer_size=None,
+                         part_size=DEFAULT_PART_SIZE):
+        """
+        Uploads the contents of ``fp`` compressed with ``compress``, which
+        happens as they are read, so the compressed size isn't known up
+        front.  Providers that support it are sent the data with chunked
+        transfer encoding.  Otherwise the compressed data is buffered
+        ``part_size`` bytes at a time: if it all fits in one buffer it is
+        sent with a single ``PUT``, and if not each buffer is sent as a
+        part of a multipart upload.  Progress is reported in compressed
+        bytes, against an unknown total.
+
+        :rtype: int
+        :return: The number of compressed bytes written to the key.
+        """
+        provider = self.bucket.connection.provider
+        headers = dict(headers or {})
+        for header in find_matching_headers('Content-Encoding', headers):
+            del headers[header]
+        headers['Content-Encoding'] = compress
+        reader = CompressingReader(fp, compress, size=size)
+        self.md5 = None
+        self.base64md5 = None
+        if provider.supports_chunked_transfer():
+            self.size = None
+            self.send_file(reader, headers=headers, cb=cb, num_cb=num_cb,
+                           query_args=query_args, chunked_transfer=True,
+                           buffer_size=buffer_size)
+            return self.size
+
+        first = reader.read(part_size)
+        second = reader.read(part_size) if len(first) == part_size else b''
+        if not second:
+            part_fp = BytesIO(first)
+            self.md5, self.base64md5 = self.compute_md5(part_fp)
+            self.send_file(part_fp, headers=headers, cb=cb, num_cb=num_cb,
+                           query_args=query_args, size=self.size,
+                           buffer_size=buffer_size)
+            return self.size
+
+        if not find_matching_headers('Content-Type', headers):
+            headers['Content-Type'] = self.DefaultContentType
+            if self.path:
+                headers['Content-Type'] = (mimetypes.guess_type(self.path)[0]
+                                           or self.DefaultContentType)
+        mp = self.bucket.initiate_multipart_upload(self.name, headers=headers,
+                                                   metadata=self.metadata)
+        progress = _ProgressReporter(cb, num_cb, 0)
+        sent = 0
+        etags = []
+        data = first
+        try:
+            while data:
+                part_key = mp.upload_part_from_file(BytesIO(data),
+                                                    len(etags) + 1)
+                etags.append(part_key.etag)
+                sent += len(data)
+                progress.update(sent)
+                if second:
+                    data, second = second, None
+                else:
+                    data = reader.read(part_size)
+            completed = self.bucket.complete_multipart_upload(
+                self.name, mp.id, complete_xml(etags))
+        except:
+            boto.log.debug('Cancelling multipart upload %s of %s' %
+                           (mp.id, self.name))
+            mp.cancel_upload()
+            raise
+        progress.done(sent)
+        self.etag = completed.etag
+        self.version_id = completed.version_id
+        self.encrypted = completed.encrypted
+        self.content_encoding = compress
+        self.size = sent
+        return sent
+
     def set_contents_from_filename(self, filename, headers=None, replace=True,
                                    cb=None, num_cb=10, policy=None, md5=None,
                                    reduced_redundancy=False,
-                                   encrypt_key=False):
+                                   encrypt_key=False, parallel=None,
+                                   part_size=None, compress=None):
         """
         Store an object in S3 using the name of the Key object as the
         key in S3 and the contents of the file named by 'filename'.
@@ -1345,19 +1702,46 @@ class Key(object):
             will be encrypted on the server-side by S3 and will be
             stored in an encrypted form while at rest in S3.
 
+        :type parallel: int
+        :param parallel: If greater than one, a file bigger than
+            ``part_size`` is sent as a multipart upload with this many
+            parts uploaded at a time, and ``md5`` is ignored.  See
+            :class:`boto.s3.transfer.ParallelUploader`.
+
+        :type part_size: int
+        :param part_size: The size of each part of a parallel upload, in
+            bytes.  It is raised as needed to stay within S3's part size
+            and part count limits.
+
+        :type compress: string
+        :param compress: (optional) 'gzip' or 'zstd' to compress the file
+            as it is sent; see :meth:`set_contents_from_file`.
+            ``parallel`` is then ignored.
+
         :rtype: int
         :return: The number of bytes written to the key.
         """
+        if (parallel and parallel > 1 and not compress and
+                self.bucket is not None):
+            if not replace and self.bucket.lookup(self.name):
+                return
+            uploader = ParallelUploader(self, num_threads=parallel,
+                                        part_size=part_size)
+            return uploader.upload(filename, headers=headers, cb=cb,
+                                   num_cb=num_cb, policy=policy,
+                                   reduced_redundancy=reduced_redundancy,
+                                   encrypt_key=encrypt_key)
         with open(filename, 'rb') as fp:
             return self.set_contents_from_file(fp, headers, replace, cb,
                                                num_cb, policy, md5,
                                                reduced_redundancy,
-                                               encrypt_key=encrypt_key)
+                                               encrypt_key=encrypt_key,
+                                               compress=compress)
 
     def set_contents_from_string(self, string_data, headers=None, replace=True,
                                  cb=None, num_cb=10, policy=None, md5=None,
                                  reduced_redundancy=False,
-                                 encrypt_key=False):
+                                 encrypt_key=False, compress=None):
         """
         Store an object in S3 using the name of the Key object as the
         key in S3 and the string 's' as the contents.
@@ -1410,19 +1794,24 @@ class Key(object):
         :param encrypt_key: If True, the new copy of the object will
             be encrypted on the server-side by S3 and will be stored
             in an encrypted form while at rest in S3.
+
+        :type compress: string
+        :param compress: (optional) 'gzip' or 'zstd' to compress the
+            string as it is sent; see :meth:`set_contents_from_file`.
         """
         if not isinstance(string_data, bytes):
             string_data = string_data.encode("utf-8")
         fp = BytesIO(string_data)
         r = self.set_contents_from_file(fp, headers, replace, cb, num_cb,
                                         policy, md5, reduced_redundancy,
-                                        encrypt_key=encrypt_key)
+                                        encrypt_key=encrypt_key,
+                                        compress=compress)
         fp.close()
         return r
 
     def get_file(self, fp, headers=None, cb=None, num_cb=10,
                  torrent=False, version_id=None, override_num_retries=None,
-                 response_headers=None):
+                 response_headers=None, buffer_size=None, decompress=False):
         """
         Retrieves a file from an S3 Key
 
@@ -1466,17 +1855,32 @@ class Key(object):
             retrieving the object.  You can set the Key object's
             ``version_id`` attribute to None to always grab the latest
             version from a version-enabled bucket.
+
+        :type buffer_size: int or string
+        :param buffer_size: (optional) How many bytes to read from the response per call, or
+            'adaptive' to start at ``BufferSize`` and grow the reads while
+            the transfer keeps up.  Defaults to the connection's
+            ``key_buffer_size`` and then to ``BufferSize``.
+
+        :type decompress: bool
+        :param decompress: (optional) If True and the object's
+            ``Content-Encoding`` is gzip or zstd, the contents are
+            decompressed as they are written to ``fp``.  Ignored for
+            ranged requests.
         """
         self._get_file_internal(fp, headers=headers, cb=cb, num_cb=num_cb,
                                 torrent=torrent, version_id=version_id,
                                 override_num_retries=override_num_retries,
                                 response_headers=response_headers,
                                 hash_algs=None,
-                                query_args=None)
+                                query_args=None,
+                                buffer_size=buffer_size,
+                                decompress=decompress)
 
     def _get_file_internal(self, fp, headers=None, cb=None, num_cb=10,
                  torrent=False, version_id=None, override_num_retries=None,
-                 response_headers=None, hash_algs=None, query_args=None):
+                 response_headers=None, hash_algs=None, query_args=None,
+                 buffer_size=None, decompress=False):
         if headers is None:
             headers = {}
         save_debug = self.bucket.connection.debug
@@ -1506,44 +1910,39 @@ class Key(object):
         self.open('r', headers, query_args=query_args,
                   override_num_retries=override_num_retries)
 
+        # The digests are of the bytes received, which is what the ETag
+        # covers, so they are taken before decompression.
+        writer = None
+        if decompress and not torrent and 'Range' not in headers:
+            encoding = decodable_encoding(self.content_encoding)
+            if encoding:
+                fp = writer = DecompressingWriter(fp, encoding)
+
         data_len = 0
-        if cb:
-            if self.size is None:
-                cb_size = 0
-            else:
-                cb_size = self.size
-            if self.size is None and num_cb != -1:
-                # If size is not available due to chunked transfer for example,
-                # we'll call the cb for every 1MB of data transferred.
-                cb_count = (1024 * 1024) / self.BufferSize
-            elif num_cb > 1:
-                cb_count = int(math.ceil(cb_size/self.BufferSize/(num_cb-1.0)))
-            elif num_cb < 0:
-                cb_count = -1
-            else:
-                cb_count = 0
-            i = 0
-            cb(data_len, cb_size)
+        cb_size = self.size or 0
+        sizer = self._read_sizer(buffer_size)
+        progress = _ProgressReporter(cb, num_cb, cb_size)
         try:
-            for bytes in self:
+            while True:
+                bytes = self.read(sizer.size)
+                if not bytes:
+                    break
                 fp.write(bytes)
                 data_len += len(bytes)
                 for alg in digesters:
                     digesters[alg].update(bytes)
-                if cb:
-                    if cb_size > 0 and data_len >= cb_size:
-                        break
-                    i += 1
-                    if i == cb_count or cb_count == -1:
-                        cb(data_len, cb_size)
-                        i = 0
+                if cb and cb_size > 0 and data_len >= cb_size:
+                    break
+                progress.update(data_len)
+                sizer.record(len(bytes))
+            if writer is not None:
+                writer.finish()
         except IOError as e:
             if e.errno == errno.ENOSPC:
                 raise StorageDataError('Out of space for destination file '
                                        '%s' % fp.name)
             raise
-        if cb and (cb_count <= 1 or i > 0) and data_len > 0:
-            cb(data_len, cb_size)
+        progress.done(data_len)
         for alg in digesters:
           self.local_hashes[alg] = digesters[alg].digest()
         if self.size is None and not torrent and "Range" not in headers:
@@ -1583,7 +1982,8 @@ class Key(object):
                              torrent=False,
                              version_id=None,
                              res_download_handler=None,
-                             response_headers=None):
+                             response_headers=None, buffer_size=None,
+                             decompress=False):
         """
         Retrieve an object from S3 using the name of the Key object as the
         key in S3.  Write the contents of the object to the file pointed
@@ -1631,6 +2031,18 @@ class Key(object):
             retrieving the object.  You can set the Key object's
             ``version_id`` attribute to None to always grab the latest
             version from a version-enabled bucket.
+
+        :type buffer_size: int or string
+        :param buffer_size: (optional) How many bytes to read from the response per call, or
+            'adaptive' to start at ``BufferSize`` and grow the reads while
+            the transfer keeps up.  Defaults to the connection's
+            ``key_buffer_size`` and then to ``BufferSize``.
+
+        :type decompress: bool
+        :param decompress: (optional) If True and the object's
+            ``Content-Encoding`` is gzip or zstd, the contents are
+            decompressed as they are written to ``fp``.  Ignored for
+            ranged requests.  Resumable downloads aren't decompressed.
         """
         if self.bucket is not None:
             if res_download_handler:
@@ -1640,14 +2052,16 @@ class Key(object):
             else:
                 self.get_file(fp, headers, cb, num_cb, torrent=torrent,
                               version_id=version_id,
-                              response_headers=response_headers)
+                              response_headers=response_headers,
+                              buffer_size=buffer_size, decompress=decompress)
 
     def get_contents_to_filename(self, filename, headers=None,
                                  cb=None, num_cb=10,
                                  torrent=False,
                                  version_id=None,
                                  res_download_handler=None,
-                                 response_headers=None):
+                                 response_headers=None, parallel=None,
+                                 part_size=None, decompress=False):
         """
         Retrieve an object from S3 using the name of the Key object as the
         key in S3.  Store contents of the object to a file named by 'filename'.
@@ -1695,23 +2109,50 @@ class Key(object):
             retrieving the object.  You can set the Key object's
             ``version_id`` attribute to None to always grab the latest
             version from a version-enabled bucket.
+
+        :type parallel: int
+        :param parallel: If greater than one, an object bigger than
+            ``part_size`` is fetched with this many ranged GETs in flight
+            at a time, each written in place in the file.  Ignored for
+            torrents and resumable downloads.  See
+            :class:`boto.s3.transfer.ParallelDownloader`.
+
+        :type part_size: int
+        :param part_size: The size of each range of a parallel download,
+            in bytes.
+
+        :type decompress: bool
+        :param decompress: (optional) If True, gzip or zstd encoded
+            contents are decompressed into the file; see
+            :meth:`get_file`.  ``parallel`` is then ignored.
         """
         try:
-            with open(filename, 'wb') as fp:
-                self.get_contents_to_file(fp, headers, cb, num_cb,
-                                          torrent=torrent,
-                                          version_id=version_id,
-                                          res_download_handler=res_download_handler,
-                                          response_headers=response_headers)
+            if (parallel and parallel > 1 and not torrent and
+                    not decompress and res_download_handler is None and
+                    self.bucket is not None):
+                downloader = ParallelDownloader(self, num_threads=parallel,
+                                                part_size=part_size)
+                downloader.download(filename, headers, cb, num_cb,
+                                    version_id=version_id,
+                                    response_headers=response_headers)
+            else:
+                with open(filename, 'wb') as fp:
+                    self.get_contents_to_file(fp, headers, cb, num_cb,
+                                              torrent=torrent,
+                                              version_id=version_id,
+                                              res_download_handler=res_download_handler,
+                                              response_headers=response_headers,
+                                              decompress=decompress)
         except Exception:
-            os.remove(filename)
+            if os.path.exists(filename):
+                os.remove(filename)
             raise
         # if last_modified date was sent from s3, try to set file's timestamp
         if self.last_modified is not None:
             try:
                 modified_tuple = email.utils.parsedate_tz(self.last_modified)
                 modified_stamp = int(email.utils.mktime_tz(modified_tuple))
-                os.utime(fp.name, (modified_stamp, modified_stamp))
+                os.utime(filename, (modified_stamp, modified_stamp))
             except Exception:
                 pass
 
@@ -1719,7 +2160,8 @@ class Key(object):
                                cb=None, num_cb=10,
                                torrent=False,
                                version_id=None,
-                               response_headers=None, encoding=None):
+                               response_headers=None, encoding=None,
+                               decompress=False):
         """
         Retrieve an object from S3 using the name of the Key object as the
         key in S3.  Return the contents of the object as a string.
@@ -1766,13 +2208,18 @@ class Key(object):
             or ``iso-8859-1``. If set, then a string will be returned.
             Defaults to ``None`` and returns bytes.
 
+        :type decompress: bool
+        :param decompress: (optional) If True, gzip or zstd encoded
+            contents are decompressed; see :meth:`get_file`.
+
         :rtype: bytes or str
         :returns: The contents of the file as bytes or a string
         """
         fp = BytesIO()
         self.get_contents_to_file(fp, headers, cb, num_cb, torrent=torrent,
                                   version_id=version_id,
-                                  response_headers=response_headers)
+                                  response_headers=response_headers,
+                                  decompress=decompress)
         value = fp.getvalue()
 
         if encoding is not None:
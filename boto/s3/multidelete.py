@@ -115,12 +115,25 @@ class MultiDeleteResult(object):
         be empty because only error responses would be returned.
 
     :ivar errors: A list of unsuccessfully deleted objects.
+
+    :ivar deleted_count: The number of objects deleted, which is also
+        known in quiet mode.
     """
 
     def __init__(self, bucket=None):
         self.bucket = None
         self.deleted = []
         self.errors = []
+        self.deleted_count = 0
+
+    def merge(self, other, sent):
+        """
+        Adds the result of another request, which asked for ``sent``
+        objects to be deleted, to this one.
+        """
+        self.deleted.extend(other.deleted)
+        self.errors.extend(other.errors)
+        self.deleted_count += sent - len(other.errors)
 
     def startElement(self, name, attrs, connection):
         if name == 'Deleted':
@@ -0,0 +1,310 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+Synchronises a local directory tree to a bucket.
+
+The destination is listed once, the local tree is scanned once, and only
+the files that are missing or differ are uploaded (and, optionally, the
+keys with no local file deleted), from a pool of threads.  Files are
+compared by size and then by ETag.  Computing the MD5 of every file on
+each run would read the whole tree, so the digests are kept in a
+:py:class:`Manifest` on disk and only recomputed for files whose size or
+modification time changed.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+
+import boto
+from boto.s3.key import Key
+from boto.s3.transfer import run_in_threads
+from boto.utils import compute_md5, parse_ts
+
+
+class Manifest(object):
+    """
+    What is known about each local file of a tree, keyed by its path
+    relative to the root: its size, modification time, MD5 and the ETag
+    it was last uploaded with.  Saved as JSON to ``path``, if given.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.mutex = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as fp:
+                self.entries = json.load(fp)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.mutex:
+            data = json.dumps(self.entries, sort_keys=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fp:
+            fp.write(data)
+        os.rename(tmp_path, self.path)
+
+    def lookup(self, name, size, mtime):
+        """
+        Returns the entry for ``name``, or None if there is none or the
+        file has changed since it was recorded.
+        """
+        with self.mutex:
+            entry = self.entries.get(name)
+        if entry and entry['size'] == size and entry['mtime'] == mtime:
+            return entry
+        return None
+
+    def md5(self, name, path, size, mtime):
+        """Returns the hex MD5 of a file, computing it only if needed."""
+        entry = self.lookup(name, size, mtime)
+        if entry and entry.get('md5'):
+            return entry['md5']
+        with open(path, 'rb') as fp:
+            hex_md5 = compute_md5(fp)[0]
+        self.record(name, size, mtime, md5=hex_md5)
+        return hex_md5
+
+    def record(self, name, size, mtime, **fields):
+        with self.mutex:
+            entry = self.entries.get(name)
+            if not entry or entry['size'] != size or entry['mtime'] != mtime:
+                entry = self.entries[name] = {'size': size, 'mtime': mtime}
+            entry.update(fields)
+
+    def prune(self, names):
+        """Forgets the files that aren't in ``names``."""
+        with self.mutex:
+            for name in set(self.entries) - set(names):
+                del self.entries[name]
+
+
+class SyncStats(object):
+    """
+    Counts what a sync did.  ``throughput`` is in bytes uploaded per
+    second and ``object_rate`` in objects uploaded or deleted per second.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.scanned = 0
+        self.listed = 0
+        self.uploaded = 0
+        self.bytes_uploaded = 0
+        self.deleted = 0
+        self.unchanged = 0
+        self.failed = []
+        self.start_time = time.time()
+        self.end_time = None
+
+    def add(self, **counts):
+        with self.mutex:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    @property
+    def elapsed(self):
+        return (self.end_time or time.time()) - self.start_time
+
+    @property
+    def throughput(self):
+        return self.bytes_uploaded / max(self.elapsed, 1e-6)
+
+    @property
+    def object_rate(self):
+        return (self.uploaded + self.deleted) / max(self.elapsed, 1e-6)
+
+    def __repr__(self):
+        return ('<SyncStats: %d scanned, %d listed, %d uploaded (%d bytes), '
+                '%d deleted, %d unchanged, %d failed>' %
+                (self.scanned, self.listed, self.uploaded,
+                 self.bytes_uploaded, self.deleted, self.unchanged,
+                 len(self.failed)))
+
+
+class DirectorySync(object):
+    """
+    Makes the keys under ``prefix`` in ``bucket`` match the files under
+    ``local_dir``.
+
+    :type bucket: :class:`boto.s3.bucket.Bucket`
+    :param bucket: The bucket to sync to.
+
+    :type local_dir: string
+    :param local_dir: The root of the local tree.
+
+    :type prefix: string
+    :param prefix: Prepended to the relative path of each file, which
+        uses ``/`` as its separator, to name its key.
+
+    :type manifest_path: string
+    :param manifest_path: Where to cache file digests between runs.
+        Without one, the MD5 of every file whose size matches its key is
+        computed on each run.
+
+    :type delete: bool
+    :param delete: Whether to delete the keys under ``prefix`` that have
+        no local file.
+
+    :type num_threads: int
+    :param num_threads: How many uploads (and delete requests) to run at
+        once.
+
+    The remaining parameters are passed to
+    :meth:`boto.s3.key.Key.set_contents_from_filename`.
+    """
+
+    def __init__(self, bucket, local_dir, prefix='', manifest_path=None,
+                 delete=False, num_threads=10, headers=None, policy=None,
+                 reduced_redundancy=False, encrypt_key=False):
+        self.bucket = bucket
+        self.local_dir = local_dir
+        self.prefix = prefix
+        self.manifest = Manifest(manifest_path)
+        self.delete = delete
+        self.num_threads = num_threads
+        self.headers = headers
+        self.policy = policy
+        self.reduced_redundancy = reduced_redundancy
+        self.encrypt_key = encrypt_key
+
+    def scan(self):
+        """
+        Returns ``{key_name: (path, size, mtime)}`` for the local tree.
+        """
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(self.local_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if not os.path.isfile(path):
+                    continue
+                st = os.stat(path)
+                rel_path = os.path.relpath(path, self.local_dir)
+                name = self.prefix + rel_path.replace(os.sep, '/')
+                files[name] = (path, st.st_size, st.st_mtime)
+        return files
+
+    def list_remote(self):
+        """Returns ``{key_name: key}`` for the keys under the prefix."""
+        return dict((key.name, key) for key in
+                    self.bucket.list(prefix=self.prefix, headers=self.headers)
+                    if isinstance(key, Key))
+
+    def is_unchanged(self, name, path, size, mtime, key):
+        """Returns True if the file at ``path`` matches ``key``."""
+        if key.size != size:
+            return False
+        etag = (key.etag or '').strip('"')
+        entry = self.manifest.lookup(name, size, mtime)
+        if entry and entry.get('etag') == etag:
+            return True
+        if '-' not in etag:
+            return self.manifest.md5(name, path, size, mtime) == etag
+        # A multipart ETag isn't the MD5 of the object, so the best we can
+        # do is to check the key was written after the file was.
+        last_modified = parse_ts(key.last_modified)
+        return datetime.datetime.utcfromtimestamp(mtime) <= last_modified
+
+    def plan(self, stats=None):
+        """
+        Returns the files to upload, as ``(key_name, path, size, mtime)``
+        tuples, and the names of the keys to delete.
+        """
+        stats = stats or SyncStats()
+        local = self.scan()
+        remote = self.list_remote()
+        stats.add(scanned=len(local), listed=len(remote))
+        uploads = []
+        for name in sorted(local):
+            path, size, mtime = local[name]
+            key = remote.get(name)
+            if key is not None and self.is_unchanged(name, path, size,
+                                                     mtime, key):
+                stats.add(unchanged=1)
+            else:
+                uploads.append((name, path, size, mtime))
+        deletes = []
+        if self.delete:
+            deletes = sorted(set(remote) - set(local))
+        self.manifest.prune(local)
+        return uploads, deletes
+
+    def upload(self, upload, stats):
+        name, path, size, mtime = upload
+        key = self.bucket.new_key(name)
+        try:
+            md5 = self.manifest.md5(name, path, size, mtime)
+            key.set_contents_from_filename(
+                path, headers=self.headers, policy=self.policy,
+                md5=key.get_md5_from_hexdigest(md5),
+                reduced_redundancy=self.reduced_redundancy,
+                encrypt_key=self.encrypt_key)
+        except Exception as e:
+            boto.log.error('Failed to upload %s to %s: %s' % (path, name, e))
+            with stats.mutex:
+                stats.failed.append((name, e))
+            return
+        self.manifest.record(name, size, mtime,
+                             etag=(key.etag or '').strip('"'))
+        stats.add(uploaded=1, bytes_uploaded=size)
+
+    def run(self):
+        """
+        Performs the sync.  A file that fails to upload is recorded in
+        the stats' ``failed`` list, along with its error, and doesn't
+        stop the others.
+
+        :rtype: :class:`SyncStats`
+        """
+        stats = SyncStats()
+        uploads, deletes = self.plan(stats)
+        try:
+            run_in_threads(lambda upload: self.upload(upload, stats),
+                           uploads, self.num_threads)
+            if deletes:
+                result = self.bucket.delete_keys(deletes, quiet=True,
+                                                 headers=self.headers,
+                                                 parallel=self.num_threads)
+                stats.add(deleted=result.deleted_count)
+                stats.failed.extend((error.key, error)
+                                    for error in result.errors)
+        finally:
+            self.manifest.save()
+            stats.end_time = time.time()
+        return stats
+
+
+def sync_directory(bucket, local_dir, prefix='', **kwargs):
+    """
+    Syncs ``local_dir`` to ``prefix`` in ``bucket`` and returns the
+    :class:`SyncStats`.  See :class:`DirectorySync` for the arguments.
+    """
+    return DirectorySync(bucket, local_dir, prefix, **kwargs).run()
@@ -0,0 +1,607 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+Parallel transfers of large S3 objects.
+
+Objects are moved as several parts at once, one request per part, from a
+pool of threads; copies between keys are done the same way, with S3
+copying each part.  Every part is sent through the key's own connection, so
+all the threads share its connection pool (which can be bounded with the
+``connection_pool_max_size`` option).  Each thread streams its part
+straight from or to the file, so memory use doesn't grow with the size of
+the object.
+"""
+import math
+import mimetypes
+import os
+import re
+import socket
+import sys
+import threading
+from hashlib import md5
+
+import boto
+from boto.compat import Queue, http_client, six
+from boto.exception import BotoServerError, PleaseRetryException
+from boto.exception import StorageDataError
+from boto.utils import MappedFileRegion, compute_md5, find_matching_headers
+from boto.vendored.six.moves.queue import Empty
+
+
+# S3 rejects multipart uploads with more parts, or smaller non-final
+# parts, than this.
+MAX_PARTS = 10000
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_NUM_THREADS = 10
+DEFAULT_PART_RETRIES = 3
+
+# Tells run_pipelined's threads that there is no more work.
+_STOP = object()
+
+
+def choose_part_size(total_size, part_size=None):
+    """
+    Returns the part size to use for an object of ``total_size`` bytes:
+    ``part_size`` (or ``DEFAULT_PART_SIZE``), raised to S3's minimum part
+    size and, if need be, until the object fits in ``MAX_PARTS`` parts.
+    """
+    part_size = max(part_size or DEFAULT_PART_SIZE, MIN_PART_SIZE)
+    if total_size > part_size * MAX_PARTS:
+        part_size = int(math.ceil(total_size / float(MAX_PARTS)))
+    return part_size
+
+
+def part_ranges(total_size, part_size):
+    """
+    Returns a ``(part_num, offset, size)`` tuple for each part of an
+    object of ``total_size`` bytes.  Part numbers count from one.
+    """
+    num_parts = max(1, int(math.ceil(total_size / float(part_size))))
+    return [(i + 1, i * part_size, min(part_size, total_size - i * part_size))
+            for i in range(num_parts)]
+
+
+def run_in_threads(func, items, num_threads):
+    """
+    Calls ``func`` on each of ``items`` from up to ``num_threads`` threads
+    and returns the results, in the order of ``items``.
+
+    If a call raises, no further items are started, and the first
+    exception is re-raised once the calls already running have returned.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    errors = []
+    work_queue = Queue()
+    for work in enumerate(items):
+        work_queue.put(work)
+
+    def worker():
+        while not errors:
+            try:
+                index, item = work_queue.get_nowait()
+            except Empty:
+                return
+            try:
+                results[index] = func(item)
+            except Exception:
+                errors.append(sys.exc_info())
+
+    threads = []
+    for _ in range(max(1, min(num_threads, len(items)))):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    if errors:
+        six.reraise(*errors[0])
+    return results
+
+
+def run_pipelined(func, items, num_threads):
+    """
+    Like :py:func:`run_in_threads`, but for items too many to hold at
+    once (such as a generator over a whole bucket): ``items`` is read
+    lazily, from the calling thread, at most ``num_threads`` ahead of
+    the calls, and the results of ``func`` are discarded.
+    """
+    errors = []
+    work_queue = Queue(num_threads)
+
+    def worker():
+        while True:
+            item = work_queue.get()
+            if item is _STOP:
+                return
+            if errors:
+                continue
+            try:
+                func(item)
+            except Exception:
+                errors.append(sys.exc_info())
+
+    threads = []
+    for _ in range(max(1, num_threads)):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    try:
+        for item in items:
+            if errors:
+                break
+            work_queue.put(item)
+    finally:
+        for thread in threads:
+            work_queue.put(_STOP)
+        for thread in threads:
+            thread.join()
+    if errors:
+        six.reraise(*errors[0])
+
+
+def is_retryable(exception):
+    """
+    Returns True if a part that failed with ``exception`` is worth
+    sending again.  ``_mexe`` has already retried the request itself by
+    then; this covers failures it gives up on, such as a connection
+    dropped mid-body or an ETag that doesn't match the data sent.
+    """
+    if isinstance(exception, BotoServerError):
+        return exception.status >= 500
+    return isinstance(exception, (http_client.HTTPException, socket.error,
+                                  StorageDataError, PleaseRetryException))
+
+
+def retry_part(key, func, part, num_retries):
+    """
+    Calls ``func(part)``, retrying up to ``num_retries`` times, with the
+    backoff of the key's connection, while it fails with a retryable
+    error.
+    """
+    policy = key.bucket.connection.retry_policy
+    attempt = 0
+    while True:
+        try:
+            return func(part)
+        except Exception as e:
+            if attempt >= num_retries or not is_retryable(e):
+                raise
+            boto.log.debug('Retrying part %s of %s after: %s' %
+                           (part[0], key.name, e))
+            policy.sleep(policy.delay(attempt))
+            attempt += 1
+
+
+class ParallelUploader(object):
+    """
+    Uploads a file to a key as a multipart upload, with several parts in
+    flight at once.
+
+    :type key: :class:`boto.s3.key.Key`
+    :param key: The key to upload to.
+
+    :type num_threads: int
+    :param num_threads: How many parts to upload at a time.
+
+    :type part_size: int
+    :param part_size: The size of each part, in bytes.  Raised if needed
+        to meet S3's limits; see ``choose_part_size``.
+
+    :type num_retries: int
+    :param num_retries: How many times a failed part is sent again before
+        the upload is given up, on top of the retries of each request.
+    """
+
+    def __init__(self, key, num_threads=DEFAULT_NUM_THREADS, part_size=None,
+                 num_retries=DEFAULT_PART_RETRIES):
+        self.key = key
+        self.num_threads = num_threads
+        self.part_size = part_size
+        self.num_retries = num_retries
+
+    def upload(self, filename, headers=None, cb=None, num_cb=10,
+               policy=None, reduced_redundancy=False, encrypt_key=False):
+        """
+        Uploads ``filename``.  Files no bigger than one part are sent with
+        a single ``PUT`` instead.
+
+        If any part fails for good, the multipart upload is cancelled so
+        that its parts stop being billed, and the error is re-raised.
+
+        ``cb`` is called with the number of bytes uploaded so far and the
+        size of the file each time a part completes, at most ``num_cb``
+        times.  The other parameters are as for
+        :meth:`boto.s3.key.Key.set_contents_from_filename`.
+
+        :rtype: int
+        :return: The number of bytes uploaded.
+        """
+        key = self.key
+        total_size = os.path.getsize(filename)
+        part_size = choose_part_size(total_size, self.part_size)
+        if total_size <= part_size:
+            with open(filename, 'rb') as fp:
+                return key.set_contents_from_file(
+                    fp, headers=headers, cb=cb, num_cb=num_cb, policy=policy,
+                    reduced_redundancy=reduced_redundancy,
+                    encrypt_key=encrypt_key)
+
+        headers = dict(headers or {})
+        if not find_matching_headers('Content-Type', headers):
+            headers['Content-Type'] = (mimetypes.guess_type(filename)[0] or
+                                       key.DefaultContentType)
+        mp = key.bucket.initiate_multipart_upload(
+            key.name, headers=headers, reduced_redundancy=reduced_redundancy,
+            metadata=key.metadata, encrypt_key=encrypt_key, policy=policy)
+        parts = part_ranges(total_size, part_size)
+        progress = _Progress(cb, num_cb, total_size, len(parts))
+
+        def upload_part(part):
+            part_num, offset, size = part
+            # Each part is hashed and sent straight from a memory map of
+            # its range, so no part is copied onto the heap.
+            with MappedFileRegion(filename, offset, size) as fp:
+                part_key = mp.upload_part_from_file(fp, part_num, size=size)
+            progress.part_done(size)
+            return part_key.etag
+
+        try:
+            etags = run_in_threads(
+                lambda part: retry_part(key, upload_part, part,
+                                        self.num_retries),
+                parts, self.num_threads)
+            completed = key.bucket.complete_multipart_upload(
+                key.name, mp.id, complete_xml(etags))
+        except:
+            boto.log.debug('Cancelling multipart upload %s of %s' %
+                           (mp.id, key.name))
+            mp.cancel_upload()
+            raise
+        key.etag = completed.etag
+        key.version_id = completed.version_id
+        key.encrypted = completed.encrypted
+        key.size = total_size
+        key.path = filename
+        return total_size
+
+
+class ParallelCopier(object):
+    """
+    Copies a key to another key, possibly in another bucket, as a
+    multipart upload whose parts are copied by S3 from ranges of the
+    source, several at once.  Nothing passes through the client, and the
+    copy isn't limited to the 5GB of a single ``PUT`` copy.
+
+    :type bucket: :class:`boto.s3.bucket.Bucket`
+    :param bucket: The bucket to copy into.
+
+    The other parameters are as for :class:`ParallelUploader`.
+    """
+
+    # Headers of the source object that a multipart upload doesn't copy.
+    CopiedHeaders = (('Content-Type', 'content_type'),
+                     ('Cache-Control', 'cache_control'),
+                     ('Content-Disposition', 'content_disposition'),
+                     ('Content-Encoding', 'content_encoding'),
+                     ('Content-Language', 'content_language'))
+
+    def __init__(self, bucket, num_threads=DEFAULT_NUM_THREADS,
+                 part_size=None, num_retries=DEFAULT_PART_RETRIES):
+        self.bucket = bucket
+        self.num_threads = num_threads
+        self.part_size = part_size
+        self.num_retries = num_retries
+
+    def copy(self, new_key_name, src_bucket_name, src_key_name,
+             metadata=None, src_version_id=None, storage_class='STANDARD',
+             preserve_acl=False, encrypt_key=False, headers=None):
+        """
+        Copies ``src_key_name``.  Objects no bigger than one part are
+        copied with a single ``PUT`` copy instead.
+
+        The source is looked up with a ``HEAD`` first, and every part is
+        copied only if it still has the same ETag.  Its metadata and
+        content headers are carried over unless ``metadata`` replaces
+        them, as with a ``PUT`` copy.  If any part fails for good, the
+        upload is cancelled and the error re-raised.
+
+        The parameters are as for :meth:`boto.s3.bucket.Bucket.copy_key`.
+
+        :rtype: :class:`boto.s3.key.Key`
+        :return: The new key.
+        """
+        bucket = self.bucket
+        provider = bucket.connection.provider
+        if src_bucket_name == bucket.name:
+            src_bucket = bucket
+        else:
+            src_bucket = bucket.connection.get_bucket(src_bucket_name,
+                                                      validate=False)
+        src_key = src_bucket.get_key(src_key_name, headers=headers,
+                                     version_id=src_version_id)
+        if src_key is None:
+            raise provider.storage_response_error(
+                404, 'Not Found', 'Key %s/%s does not exist' %
+                (src_bucket_name, src_key_name))
+        part_size = choose_part_size(src_key.size, self.part_size)
+        if src_key.size <= part_size:
+            return bucket.copy_key(
+                new_key_name, src_bucket_name, src_key_name,
+                metadata=metadata, src_version_id=src_version_id,
+                storage_class=storage_class, preserve_acl=preserve_acl,
+                encrypt_key=encrypt_key, headers=headers)
+
+        if preserve_acl:
+            acl = src_bucket.get_xml_acl(src_key_name,
+                                         version_id=src_version_id)
+        headers = dict(headers or {})
+        if metadata is None:
+            metadata = src_key.metadata
+            for header, attr in self.CopiedHeaders:
+                value = getattr(src_key, attr, None)
+                if value and not find_matching_headers(header, headers):
+                    headers[header] = value
+        if provider.storage_class_header and storage_class:
+            headers[provider.storage_class_header] = storage_class
+        mp = bucket.initiate_multipart_upload(
+            new_key_name, headers=headers, metadata=metadata,
+            encrypt_key=encrypt_key)
+        # Don't mix parts of two versions if the source is overwritten.
+        part_headers = {provider.header_prefix + 'copy-source-if-match':
+                        src_key.etag}
+        key = bucket.new_key(new_key_name)
+
+        def copy_part(part):
+            part_num, offset, size = part
+            part_key = mp.copy_part_from_key(
+                src_bucket_name, src_key_name, part_num, offset,
+                offset + size - 1, src_version_id=src_version_id,
+                headers=part_headers)
+            return part_key.etag
+
+        try:
+            etags = run_in_threads(
+                lambda part: retry_part(key, copy_part, part,
+                                        self.num_retries),
+                part_ranges(src_key.size, part_size), self.num_threads)
+            completed = bucket.complete_multipart_upload(
+                new_key_name, mp.id, complete_xml(etags))
+        except:
+            boto.log.debug('Cancelling multipart copy %s of %s' %
+                           (mp.id, new_key_name))
+            mp.cancel_upload()
+            raise
+        if preserve_acl:
+            bucket.set_xml_acl(acl, new_key_name)
+        key.etag = completed.etag
+        key.version_id = completed.version_id
+        key.encrypted = completed.encrypted
+        key.size = src_key.size
+        return key
+
+
+def complete_xml(etags):
+    """
+    Returns the body of a ``CompleteMultipartUpload`` request for parts
+    with the given ``etags``, in part number order.
+    """
+    parts = ''.join('  <Part>\n'
+                    '    <PartNumber>%d</PartNumber>\n'
+                    '    <ETag>%s</ETag>\n'
+                    '  </Part>\n' % (i + 1, etag)
+                    for i, etag in enumerate(etags))
+    return ('<CompleteMultipartUpload>\n%s</CompleteMultipartUpload>' %
+            parts)
+
+
+class ParallelDownloader(object):
+    """
+    Downloads a key to a file with several ranged ``GET`` requests in
+    flight at once, each writing its part in place in the file.
+
+    The parameters are as for :class:`ParallelUploader`, except that
+    ``part_size`` is only raised to S3's minimum part size.
+    """
+
+    def __init__(self, key, num_threads=DEFAULT_NUM_THREADS, part_size=None,
+                 num_retries=DEFAULT_PART_RETRIES):
+        self.key = key
+        self.num_threads = num_threads
+        self.part_size = part_size
+        self.num_retries = num_retries
+
+    def download(self, filename, headers=None, cb=None, num_cb=10,
+                 version_id=None, response_headers=None):
+        """
+        Downloads the key to ``filename``.  Objects no bigger than one
+        part are fetched with a single ``GET`` instead.
+
+        Every part is requested with an ``If-Match`` on the ETag seen
+        when the download started, so an object overwritten meanwhile
+        fails the download rather than mixing versions.  Afterwards, the
+        file is checked against the ETag if it is an MD5 (objects uploaded
+        in a single request) or an MD5 of part MD5s whose part count
+        matches the parts downloaded.
+
+        ``cb`` is called as each part completes, as in
+        :meth:`ParallelUploader.upload`.  The other parameters are as for
+        :meth:`boto.s3.key.Key.get_contents_to_filename`.
+        """
+        key = self.key
+        if version_id is None:
+            version_id = key.version_id
+        if key.size is None or key.etag is None:
+            found = key.bucket.get_key(key.name, headers=headers,
+                                       version_id=version_id)
+            if found is None:
+                raise key.provider.storage_response_error(
+                    404, 'Not Found', 'Key %s does not exist' % key.name)
+            for attr in ('size', 'etag', 'last_modified', 'encrypted'):
+                if getattr(key, attr, None) is None:
+                    setattr(key, attr, getattr(found, attr))
+        total_size = key.size
+        part_size = max(self.part_size or DEFAULT_PART_SIZE, MIN_PART_SIZE)
+        if total_size <= part_size:
+            with open(filename, 'wb') as fp:
+                key.get_file(fp, headers, cb, num_cb, version_id=version_id,
+                             response_headers=response_headers)
+            return
+
+        parts = part_ranges(total_size, part_size)
+        progress = _Progress(cb, num_cb, total_size, len(parts))
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC |
+                     getattr(os, 'O_BINARY', 0))
+        try:
+            _preallocate(fd, total_size)
+
+            def download_part(part):
+                part_num, offset, size = part
+                part_headers = dict(headers or {})
+                part_headers['Range'] = 'bytes=%d-%d' % (offset,
+                                                         offset + size - 1)
+                part_headers['If-Match'] = key.etag
+                part_key = key.bucket.new_key(key.name)
+                with _open_part_writer(fd, filename, offset) as fp:
+                    part_key.get_file(fp, part_headers, version_id=version_id,
+                                      response_headers=response_headers)
+                if fp.tell() != offset + size:
+                    raise StorageDataError(
+                        'Part %d of %s was %d bytes, expected %d' %
+                        (part_num, key.name, fp.tell() - offset, size))
+                progress.part_done(size)
+                return part_key.local_hashes.get('md5')
+
+            digests = run_in_threads(
+                lambda part: retry_part(key, download_part, part,
+                                        self.num_retries),
+                parts, self.num_threads)
+        finally:
+            os.close(fd)
+        self._check_etag(filename, headers, digests)
+
+    def _check_etag(self, filename, headers, digests):
+        key = self.key
+        customer_key = find_matching_headers(
+            'x-amz-server-side-encryption-customer-algorithm', headers or {})
+        if customer_key or key.encrypted not in (None, 'AES256'):
+            # With KMS or customer-provided keys the ETag isn't an MD5.
+            return
+        etag = key.etag.strip('"')
+        match = re.match(r'^([0-9a-f]{32})(?:-(\d+))?$', etag)
+        if match is None:
+            return
+        if match.group(2) is None:
+            with open(filename, 'rb') as fp:
+                computed = compute_md5(fp, buf_size=1024 * 1024)[0]
+        elif int(match.group(2)) == len(digests):
+            computed = md5(b''.join(digests)).hexdigest()
+        else:
+            boto.log.debug('Not checking %s: it was uploaded in %s parts, '
+                           'not %d' % (key.name, match.group(2),
+                                       len(digests)))
+            return
+        if computed != match.group(1):
+            raise StorageDataError(
+                'ETag from S3 did not match the downloaded data. %s vs. %s' %
+                (key.etag, computed))
+
+
+def _preallocate(fd, size):
+    """Sizes the file open as ``fd`` to ``size`` bytes up front."""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            # Not supported by every file system.
+            pass
+    os.ftruncate(fd, size)
+
+
+def _open_part_writer(fd, filename, offset):
+    """
+    Returns a file-like object that writes at ``offset`` of the file open
+    as ``fd`` without moving a shared file position, so that several
+    threads can write their own part of the file at once.
+    """
+    if hasattr(os, 'pwrite'):
+        return _PositionalWriter(fd, filename, offset)
+    fp = open(filename, 'r+b')
+    fp.seek(offset)
+    return fp
+
+
+class _PositionalWriter(object):
+    def __init__(self, fd, name, offset):
+        self.fd = fd
+        self.name = name
+        self.offset = offset
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.fd, view, self.offset)
+            self.offset += written
+            view = view[written:]
+
+    def tell(self):
+        return self.offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class _Progress(object):
+    """
+    Adds up the bytes transferred by all the threads of a transfer and
+    reports them to a ``cb(transferred, total)`` callback.
+    """
+
+    def __init__(self, cb, num_cb, total_size, num_parts):
+        self.cb = cb
+        self.total_size = total_size
+        self.transferred = 0
+        self.parts_done = 0
+        # Report after every ``interval`` parts, so at most ``num_cb`` times.
+        self.interval = 1
+        if num_cb > 0:
+            self.interval = int(math.ceil(num_parts / float(num_cb)))
+        self.num_parts = num_parts
+        self.mutex = threading.Lock()
+        if cb:
+            cb(0, total_size)
+
+    def part_done(self, size):
+        with self.mutex:
+            self.transferred += size
+            self.parts_done += 1
+            if self.cb and (self.parts_done % self.interval == 0 or
+                            self.parts_done == self.num_parts):
+                self.cb(self.transferred, self.total_size)
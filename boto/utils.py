@@ -59,6 +59,11 @@ import email.encoders
 import gzip
 import threading
 import locale
+import binascii
+import mmap
+import os
+import stat
+import struct
 from boto.compat import six, StringIO, urllib, encodebytes
 
 from contextlib import contextmanager
@@ -975,6 +980,246 @@ def guess_mime_type(content, deftype):
     return(rtype)
 
 
+class Crc32(object):
+    """
+    A hash object, with the interface of those in :py:mod:`hashlib`, for
+    the CRC32 of the data, as sent in the ``x-amz-crc32`` header.
+    """
+
+    name = 'crc32'
+    digest_size = 4
+
+    def __init__(self, data=b''):
+        self.value = 0
+        if data:
+            self.update(data)
+
+    def update(self, data):
+        self.value = binascii.crc32(data, self.value) & 0xffffffff
+
+    def digest(self):
+        return struct.pack('>I', self.value)
+
+    def hexdigest(self):
+        return '%08x' % self.value
+
+    def copy(self):
+        other = Crc32()
+        other.value = self.value
+        return other
+
+
+class MappedFileRegion(object):
+    """
+    A read-only, seekable file over ``size`` bytes of another, starting
+    at ``offset``, backed by a memory map.  The data is paged in by the
+    operating system as it's used and is never copied onto the Python
+    heap: :py:meth:`read` returns ``memoryview`` slices of the map, and
+    :py:class:`MultiHasher` hashes the region in place.
+
+    ``fp`` is a file opened in binary mode, or the name of one.  The
+    region is cut short at the end of the file, and ``size`` defaults to
+    the rest of it.  :py:meth:`close` unmaps it.
+    """
+
+    def __init__(self, fp, offset=0, size=None):
+        if isinstance(fp, six.string_types):
+            self.name = fp
+            with open(fp, 'rb') as f:
+                self._map_region(f.fileno(), offset, size)
+        else:
+            self.name = getattr(fp, 'name', None)
+            self._map_region(fp.fileno(), offset, size)
+        self.position = 0
+
+    def _map_region(self, fileno, offset, size):
+        available = max(os.fstat(fileno).st_size - offset, 0)
+        if size is None or size > available:
+            size = available
+        self.offset = offset
+        self.size = size
+        if not size:
+            self._map = None
+            self.view = memoryview(b'')
+            return
+        # Maps have to start on a multiple of the allocation granularity.
+        delta = offset % mmap.ALLOCATIONGRANULARITY
+        self._map = mmap.mmap(fileno, size + delta, access=mmap.ACCESS_READ,
+                              offset=offset - delta)
+        self.view = memoryview(self._map)[delta:delta + size]
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            end = self.size
+        else:
+            end = min(self.position + size, self.size)
+        data = self.view[self.position:end]
+        self.position = max(end, self.position)
+        return data
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise IOError('Invalid seek position: %d' % offset)
+        self.position = offset
+
+    def close(self):
+        if self._map is None:
+            return
+        if hasattr(self.view, 'release'):
+            self.view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # A slice returned by read() is still in use; the map is
+            # closed once that is garbage collected.
+            pass
+        self._map = None
+
+
+class MultiHasher(object):
+    """
+    Computes several digests of the same data in a single pass, so that a
+    file whose MD5 and SHA-256 are both needed is only read once.
+
+    ``algorithms`` maps a name for each digest to a zero-argument
+    constructor of hash objects that implement ``update()`` and
+    ``digest()``, such as ``hashlib.md5`` or :py:class:`Crc32`.  Data is
+    added with :py:meth:`update` or :py:meth:`hash_file`.
+    """
+
+    def __init__(self, algorithms, buf_size=8192):
+        self.hashers = dict((name, algorithm())
+                            for name, algorithm in algorithms.items())
+        self.buf_size = buf_size
+        self.bytes_hashed = 0
+
+    def update(self, data):
+        for hasher in self.hashers.values():
+            hasher.update(data)
+        self.bytes_hashed += len(data)
+
+    def hash_file(self, fp, size=None, use_mmap=False, rewind=True,
+                  encoding='utf-8'):
+        """
+        Hashes what is left of ``fp``, or at most ``size`` bytes of it,
+        from its current position, which is restored afterwards unless
+        ``rewind`` is False.  Only with ``rewind`` False can ``fp`` be a
+        stream that doesn't support ``tell`` and ``seek``.  Text read
+        from ``fp`` is hashed in ``encoding``.
+
+        With ``use_mmap``, a regular file opened in binary mode is mapped
+        into memory and hashed in place instead of being copied into read
+        buffers; other files are read as usual.
+
+        :rtype: int
+        :return: The number of bytes read from ``fp``.
+        """
+        if isinstance(fp, MappedFileRegion):
+            data = fp.view[fp.position:]
+            if size:
+                data = data[:size]
+            self.update(data)
+            return len(data)
+        if not rewind:
+            start = self.bytes_hashed
+            self._hash_read(fp, size, encoding)
+            return self.bytes_hashed - start
+        spos = fp.tell()
+        try:
+            data_size = None
+            if use_mmap:
+                data_size = self._hash_mapped(fp, spos, size)
+            if data_size is None:
+                self._hash_read(fp, size, encoding)
+                data_size = fp.tell() - spos
+        finally:
+            fp.seek(spos)
+        return data_size
+
+    def _hash_read(self, fp, size, encoding):
+        buf_size = self.buf_size
+        if size and size < buf_size:
+            s = fp.read(size)
+        else:
+            s = fp.read(buf_size)
+        while s:
+            if isinstance(s, six.text_type):
+                s = s.encode(encoding)
+            self.update(s)
+            if size:
+                size -= len(s)
+                if size <= 0:
+                    break
+            if size and size < buf_size:
+                s = fp.read(size)
+            else:
+                s = fp.read(buf_size)
+
+    def _hash_mapped(self, fp, spos, size):
+        """
+        Hashes ``fp`` through a memory map and returns the number of
+        bytes hashed, or returns None if it can't be mapped.
+        """
+        # Views of a map have to be released before it can be closed.
+        if not hasattr(memoryview, 'release'):
+            return None
+        if 'b' not in getattr(fp, 'mode', 'b'):
+            return None
+        try:
+            fileno = fp.fileno()
+            st = os.fstat(fileno)
+        except (AttributeError, ValueError, EnvironmentError):
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        length = st.st_size - spos
+        if size:
+            length = min(length, size)
+        if length <= 0:
+            return 0
+        # Maps have to start on a multiple of the allocation granularity.
+        delta = spos % mmap.ALLOCATIONGRANULARITY
+        mapped = mmap.mmap(fileno, length + delta, access=mmap.ACCESS_READ,
+                           offset=spos - delta)
+        try:
+            view = memoryview(mapped)[delta:]
+            try:
+                self.update(view)
+            finally:
+                view.release()
+        finally:
+            mapped.close()
+        return length
+
+    def digest(self, name):
+        return self.hashers[name].digest()
+
+    def hexdigest(self, name):
+        return self.hashers[name].hexdigest()
+
+    def base64digest(self, name):
+        base64_digest = encodebytes(self.digest(name)).decode('utf-8')
+        if base64_digest[-1] == '\n':
+            base64_digest = base64_digest[0:-1]
+        return base64_digest
+
+
 def compute_md5(fp, buf_size=8192, size=None):
     """
     Compute MD5 hash on passed file and return results in a tuple of values.
@@ -1004,32 +1249,10 @@ def compute_md5(fp, buf_size=8192, size=None):
 
 
 def compute_hash(fp, buf_size=8192, size=None, hash_algorithm=md5):
-    hash_obj = hash_algorithm()
-    spos = fp.tell()
-    if size and size < buf_size:
-        s = fp.read(size)
-    else:
-        s = fp.read(buf_size)
-    while s:
-        if not isinstance(s, bytes):
-            s = s.encode('utf-8')
-        hash_obj.update(s)
-        if size:
-            size -= len(s)
-            if size <= 0:
-                break
-        if size and size < buf_size:
-            s = fp.read(size)
-        else:
-            s = fp.read(buf_size)
-    hex_digest = hash_obj.hexdigest()
-    base64_digest = encodebytes(hash_obj.digest()).decode('utf-8')
-    if base64_digest[-1] == '\n':
-        base64_digest = base64_digest[0:-1]
+    hasher = MultiHasher({'hash': hash_algorithm}, buf_size=buf_size)
     # data_size based on bytes read.
-    data_size = fp.tell() - spos
-    fp.seek(spos)
-    return (hex_digest, base64_digest, data_size)
+    data_size = hasher.hash_file(fp, size=size)
+    return (hasher.hexdigest('hash'), hasher.base64digest('hash'), data_size)
 
 
 def find_matching_headers(name, headers):
@@ -8,6 +8,7 @@ from tests.unit import AWSMockServiceTestCase
 
 import boto.ec2
 
+from boto.compat import BytesIO
 from boto.regioninfo import RegionInfo
 from boto.ec2.blockdevicemapping import BlockDeviceType, BlockDeviceMapping
 from boto.ec2.connection import EC2Connection
@@ -1381,6 +1382,33 @@ class TestDescribeInstances(TestEC2ConnectionBase):
              ignore_params_values=['AWSAccessKeyId', 'SignatureMethod',
                                    'SignatureVersion', 'Timestamp', 'Version'])
 
+    def reservations_response(self, reservation_ids, next_token=None):
+        items = ''.join('<item><reservationId>%s</reservationId></item>' % r
+                        for r in reservation_ids)
+        if next_token:
+            items += '</reservationSet><nextToken>%s</nextToken>' % next_token
+        else:
+            items += '</reservationSet>'
+        body = ('<DescribeInstancesResponse><reservationSet>%s'
+                '</DescribeInstancesResponse>' % items).encode('utf-8')
+        response = self.create_response(status_code=200)
+        response.read.side_effect = BytesIO(body).read
+        return response
+
+    def test_iter_reservations(self):
+        self.https_connection.getresponse.side_effect = [
+            self.reservations_response(['r-1', 'r-2'], next_token='page2'),
+            self.reservations_response(['r-3']),
+        ]
+        reservations = list(self.ec2.iter_reservations(max_results=2))
+        self.assertEqual([r.id for r in reservations], ['r-1', 'r-2', 'r-3'])
+        self.assert_request_parameters({
+            'Action': 'DescribeInstances',
+            'MaxResults': 2,
+            'NextToken': 'page2'},
+             ignore_params_values=['AWSAccessKeyId', 'SignatureMethod',
+                                   'SignatureVersion', 'Timestamp', 'Version'])
+
 class TestDescribeTags(TestEC2ConnectionBase):
 
     def default_body(self):
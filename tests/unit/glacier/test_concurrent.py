@@ -20,6 +20,9 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 #
+import hashlib
+import json
+import os
 import tempfile
 from boto.compat import Queue
 
@@ -28,7 +31,9 @@ from tests.unit import AWSMockServiceTestCase
 
 from boto.glacier.concurrent import ConcurrentUploader, ConcurrentDownloader
 from boto.glacier.concurrent import UploadWorkerThread
-from boto.glacier.concurrent import _END_SENTINEL
+from boto.glacier.concurrent import _END_SENTINEL, _PartHashes
+from boto.glacier.exceptions import UploadArchiveError
+from boto.glacier.utils import bytes_to_hex, chunk_hashes, tree_hash
 
 
 class FakeThreadedConcurrentUploader(ConcurrentUploader):
@@ -117,6 +122,140 @@ class TestConcurrentUploader(unittest.TestCase):
         self.assertEqual(len(items), 12)
 
 
+class TestPipelinedUpload(unittest.TestCase):
+    def setUp(self):
+        self.fileobj = tempfile.NamedTemporaryFile()
+        self.addCleanup(self.fileobj.close)
+        self.data = os.urandom(int(2.5 * 1024 * 1024))
+        self.fileobj.write(self.data)
+        self.fileobj.flush()
+        self.state_file = self.fileobj.name + '.state'
+        self.addCleanup(
+            lambda: os.path.exists(self.state_file) and
+            os.remove(self.state_file))
+        self.api = mock.Mock()
+        self.api.initiate_multipart_upload.return_value = {
+            'UploadId': 'upload_id'}
+        self.api.complete_multipart_upload.return_value = {
+            'ArchiveId': 'archive_id'}
+        self.sent = {}
+        self.api.upload_part.side_effect = self.upload_part
+
+    def upload_part(self, vault_name, upload_id, linear_hash, tree_hash,
+                    byte_range, part_data):
+        self.sent[byte_range] = (bytes(part_data.read()), linear_hash,
+                                 tree_hash)
+        return mock.Mock()
+
+    def uploader(self, **kwargs):
+        return ConcurrentUploader(self.api, 'vault_name',
+                                  part_size=1024 * 1024, num_threads=2,
+                                  **kwargs)
+
+    def assert_parts_sent(self, part_numbers):
+        expected = {}
+        for i in part_numbers:
+            part = self.data[i * 1024 * 1024:(i + 1) * 1024 * 1024]
+            byte_range = (i * 1024 * 1024, i * 1024 * 1024 + len(part) - 1)
+            expected[byte_range] = (
+                part, hashlib.sha256(part).hexdigest(),
+                bytes_to_hex(tree_hash(chunk_hashes(part))))
+        self.assertEqual(self.sent, expected)
+
+    def assert_completed(self):
+        self.api.complete_multipart_upload.assert_called_with(
+            'vault_name', 'upload_id',
+            bytes_to_hex(tree_hash(chunk_hashes(self.data))), len(self.data))
+
+    def test_parts_are_hashed_ahead_of_upload(self):
+        uploader = self.uploader(hash_threads=2, max_pending_parts=1)
+        self.assertEqual(uploader.upload(self.fileobj.name), 'archive_id')
+        self.assert_parts_sent([0, 1, 2])
+        self.assert_completed()
+        self.assertEqual(uploader.stats.parts_uploaded, 3)
+        self.assertEqual(uploader.stats.bytes_uploaded, len(self.data))
+        self.assertEqual(uploader.stats.bytes_hashed, len(self.data))
+        self.assertTrue(uploader.stats.throughput > 0)
+
+    def test_upload_threads_hash_without_hash_threads(self):
+        uploader = self.uploader(hash_threads=0)
+        uploader.upload(self.fileobj.name)
+        self.assert_parts_sent([0, 1, 2])
+        self.assert_completed()
+
+    def test_state_file_is_removed_after_upload(self):
+        self.uploader().upload(self.fileobj.name, state_file=self.state_file)
+        self.assert_completed()
+        self.assertFalse(os.path.exists(self.state_file))
+
+    def test_failed_upload_is_resumed_from_state_file(self):
+        def fail_last_part(*args):
+            if args[4][0] == 2 * 1024 * 1024:
+                raise Exception('part failed')
+            return self.upload_part(*args)
+        self.api.upload_part.side_effect = fail_last_part
+        uploader = ConcurrentUploader(self.api, 'vault_name',
+                                      part_size=1024 * 1024, num_threads=1)
+        with mock.patch('time.sleep'):
+            with self.assertRaises(UploadArchiveError):
+                uploader.upload(self.fileobj.name,
+                                state_file=self.state_file)
+        self.assertFalse(self.api.abort_multipart_upload.called)
+        with open(self.state_file) as fp:
+            state = json.load(fp)
+        self.assertEqual(state['upload_id'], 'upload_id')
+        self.assertEqual(sorted(state['parts']), ['0', '1'])
+
+        self.sent = {}
+        self.api.upload_part.side_effect = self.upload_part
+        self.api.initiate_multipart_upload.reset_mock()
+        uploader = self.uploader()
+        uploader.upload(self.fileobj.name, state_file=self.state_file)
+        self.assertFalse(self.api.initiate_multipart_upload.called)
+        self.assert_parts_sent([2])
+        self.assert_completed()
+        self.assertEqual(uploader.stats.parts_resumed, 2)
+
+    def test_state_file_for_another_file_is_ignored(self):
+        with open(self.state_file, 'w') as fp:
+            json.dump({'upload_id': 'stale', 'parts': {},
+                       'filename': 'other'}, fp)
+        self.uploader().upload(self.fileobj.name, state_file=self.state_file)
+        self.assertTrue(self.api.initiate_multipart_upload.called)
+        self.assert_parts_sent([0, 1, 2])
+        self.assert_completed()
+
+
+class TestPartHashes(unittest.TestCase):
+    def test_reserve_is_bounded(self):
+        part_hashes = _PartHashes(max_pending=2)
+        self.assertTrue(part_hashes.reserve())
+        self.assertTrue(part_hashes.reserve())
+        part_hashes.put(0, None)
+        part_hashes.put(1, None)
+        self.assertIsNone(part_hashes.take(1))
+        self.assertTrue(part_hashes.reserve())
+        part_hashes.close()
+        self.assertFalse(part_hashes.reserve())
+
+    def test_part_is_taken_once(self):
+        part_hashes = _PartHashes(max_pending=1)
+        region = mock.Mock()
+        part_hashes.reserve()
+        part_hashes.put(0, (region, 'linear', b'tree'))
+        self.assertEqual(part_hashes.take(0), (region, 'linear', b'tree'))
+        self.assertIsNone(part_hashes.take(0))
+
+    def test_close_releases_waiting_parts(self):
+        part_hashes = _PartHashes(max_pending=1)
+        region = mock.Mock()
+        part_hashes.reserve()
+        part_hashes.put(0, (region, 'linear', b'tree'))
+        part_hashes.close()
+        region.close.assert_called_with()
+        self.assertIsNone(part_hashes.take(0))
+
+
 class TestUploaderThread(unittest.TestCase):
     def setUp(self):
         self.fileobj = tempfile.NamedTemporaryFile()
@@ -134,6 +273,29 @@ class TestUploaderThread(unittest.TestCase):
         thread.run()
         self.assertTrue(fileobj.closed)
 
+    def test_part_is_hashed_and_sent_from_file(self):
+        data = os.urandom(3 * 1024 * 1024)
+        self.fileobj.write(data)
+        self.fileobj.flush()
+        api = mock.Mock()
+        sent = []
+        api.upload_part.side_effect = lambda *args: sent.append(
+            bytes(args[-1].read())) or mock.Mock()
+        thread = UploadWorkerThread(api, 'vault_name', self.filename,
+                                    'upload_id', Queue(), Queue())
+        self.addCleanup(thread._cleanup)
+
+        part_number, part_tree_hash = thread._upload_chunk((1, 2 * 1024 * 1024))
+
+        part = data[2 * 1024 * 1024:]
+        self.assertEqual(part_number, 1)
+        self.assertEqual(part_tree_hash, tree_hash(chunk_hashes(part)))
+        args = api.upload_part.call_args[0]
+        self.assertEqual(args[2], hashlib.sha256(part).hexdigest())
+        self.assertEqual(args[3], bytes_to_hex(part_tree_hash))
+        self.assertEqual(args[4], (2 * 1024 * 1024, 3 * 1024 * 1024 - 1))
+        self.assertEqual(sent, [part])
+
     def test_upload_errors_have_exception_messages(self):
         api = mock.Mock()
         job_queue = Queue()
@@ -2,6 +2,8 @@ import json
 import copy
 import tempfile
 
+from boto.utils import MappedFileRegion
+
 from tests.unit import AWSMockServiceTestCase
 from boto.glacier.layer1 import Layer1
 
@@ -96,3 +98,20 @@ class GlacierUploadArchiveResets(GlacierLayer1ConnectionBase):
         # a request.  This ensures that if we need to resend the request we're
         # back at the correct location within the file.
         self.assertEqual(fake_data.tell(), 2)
+
+    def test_upload_part_from_mapped_region(self):
+        with tempfile.NamedTemporaryFile() as fake_data:
+            fake_data.write(b'foobarbaz')
+            fake_data.flush()
+            part = MappedFileRegion(fake_data.name, 3, 4)
+            self.set_http_response(status_code=204)
+            sent = []
+            self.service_connection.connection.request.side_effect = \
+                lambda method, path, body, headers: sent.append(
+                    (bytes(body.read()), headers['Content-Length']))
+            self.service_connection.upload_part(
+                'vault_name', 'upload_id', 'linear_hash', 'tree_hash',
+                (3, 6), part)
+            self.assertEqual(sent, [(b'barb', 4)])
+            self.assertEqual(part.tell(), 0)
+            part.close()
@@ -28,7 +28,7 @@ from tests.unit import unittest
 
 from boto.compat import BytesIO, six, StringIO
 from boto.glacier.utils import minimum_part_size, chunk_hashes, tree_hash, \
-        bytes_to_hex, compute_hashes_from_fileobj
+        bytes_to_hex, compute_hashes_from_fileobj, TreeHash
 
 
 class TestPartSizeCalculations(unittest.TestCase):
@@ -118,6 +118,16 @@ class TestTreeHash(unittest.TestCase):
             self.calculate_tree_hash(''),
             b'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855')
 
+    def test_incremental_tree_hash(self):
+        data = os.urandom(3 * 1024 * 1024 + 20)
+        hasher = TreeHash()
+        for offset in range(0, len(data), 300000):
+            hasher.update(data[offset:offset + 300000])
+        self.assertEqual(hasher.hexdigest(), self.calculate_tree_hash(data))
+        self.assertEqual(TreeHash(b'abc', chunk_size=2).digest(),
+                         tree_hash(chunk_hashes(b'abc', chunk_size=2)))
+        self.assertEqual(TreeHash().digest(), tree_hash(chunk_hashes(b'')))
+
 
 class TestFileHash(unittest.TestCase):
     def _gen_data(self):
@@ -161,5 +171,9 @@ class TestFileHash(unittest.TestCase):
 
     def test_compute_hash_bytesio(self):
         # Compute a hash from a file-like BytesIO object.
-        f = BytesIO(self._gen_data())
-        compute_hashes_from_fileobj(f, chunk_size=512)
+        data = self._gen_data()
+        f = BytesIO(data)
+        linear_hash, tree = compute_hashes_from_fileobj(f, chunk_size=512)
+        self.assertEqual(linear_hash, sha256(data).hexdigest())
+        self.assertEqual(tree, bytes_to_hex(tree_hash(chunk_hashes(data,
+                                                                   512))))
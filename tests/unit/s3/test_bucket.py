@@ -5,11 +5,14 @@ import xml.dom.minidom
 from tests.unit import unittest
 from tests.unit import AWSMockServiceTestCase
 
+from boto.compat import BytesIO
 from boto.exception import BotoClientError
+from boto.handler import XmlStreamParser
 from boto.s3.connection import S3Connection
 from boto.s3.bucket import Bucket
 from boto.s3.deletemarker import DeleteMarker
 from boto.s3.key import Key
+from boto.s3.multidelete import Deleted, Error, MultiDeleteResult
 from boto.s3.multipart import MultiPartUpload
 from boto.s3.prefix import Prefix
 
@@ -227,3 +230,112 @@ class TestS3Bucket(AWSMockServiceTestCase):
         document = xml.dom.minidom.parseString(xml_policy)
         namespace = document.documentElement.namespaceURI
         self.assertEqual(namespace, 'http://s3.amazonaws.com/doc/2006-03-01/')
+
+
+class TestS3BucketStreamingList(AWSMockServiceTestCase):
+    connection_class = S3Connection
+
+    def listing(self, names, truncated):
+        contents = ''.join('<Contents><Key>%s</Key><Size>1</Size></Contents>'
+                           % name for name in names)
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<ListBucketResult><Name>mybucket</Name>'
+                '<IsTruncated>%s</IsTruncated>%s</ListBucketResult>'
+                % (truncated and 'true' or 'false', contents)).encode('utf-8')
+
+    def streamed_response(self, body):
+        response = self.create_response(status_code=200)
+        response.read.side_effect = BytesIO(body).read
+        return response
+
+    @patch.object(XmlStreamParser, 'ChunkSize', 64)
+    def test_keys_are_yielded_while_parsing(self):
+        body = self.listing(['key%03d' % i for i in range(50)], False)
+        response = self.streamed_response(body)
+        self.https_connection.getresponse.return_value = response
+        bucket = Bucket(self.service_connection, 'mybucket')
+
+        keys = iter(bucket.list())
+        self.assertEqual(next(keys).name, 'key000')
+        self.assertTrue(response.read.call_count * 64 < len(body))
+        self.assertEqual([k.name for k in keys],
+                         ['key%03d' % i for i in range(1, 50)])
+
+    def test_pages_are_followed(self):
+        self.https_connection.getresponse.side_effect = [
+            self.streamed_response(self.listing(['a', 'b'], True)),
+            self.streamed_response(self.listing(['c'], False)),
+        ]
+        bucket = Bucket(self.service_connection, 'mybucket')
+        self.assertEqual([k.name for k in bucket.list()], ['a', 'b', 'c'])
+        self.assertIn('marker=b', self.actual_request.path)
+
+    def test_error_is_raised_before_iterating(self):
+        self.set_http_response(status_code=403)
+        bucket = Bucket(self.service_connection, 'mybucket')
+        with self.assertRaises(self.service_connection.provider.
+                               storage_response_error):
+            bucket.iter_all_keys()
+
+
+class TestS3BucketDeleteKeys(AWSMockServiceTestCase):
+    connection_class = S3Connection
+
+    def setUp(self):
+        super(TestS3BucketDeleteKeys, self).setUp()
+        self.bucket = Bucket(self.service_connection, 'mybucket')
+
+    def test_quiet_delete_counts_deleted_keys(self):
+        self.set_http_response(status_code=200, body=(
+            b'<DeleteResult><Error><Key>b&amp;c</Key><Code>AccessDenied</Code>'
+            b'<Message>Access Denied</Message></Error></DeleteResult>'))
+        result = self.bucket.delete_keys(
+            ['a', 'b&c', ('d', 'v1'), Prefix(name='dir/')], quiet=True)
+
+        body = self.actual_request.body.decode('utf-8')
+        self.assertEqual(body, (
+            '<?xml version="1.0" encoding="UTF-8"?><Delete>'
+            '<Quiet>true</Quiet><Object><Key>a</Key></Object>'
+            '<Object><Key>b&amp;c</Key></Object><Object><Key>d</Key>'
+            '<VersionId>v1</VersionId></Object></Delete>'))
+        self.assertEqual(result.deleted, [])
+        self.assertEqual(result.deleted_count, 2)
+        self.assertEqual(sorted(e.code for e in result.errors),
+                         ['AccessDenied', 'PrefixSkipped'])
+
+    def test_parallel_delete_reads_keys_lazily(self):
+        sent = []
+
+        def delete_batch(data, mfa_token=None, headers=None):
+            document = xml.dom.minidom.parseString(data)
+            names = [node.firstChild.data for node in
+                     document.getElementsByTagName('Key')]
+            sent.append(len(names))
+            result = MultiDeleteResult()
+            for name in names:
+                if name == 'key-1500':
+                    result.errors.append(Error(name, code='InternalError'))
+                else:
+                    result.deleted.append(Deleted(name))
+            return result
+
+        def keys():
+            for i in range(2500):
+                yield 'key-%d' % i
+
+        with patch.object(Bucket, '_delete_batch',
+                          side_effect=delete_batch):
+            result = self.bucket.delete_keys(keys(), parallel=3)
+        self.assertEqual(sorted(sent), [500, 1000, 1000])
+        self.assertEqual(result.deleted_count, 2499)
+        self.assertEqual(len(result.deleted), 2499)
+        self.assertEqual([e.key for e in result.errors], ['key-1500'])
+
+    def test_parallel_delete_raises_first_error(self):
+        with patch.object(Bucket, '_delete_batch', side_effect=
+                          self.service_connection.provider.
+                          storage_response_error(403, 'Forbidden')):
+            with self.assertRaises(
+                    self.service_connection.provider.storage_response_error):
+                self.bucket.delete_keys(('key-%d' % i for i in range(5000)),
+                                        parallel=2)
@@ -0,0 +1,117 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from tests.compat import unittest
+
+from boto.exception import S3ResponseError
+from boto.resultset import ResultSet
+from boto.s3.bucketlistresultset import BucketListResultSet, find_shards
+from boto.s3.key import Key
+from boto.s3.prefix import Prefix
+
+
+class FakeBucket(object):
+    """Lists a fixed set of key names the way S3 does, in small pages."""
+
+    page_size = 7
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.requests = 0
+        self.fail_on = None
+
+    def get_all_keys(self, headers=None, prefix='', marker='', delimiter='',
+                     max_keys=None, encoding_type=None):
+        self.requests += 1
+        if self.fail_on is not None and marker >= self.fail_on:
+            raise S3ResponseError(500, 'Internal Error')
+        rs = ResultSet()
+        max_keys = max_keys or self.page_size
+        for name in self.names:
+            if name <= marker or not name.startswith(prefix):
+                continue
+            rest = name[len(prefix):]
+            if delimiter and delimiter in rest:
+                common = prefix + rest[:rest.index(delimiter) + 1]
+                if rs and rs[-1].name == common:
+                    continue
+                item = Prefix(self, common)
+            else:
+                item = Key(self, name)
+            if len(rs) == max_keys:
+                rs.is_truncated = True
+                break
+            rs.append(item)
+        if delimiter and rs:
+            rs.next_marker = rs[-1].name
+            if isinstance(rs[-1], Prefix):
+                # S3 continues after everything under a rolled-up prefix.
+                rs.next_marker += u'\U0010ffff'
+        return rs
+
+
+class TestParallelBucketLister(unittest.TestCase):
+    def setUp(self):
+        self.names = ['%s%03d' % (c, i) for c in 'aBz0-_.'
+                      for i in range(0, 60, 3)]
+        self.bucket = FakeBucket(self.names)
+
+    def list(self, **kwargs):
+        return [k.name for k in BucketListResultSet(self.bucket, **kwargs)]
+
+    def test_ordered_listing_matches_sequential(self):
+        self.assertEqual(self.list(parallel=4), sorted(self.names))
+
+    def test_unordered_listing_has_every_key_once(self):
+        names = self.list(parallel=4, ordered=False)
+        self.assertEqual(sorted(names), sorted(self.names))
+
+    def test_prefix_and_marker(self):
+        self.assertEqual(self.list(prefix='a', marker='a030', parallel=3),
+                         ['a033', 'a036', 'a039', 'a042', 'a045', 'a048',
+                          'a051', 'a054', 'a057'])
+
+    def test_shards_follow_a_common_prefix(self):
+        self.bucket = FakeBucket(['logs/2014/%s%03d' % (c, i)
+                                  for c in 'abc' for i in range(10)])
+        shards = find_shards(self.bucket, num_shards=8)
+        self.assertEqual(len(shards), 3)
+        self.assertEqual(self.list(parallel=4), self.bucket.names)
+
+    def test_delimiter_prefixes_are_not_repeated(self):
+        self.bucket = FakeBucket(['dir%d/file%02d' % (d, i)
+                                  for d in range(3) for i in range(30)] +
+                                 ['top'])
+        self.assertEqual(self.list(delimiter='/', parallel=4),
+                         ['dir0/', 'dir1/', 'dir2/', 'top'])
+
+    def test_errors_are_raised(self):
+        self.bucket.fail_on = 'z'
+        with self.assertRaises(S3ResponseError):
+            self.list(parallel=4)
+
+    def test_empty_bucket(self):
+        self.bucket = FakeBucket([])
+        self.assertEqual(self.list(parallel=4), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import gzip
+
+from tests.compat import mock, unittest
+
+from boto.compat import BytesIO
+from boto.exception import BotoClientError, StorageDataError
+from boto.s3 import compression
+from boto.s3.compression import CompressingReader, DecompressingWriter
+
+
+class TestCompressingReader(unittest.TestCase):
+    data = b'some log line\n' * 5000
+
+    def read_all(self, reader, amount):
+        chunks = []
+        while True:
+            chunk = reader.read(amount)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def test_reads_compressed_contents(self):
+        reader = CompressingReader(BytesIO(self.data), 'gzip')
+        compressed = self.read_all(reader, 1000)
+        self.assertEqual(gzip.GzipFile(fileobj=BytesIO(compressed)).read(),
+                         self.data)
+        self.assertEqual(reader.tell(), len(compressed))
+        self.assertEqual(reader.bytes_read, len(self.data))
+
+    def test_reads_whole_buffers(self):
+        reader = CompressingReader(BytesIO(self.data), 'gzip', read_size=10)
+        self.assertEqual(len(reader.read(100)), 100)
+
+    def test_size_limits_what_is_read(self):
+        fp = BytesIO(self.data)
+        fp.seek(14)
+        reader = CompressingReader(fp, 'gzip', size=28)
+        compressed = reader.read()
+        self.assertEqual(gzip.GzipFile(fileobj=BytesIO(compressed)).read(),
+                         self.data[14:42])
+
+    def test_rewind(self):
+        fp = BytesIO(self.data)
+        fp.seek(14)
+        reader = CompressingReader(fp, 'gzip')
+        first = reader.read(50)
+        reader.seek(0)
+        self.assertEqual(reader.tell(), 0)
+        self.assertEqual(reader.read(50), first)
+        with self.assertRaises(IOError):
+            reader.seek(10)
+
+    def test_rewind_needs_seekable_file(self):
+        fp = mock.Mock(spec=['read'])
+        fp.read.side_effect = BytesIO(self.data).read
+        reader = CompressingReader(fp, 'gzip')
+        reader.read(50)
+        with self.assertRaises(IOError):
+            reader.seek(0)
+
+    def test_unknown_encoding(self):
+        with self.assertRaises(BotoClientError):
+            CompressingReader(BytesIO(self.data), 'brotli')
+
+    def test_zstd_needs_zstandard(self):
+        with mock.patch.object(compression, 'zstandard', None):
+            with self.assertRaises(BotoClientError):
+                CompressingReader(BytesIO(self.data), 'zstd')
+
+
+class TestDecompressingWriter(unittest.TestCase):
+    def test_round_trip(self):
+        data = b'0123456789' * 1000
+        compressed = CompressingReader(BytesIO(data), 'gzip').read()
+        fp = BytesIO()
+        writer = DecompressingWriter(fp, 'gzip')
+        for i in range(0, len(compressed), 7):
+            writer.write(compressed[i:i + 7])
+        writer.finish()
+        self.assertEqual(fp.getvalue(), data)
+
+    def test_truncated_stream(self):
+        compressed = CompressingReader(BytesIO(b'x' * 100), 'gzip').read()
+        writer = DecompressingWriter(BytesIO(), 'gzip')
+        writer.write(compressed[:-4])
+        with self.assertRaises(StorageDataError):
+            writer.finish()
+
+
+class TestDecodableEncoding(unittest.TestCase):
+    def test_decodable_encoding(self):
+        self.assertEqual(compression.decodable_encoding('gzip'), 'gzip')
+        self.assertEqual(compression.decodable_encoding(' X-GZIP'), 'gzip')
+        self.assertEqual(compression.decodable_encoding('zstd'), 'zstd')
+        self.assertIsNone(compression.decodable_encoding('gzip, br'))
+        self.assertIsNone(compression.decodable_encoding(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,14 +20,20 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 #
+import base64
+import hashlib
+import socket
+import tempfile
+
 from tests.compat import mock, unittest
 from tests.unit import AWSMockServiceTestCase
 
-from boto.compat import StringIO
+from boto.compat import BytesIO, StringIO
 from boto.exception import BotoServerError
 from boto.s3.connection import S3Connection
 from boto.s3.bucket import Bucket
-from boto.s3.key import Key
+from boto.s3.compression import CompressingReader
+from boto.s3.key import Key, _ReadSizer
 
 
 class TestS3Key(AWSMockServiceTestCase):
@@ -168,6 +174,314 @@ class TestS3KeyRetries(AWSMockServiceTestCase):
         self.assertTrue(k.should_retry.count, 1)
 
 
+class TestS3KeySigV4Payload(AWSMockServiceTestCase):
+    connection_class = S3Connection
+
+    def create_service_connection(self, **kwargs):
+        kwargs['host'] = 's3.cn-north-1.amazonaws.com.cn'
+        return super(TestS3KeySigV4Payload, self).create_service_connection(
+            **kwargs)
+
+    def upload(self, data):
+        self.set_http_response(status_code=200, header=[
+            ('etag', '"%s"' % hashlib.md5(data).hexdigest())])
+        # The sender reuses its buffer, so copy what is sent right away.
+        sent = []
+        self.https_connection.send.side_effect = \
+            lambda data: sent.append(bytes(data))
+        k = Bucket(self.service_connection, 'mybucket').new_key('mykey')
+        with mock.patch('boto.s3.key.compute_hash') as compute_hash:
+            k.set_contents_from_file(BytesIO(data))
+        self.assertFalse(compute_hash.called)
+        headers = dict(call[0] for call in
+                       self.https_connection.putheader.call_args_list)
+        return k, headers, b''.join(sent)
+
+    def test_streaming_payload(self):
+        self.service_connection.payload_signing = 'streaming'
+        data = b'abcdefgh' * (Key.StreamingChunkSize // 8 + 128)
+        k, headers, body = self.upload(data)
+
+        self.assertEqual(headers['x-amz-content-sha256'],
+                         'STREAMING-AWS4-HMAC-SHA256-PAYLOAD')
+        self.assertEqual(headers['Content-Encoding'], 'aws-chunked')
+        self.assertEqual(headers['x-amz-decoded-content-length'],
+                         str(len(data)))
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        self.assertNotIn('Content-MD5', headers)
+
+        decoded, sizes = b'', []
+        while body:
+            header, body = body.split(b'\r\n', 1)
+            size, signature = header.split(b';chunk-signature=')
+            self.assertEqual(len(signature), 64)
+            size = int(size, 16)
+            decoded += body[:size]
+            self.assertEqual(body[size:size + 2], b'\r\n')
+            body = body[size + 2:]
+            sizes.append(size)
+        self.assertEqual(decoded, data)
+        self.assertEqual(sizes, [Key.StreamingChunkSize, 1024, 0])
+        self.assertEqual(k.md5,
+                         hashlib.md5(data).hexdigest().encode('ascii'))
+
+    def test_signed_payload_is_hashed_with_md5(self):
+        data = b'signed payload' * 1000
+        self.set_http_response(status_code=200, header=[
+            ('etag', '"%s"' % hashlib.md5(data).hexdigest())])
+        fp = BytesIO(data)
+        read = mock.Mock(side_effect=fp.read)
+        k = Bucket(self.service_connection, 'mybucket').new_key('mykey')
+        with mock.patch.object(fp, 'read', read):
+            with mock.patch('boto.s3.key.compute_hash') as compute_hash:
+                k.set_contents_from_file(fp)
+        self.assertFalse(compute_hash.called)
+        headers = dict(call[0] for call in
+                       self.https_connection.putheader.call_args_list)
+        self.assertEqual(headers['x-amz-content-sha256'],
+                         hashlib.sha256(data).hexdigest())
+        self.assertEqual(headers['Content-MD5'],
+                         base64.b64encode(hashlib.md5(data).digest()).decode())
+        self.assertIsNone(k._payload_sha256)
+
+    def test_unsigned_payload(self):
+        self.service_connection.payload_signing = 'unsigned'
+        data = b'unsigned payload'
+        k, headers, body = self.upload(data)
+
+        self.assertEqual(headers['x-amz-content-sha256'], 'UNSIGNED-PAYLOAD')
+        self.assertEqual(headers['Content-Length'], str(len(data)))
+        self.assertEqual(body, data)
+        self.assertEqual(k.md5,
+                         hashlib.md5(data).hexdigest().encode('ascii'))
+
+    def test_unsigned_payload_requires_https(self):
+        self.service_connection.payload_signing = 'unsigned'
+        k = Bucket(self.service_connection, 'mybucket').new_key('mykey')
+        self.assertEqual(k._payload_signing(), 'unsigned')
+        self.service_connection.is_secure = False
+        self.assertEqual(k._payload_signing(), 'signed')
+
+    def test_unknown_payload_signing(self):
+        with self.assertRaises(ValueError):
+            self.create_service_connection(payload_signing='sometimes')
+
+
+class TestS3KeySendPaths(AWSMockServiceTestCase):
+    connection_class = S3Connection
+
+    data = b'0123456789' * 2000
+
+    def setUp(self):
+        super(TestS3KeySendPaths, self).setUp()
+        self.set_http_response(status_code=200, header=[
+            ('etag', '"%s"' % hashlib.md5(self.data).hexdigest())])
+        self.key = Bucket(self.service_connection, 'mybucket').new_key('k')
+
+    def test_buffered_file_is_sent_from_reusable_buffer(self):
+        data = self.data
+        sent = []
+        self.https_connection.send.side_effect = \
+            lambda chunk: sent.append(chunk)
+        self.key.send_file(BytesIO(data), size=len(data))
+
+        self.assertTrue(all(isinstance(c, memoryview) for c in sent))
+        self.assertEqual(len(set(id(c.obj) for c in sent)), 1)
+        self.assertEqual(self.key.size, len(data))
+
+    @unittest.skipUnless(hasattr(socket.socket, 'sendfile'),
+                         'socket.sendfile is not available')
+    def test_regular_file_is_sent_with_sendfile(self):
+        data = self.data
+        with tempfile.NamedTemporaryFile() as tmp:
+            tmp.write(data)
+            tmp.flush()
+            ours, theirs = socket.socketpair()
+            self.addCleanup(ours.close)
+            self.addCleanup(theirs.close)
+            self.https_connection.sock = ours
+            cb = mock.Mock()
+            with open(tmp.name, 'rb') as fp:
+                self.key.set_contents_from_file(fp, cb=cb, num_cb=3)
+
+        self.assertFalse(self.https_connection.send.called)
+        received = b''
+        while len(received) < len(data):
+            received += theirs.recv(len(data))
+        self.assertEqual(received, data)
+        cb.assert_called_with(len(data), len(data))
+
+
+class TestS3KeyBufferSize(AWSMockServiceTestCase):
+    connection_class = S3Connection
+
+    data = b'0123456789' * 2000
+
+    def setUp(self):
+        super(TestS3KeyBufferSize, self).setUp()
+        self.set_http_response(status_code=200, header=[
+            ('etag', '"%s"' % hashlib.md5(self.data).hexdigest())])
+        self.key = Bucket(self.service_connection, 'mybucket').new_key('k')
+        self.sent = []
+        self.https_connection.send.side_effect = \
+            lambda chunk: self.sent.append(len(chunk))
+
+    def test_per_call_buffer_size(self):
+        self.key.send_file(BytesIO(self.data), size=len(self.data),
+                           buffer_size=3000)
+        self.assertEqual(self.sent, [3000] * 6 + [2000])
+
+    def test_connection_buffer_size(self):
+        self.service_connection.key_buffer_size = 5000
+        self.key.send_file(BytesIO(self.data), size=len(self.data))
+        self.assertEqual(self.sent, [5000] * 4)
+
+    def test_unknown_buffer_size(self):
+        with self.assertRaises(ValueError):
+            self.create_service_connection(key_buffer_size=0)
+        conn = self.create_service_connection(
+            aws_access_key_id='aws_access_key_id',
+            aws_secret_access_key='aws_secret_access_key',
+            key_buffer_size='adaptive')
+        self.assertEqual(conn.key_buffer_size, 'adaptive')
+
+    def test_progress_does_not_depend_on_buffer_size(self):
+        for buffer_size in (100, 7000):
+            cb = mock.Mock()
+            self.key.send_file(BytesIO(self.data), cb=cb, num_cb=5,
+                               size=len(self.data), buffer_size=buffer_size)
+            self.assertTrue(cb.call_count <= 5)
+            self.assertEqual(cb.call_args_list[0], mock.call(0, 20000))
+            self.assertEqual(cb.call_args_list[-1], mock.call(20000, 20000))
+
+    def test_every_read_is_reported(self):
+        cb = mock.Mock()
+        self.key.send_file(BytesIO(self.data), cb=cb, num_cb=-1,
+                           size=len(self.data), buffer_size=4000)
+        self.assertEqual([c[0][0] for c in cb.call_args_list],
+                         [0, 4000, 8000, 12000, 16000, 20000])
+
+    def test_download_buffer_size(self):
+        response = self.create_response(200, header=[
+            ('content-length', str(len(self.data)))])
+        response.read.side_effect = BytesIO(self.data).read
+        self.https_connection.getresponse.return_value = response
+        fp = BytesIO()
+        self.key.get_contents_to_file(fp, buffer_size=6000)
+        self.assertEqual(fp.getvalue(), self.data)
+        self.assertEqual(set(c[0][0] for c in response.read.call_args_list
+                             if c[0]), set([6000]))
+
+
+class TestS3KeyCompression(AWSMockServiceTestCase):
+    connection_class = S3Connection
+
+    data = b'some log line\n' * 5000
+
+    def setUp(self):
+        super(TestS3KeyCompression, self).setUp()
+        self.compressed = CompressingReader(BytesIO(self.data), 'gzip').read()
+        self.key = Bucket(self.service_connection, 'mybucket').new_key('k')
+
+    def test_upload_is_compressed(self):
+        self.set_http_response(status_code=200, header=[
+            ('etag', '"%s"' % hashlib.md5(self.compressed).hexdigest())])
+        sent = []
+        self.https_connection.send.side_effect = \
+            lambda data: sent.append(bytes(data))
+        size = self.key.set_contents_from_file(BytesIO(self.data),
+                                               compress='gzip')
+
+        headers = dict(call[0] for call in
+                       self.https_connection.putheader.call_args_list)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Content-Length'],
+                         str(len(self.compressed)))
+        self.assertEqual(b''.join(sent), self.compressed)
+        self.assertEqual(size, len(self.compressed))
+        self.assertEqual(self.key.md5, hashlib.md5(
+            self.compressed).hexdigest().encode('ascii'))
+
+    def test_large_upload_is_sent_in_parts(self):
+        bucket = self.key.bucket = mock.Mock(spec=Bucket)
+        bucket.name = 'mybucket'
+        bucket.connection = self.service_connection
+        mp = bucket.initiate_multipart_upload.return_value
+        parts = []
+
+        def upload_part(fp, part_num):
+            parts.append((part_num, fp.read()))
+            return mock.Mock(etag='"etag%d"' % part_num)
+        mp.upload_part_from_file.side_effect = upload_part
+        bucket.complete_multipart_upload.return_value = mock.Mock(
+            etag='"abc-3"')
+
+        size = self.key._send_compressed(BytesIO(self.data), 'gzip',
+                                         part_size=80)
+
+        self.assertEqual(size, len(self.compressed))
+        self.assertEqual([p[0] for p in parts], [1, 2, 3])
+        self.assertEqual([len(p[1]) for p in parts],
+                         [80, 80, len(self.compressed) - 160])
+        self.assertEqual(b''.join(p[1] for p in parts), self.compressed)
+        headers = bucket.initiate_multipart_upload.call_args[1]['headers']
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertIn('<ETag>"etag3"</ETag>',
+                      bucket.complete_multipart_upload.call_args[0][2])
+        self.assertEqual(self.key.etag, '"abc-3"')
+
+    def test_failed_part_cancels_upload(self):
+        bucket = self.key.bucket = mock.Mock(spec=Bucket)
+        bucket.name = 'mybucket'
+        bucket.connection = self.service_connection
+        mp = bucket.initiate_multipart_upload.return_value
+        mp.upload_part_from_file.side_effect = IOError('boom')
+        with self.assertRaises(IOError):
+            self.key._send_compressed(BytesIO(self.data), 'gzip',
+                                      part_size=80)
+        self.assertTrue(mp.cancel_upload.called)
+
+    def download(self, **kwargs):
+        response = self.create_response(200, header=[
+            ('content-length', str(len(self.compressed))),
+            ('content-encoding', 'gzip')])
+        response.read.side_effect = BytesIO(self.compressed).read
+        self.https_connection.getresponse.return_value = response
+        fp = BytesIO()
+        self.key.get_contents_to_file(fp, **kwargs)
+        return fp.getvalue()
+
+    def test_download_is_decompressed(self):
+        self.assertEqual(self.download(decompress=True), self.data)
+        self.assertEqual(self.key.local_hashes['md5'],
+                         hashlib.md5(self.compressed).digest())
+
+    def test_download_is_not_decompressed_by_default(self):
+        self.assertEqual(self.download(), self.compressed)
+
+
+class TestReadSizer(unittest.TestCase):
+    @mock.patch('time.time')
+    def test_adaptive_size_follows_throughput(self, time_mock):
+        time_mock.side_effect = [0, 0, 0, 0, 1, 1]
+        sizer = _ReadSizer(10, adaptive=True, max_size=40)
+        sizer.record(10)
+        self.assertEqual(sizer.size, 20)
+        sizer.record(20)
+        sizer.record(40)
+        self.assertEqual(sizer.size, 40)
+        sizer.record(40)
+        self.assertEqual(sizer.size, 20)
+        # A short read doesn't grow the size.
+        sizer.record(5)
+        self.assertEqual(sizer.size, 20)
+
+    def test_fixed_size(self):
+        sizer = _ReadSizer(10)
+        sizer.record(10)
+        self.assertEqual(sizer.size, 10)
+
+
 class TestFileError(unittest.TestCase):
     def test_file_error(self):
         key = Key()
@@ -0,0 +1,175 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+from tests.compat import mock, unittest
+
+from boto.exception import S3ResponseError
+from boto.s3.key import Key
+from boto.s3.multidelete import MultiDeleteResult
+from boto.s3.sync import DirectorySync, Manifest
+
+
+class FakeKey(Key):
+    def set_contents_from_filename(self, filename, **kwargs):
+        with open(filename, 'rb') as fp:
+            data = fp.read()
+        if self.bucket.fail_on == self.name:
+            raise S3ResponseError(500, 'Internal Error')
+        self.size = len(data)
+        self.etag = '"%s"' % hashlib.md5(data).hexdigest()
+        self.last_modified = '2100-01-01T00:00:00.000Z'
+        with self.bucket.mutex:
+            self.bucket.keys[self.name] = self
+            self.bucket.uploaded.append(self.name)
+
+
+class FakeBucket(object):
+    def __init__(self):
+        self.keys = {}
+        self.uploaded = []
+        self.deleted = []
+        self.lists = 0
+        self.fail_on = None
+        self.mutex = threading.Lock()
+
+    def new_key(self, name):
+        return FakeKey(self, name)
+
+    def list(self, prefix='', headers=None):
+        self.lists += 1
+        return [self.keys[name] for name in sorted(self.keys)
+                if name.startswith(prefix)]
+
+    def delete_keys(self, keys, quiet=False, headers=None, parallel=None):
+        result = MultiDeleteResult()
+        for name in keys:
+            del self.keys[name]
+            self.deleted.append(name)
+            result.deleted_count += 1
+        return result
+
+
+class TestDirectorySync(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.local_dir = os.path.join(self.tmpdir, 'tree')
+        self.manifest_path = os.path.join(self.tmpdir, 'manifest.json')
+        self.write('a.txt', b'alpha')
+        self.write('sub/b.txt', b'bravo')
+        self.write('sub/deeper/c.txt', b'charlie')
+        self.bucket = FakeBucket()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, data):
+        path = os.path.join(self.local_dir, *name.split('/'))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as fp:
+            fp.write(data)
+
+    def sync(self, **kwargs):
+        kwargs.setdefault('manifest_path', self.manifest_path)
+        return DirectorySync(self.bucket, self.local_dir, 'backup/',
+                             num_threads=2, **kwargs).run()
+
+    def test_first_sync_uploads_everything(self):
+        stats = self.sync()
+        self.assertEqual(sorted(self.bucket.uploaded),
+                         ['backup/a.txt', 'backup/sub/b.txt',
+                          'backup/sub/deeper/c.txt'])
+        self.assertEqual(stats.uploaded, 3)
+        self.assertEqual(stats.bytes_uploaded, 17)
+        self.assertEqual(stats.unchanged, 0)
+        self.assertEqual(self.bucket.lists, 1)
+
+    def test_second_sync_uploads_only_changes(self):
+        self.sync()
+        self.bucket.uploaded = []
+        self.write('sub/b.txt', b'bravo!')
+        self.write('d.txt', b'delta')
+        stats = self.sync()
+        self.assertEqual(sorted(self.bucket.uploaded),
+                         ['backup/d.txt', 'backup/sub/b.txt'])
+        self.assertEqual(stats.unchanged, 2)
+
+    def test_unchanged_files_are_not_rehashed(self):
+        self.sync()
+        with mock.patch('boto.s3.sync.compute_md5') as compute_md5:
+            stats = self.sync()
+        self.assertFalse(compute_md5.called)
+        self.assertEqual(stats.unchanged, 3)
+
+    def test_same_size_change_is_found_by_etag(self):
+        self.sync(manifest_path=None)
+        self.bucket.uploaded = []
+        self.write('a.txt', b'ALPHA')
+        self.sync(manifest_path=None)
+        self.assertEqual(self.bucket.uploaded, ['backup/a.txt'])
+
+    def test_multipart_etag_falls_back_to_mtime(self):
+        key = self.bucket.new_key('backup/a.txt')
+        key.size = 5
+        key.etag = '"0123456789abcdef0123456789abcdef-2"'
+        key.last_modified = '2000-01-01T00:00:00.000Z'
+        self.bucket.keys[key.name] = key
+        self.sync(manifest_path=None)
+        self.assertIn('backup/a.txt', self.bucket.uploaded)
+
+        key.etag = '"0123456789abcdef0123456789abcdef-2"'
+        key.last_modified = '2100-01-01T00:00:00.000Z'
+        self.bucket.uploaded = []
+        stats = self.sync(manifest_path=None)
+        self.assertNotIn('backup/a.txt', self.bucket.uploaded)
+        self.assertEqual(stats.uploaded, 0)
+
+    def test_delete(self):
+        self.sync()
+        os.remove(os.path.join(self.local_dir, 'a.txt'))
+        self.sync()
+        self.assertEqual(self.bucket.deleted, [])
+        stats = self.sync(delete=True)
+        self.assertEqual(self.bucket.deleted, ['backup/a.txt'])
+        self.assertEqual(stats.deleted, 1)
+        manifest = Manifest(self.manifest_path)
+        self.assertNotIn('backup/a.txt', manifest.entries)
+
+    def test_failed_upload_does_not_stop_the_others(self):
+        self.bucket.fail_on = 'backup/sub/b.txt'
+        stats = self.sync()
+        self.assertEqual(stats.uploaded, 2)
+        self.assertEqual([name for name, error in stats.failed],
+                         ['backup/sub/b.txt'])
+        self.bucket.fail_on = None
+        self.bucket.uploaded = []
+        self.sync()
+        self.assertEqual(self.bucket.uploaded, ['backup/sub/b.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
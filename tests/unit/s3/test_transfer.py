@@ -0,0 +1,296 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+from tests.compat import mock, unittest
+
+from boto.exception import S3ResponseError, StorageDataError
+from boto.provider import Provider
+from boto.s3.key import Key
+from boto.s3 import transfer
+
+
+class TestPartSizing(unittest.TestCase):
+    def test_default_part_size(self):
+        self.assertEqual(transfer.choose_part_size(100),
+                         transfer.DEFAULT_PART_SIZE)
+
+    def test_part_size_is_at_least_the_minimum(self):
+        self.assertEqual(transfer.choose_part_size(100, 1024),
+                         transfer.MIN_PART_SIZE)
+
+    def test_part_size_grows_to_fit_max_parts(self):
+        total_size = transfer.DEFAULT_PART_SIZE * transfer.MAX_PARTS + 1
+        part_size = transfer.choose_part_size(total_size)
+        self.assertTrue(part_size > transfer.DEFAULT_PART_SIZE)
+        self.assertEqual(len(transfer.part_ranges(total_size, part_size)),
+                         transfer.MAX_PARTS)
+
+    def test_part_ranges(self):
+        self.assertEqual(transfer.part_ranges(25, 10),
+                         [(1, 0, 10), (2, 10, 10), (3, 20, 5)])
+        self.assertEqual(transfer.part_ranges(0, 10), [(1, 0, 0)])
+
+
+class TestRunInThreads(unittest.TestCase):
+    def test_results_keep_item_order(self):
+        self.assertEqual(
+            transfer.run_in_threads(lambda x: x * 2, range(20), 4),
+            [x * 2 for x in range(20)])
+
+    def test_first_error_is_raised(self):
+        started = []
+        lock = threading.Lock()
+
+        def func(x):
+            with lock:
+                started.append(x)
+            if x == 0:
+                raise ValueError('boom')
+            return x
+
+        with self.assertRaises(ValueError):
+            transfer.run_in_threads(func, range(100), 1)
+        self.assertEqual(started, [0])
+
+
+class TestParallelUploader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.filename = os.path.join(self.tmpdir, 'data.txt')
+        with open(self.filename, 'wb') as fp:
+            fp.write(b'0123456789' * 3)
+        patcher = mock.patch.object(transfer, 'MIN_PART_SIZE', 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.bucket = mock.Mock()
+        self.bucket.connection.retry_policy.delay.return_value = 0
+        self.mp = self.bucket.initiate_multipart_upload.return_value
+        self.mp.id = 'upload-id'
+        self.uploaded = {}
+        self.mp.upload_part_from_file.side_effect = self.upload_part
+        self.key = Key(self.bucket, 'mykey')
+
+    def upload_part(self, fp, part_num, size=None):
+        self.uploaded[part_num] = fp.read(size)
+        return mock.Mock(etag='"etag-%d"' % part_num)
+
+    def test_uploads_parts_and_completes(self):
+        cb = mock.Mock()
+        size = self.key.set_contents_from_filename(
+            self.filename, cb=cb, parallel=3, part_size=10)
+
+        self.assertEqual(size, 30)
+        self.assertEqual(self.uploaded, {1: b'0123456789', 2: b'0123456789',
+                                         3: b'0123456789'})
+        self.assertEqual(
+            self.bucket.initiate_multipart_upload.call_args[1]['headers'],
+            {'Content-Type': 'text/plain'})
+        key_name, upload_id, xml = \
+            self.bucket.complete_multipart_upload.call_args[0]
+        self.assertEqual((key_name, upload_id), ('mykey', 'upload-id'))
+        self.assertEqual(xml.count('<Part>'), 3)
+        self.assertTrue(xml.index('"etag-1"') < xml.index('"etag-2"') <
+                        xml.index('"etag-3"'))
+        cb.assert_called_with(30, 30)
+        self.assertFalse(self.mp.cancel_upload.called)
+
+    def test_transient_part_failure_is_retried(self):
+        failures = [StorageDataError('ETag mismatch')]
+
+        def upload_part(fp, part_num, size=None):
+            if part_num == 2 and failures:
+                raise failures.pop()
+            return self.upload_part(fp, part_num, size)
+
+        self.mp.upload_part_from_file.side_effect = upload_part
+        self.key.set_contents_from_filename(self.filename, parallel=2,
+                                            part_size=10)
+        self.assertEqual(self.mp.upload_part_from_file.call_count, 4)
+        self.assertTrue(self.bucket.complete_multipart_upload.called)
+
+    def test_failure_cancels_upload(self):
+        self.mp.upload_part_from_file.side_effect = S3ResponseError(
+            403, 'Forbidden')
+        with self.assertRaises(S3ResponseError):
+            self.key.set_contents_from_filename(self.filename, parallel=2,
+                                                part_size=10)
+        self.assertTrue(self.mp.cancel_upload.called)
+        self.assertFalse(self.bucket.complete_multipart_upload.called)
+
+    def test_small_file_uses_single_put(self):
+        with mock.patch.object(Key, 'set_contents_from_file') as put:
+            put.return_value = 30
+            self.key.set_contents_from_filename(self.filename, parallel=2,
+                                                part_size=100)
+        self.assertTrue(put.called)
+        self.assertFalse(self.bucket.initiate_multipart_upload.called)
+
+
+class TestParallelDownloader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.filename = os.path.join(self.tmpdir, 'data')
+        patcher = mock.patch.object(transfer, 'MIN_PART_SIZE', 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.data = b'abcdefghij0123456789ABCDEFGHIJ'
+        self.requests = []
+        self.bucket = mock.Mock()
+        self.bucket.connection.retry_policy.delay.return_value = 0
+        self.bucket.new_key.side_effect = self.new_key
+        self.key = Key(self.bucket, 'mykey')
+        self.key.size = len(self.data)
+        self.key.etag = '"%s"' % hashlib.md5(self.data).hexdigest()
+
+    def new_key(self, name):
+        part_key = mock.Mock(local_hashes={})
+
+        def get_file(fp, headers, *args, **kwargs):
+            self.requests.append(headers)
+            start, end = headers['Range'][len('bytes='):].split('-')
+            part = self.data[int(start):int(end) + 1]
+            fp.write(part)
+            part_key.local_hashes['md5'] = hashlib.md5(part).digest()
+
+        part_key.get_file.side_effect = get_file
+        return part_key
+
+    def download(self):
+        self.key.get_contents_to_filename(self.filename, parallel=3,
+                                          part_size=10)
+        with open(self.filename, 'rb') as fp:
+            return fp.read()
+
+    def test_parts_are_written_in_place(self):
+        self.assertEqual(self.download(), self.data)
+        self.assertEqual(sorted(r['Range'] for r in self.requests),
+                         ['bytes=0-9', 'bytes=10-19', 'bytes=20-29'])
+        for request in self.requests:
+            self.assertEqual(request['If-Match'], self.key.etag)
+
+    def test_multipart_etag_is_checked(self):
+        digests = b''.join(hashlib.md5(self.data[i:i + 10]).digest()
+                           for i in range(0, 30, 10))
+        self.key.etag = '"%s-3"' % hashlib.md5(digests).hexdigest()
+        self.assertEqual(self.download(), self.data)
+
+    def test_etag_mismatch_removes_file(self):
+        self.key.etag = '"%s"' % hashlib.md5(b'other').hexdigest()
+        with self.assertRaises(StorageDataError):
+            self.download()
+        self.assertFalse(os.path.exists(self.filename))
+
+    def test_size_is_looked_up(self):
+        self.key.size = None
+        self.bucket.get_key.return_value = mock.Mock(
+            size=len(self.data), etag=self.key.etag, last_modified=None,
+            encrypted=None)
+        self.assertEqual(self.download(), self.data)
+        self.assertEqual(self.key.size, len(self.data))
+
+
+class TestParallelCopier(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(transfer, 'MIN_PART_SIZE', 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.bucket = mock.Mock()
+        self.bucket.name = 'dst-bucket'
+        self.bucket.connection.provider = Provider('aws')
+        self.bucket.connection.retry_policy.delay.return_value = 0
+        self.bucket.new_key.side_effect = lambda name: Key(self.bucket, name)
+        self.src_bucket = self.bucket.connection.get_bucket.return_value
+        self.src_key = Key(self.src_bucket, 'src')
+        self.src_key.size = 30
+        self.src_key.etag = '"src-etag"'
+        self.src_key.metadata = {'color': 'blue'}
+        self.src_key.content_type = 'text/plain'
+        self.src_bucket.get_key.return_value = self.src_key
+
+        self.mp = self.bucket.initiate_multipart_upload.return_value
+        self.mp.id = 'upload-id'
+        self.copied = []
+        self.mp.copy_part_from_key.side_effect = self.copy_part
+        self.copier = transfer.ParallelCopier(self.bucket, num_threads=3,
+                                              part_size=10)
+
+    def copy_part(self, src_bucket_name, src_key_name, part_num, start, end,
+                  src_version_id=None, headers=None):
+        self.copied.append((part_num, start, end, headers))
+        return mock.Mock(etag='"etag-%d"' % part_num)
+
+    def test_parts_are_copied_and_completed(self):
+        key = self.copier.copy('dst', 'src-bucket', 'src')
+
+        self.assertEqual(sorted(c[:3] for c in self.copied),
+                         [(1, 0, 9), (2, 10, 19), (3, 20, 29)])
+        for copied in self.copied:
+            self.assertEqual(copied[3],
+                             {'x-amz-copy-source-if-match': '"src-etag"'})
+        kwargs = self.bucket.initiate_multipart_upload.call_args[1]
+        self.assertEqual(kwargs['metadata'], {'color': 'blue'})
+        self.assertEqual(kwargs['headers']['Content-Type'], 'text/plain')
+        key_name, upload_id, xml = \
+            self.bucket.complete_multipart_upload.call_args[0]
+        self.assertEqual((key_name, upload_id), ('dst', 'upload-id'))
+        self.assertTrue(xml.index('"etag-1"') < xml.index('"etag-2"') <
+                        xml.index('"etag-3"'))
+        self.assertEqual((key.name, key.size), ('dst', 30))
+
+    def test_metadata_replaces_source_metadata(self):
+        self.copier.copy('dst', 'src-bucket', 'src', metadata={'a': 'b'})
+        kwargs = self.bucket.initiate_multipart_upload.call_args[1]
+        self.assertEqual(kwargs['metadata'], {'a': 'b'})
+        self.assertNotIn('Content-Type', kwargs['headers'])
+
+    def test_failure_cancels_upload(self):
+        self.mp.copy_part_from_key.side_effect = S3ResponseError(
+            412, 'Precondition Failed')
+        with self.assertRaises(S3ResponseError):
+            self.copier.copy('dst', 'src-bucket', 'src')
+        self.assertTrue(self.mp.cancel_upload.called)
+        self.assertFalse(self.bucket.complete_multipart_upload.called)
+
+    def test_small_source_uses_single_copy(self):
+        self.src_key.size = 5
+        self.copier.copy('dst', 'src-bucket', 'src', preserve_acl=True)
+        self.assertFalse(self.bucket.initiate_multipart_upload.called)
+        self.assertTrue(self.bucket.copy_key.call_args[1]['preserve_acl'])
+
+    def test_missing_source(self):
+        self.src_bucket.get_key.return_value = None
+        with self.assertRaises(S3ResponseError):
+            self.copier.copy('dst', 'src-bucket', 'src')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from tests.compat import mock, unittest
+
+from boto.compat import parse_qs
+from boto.exception import BotoServerError
+
+try:
+    import asyncio
+    from boto.aioconnection import AsyncAWSQueryConnection
+except (ImportError, SyntaxError):
+    asyncio = None
+    AsyncAWSQueryConnection = object
+
+
+class MockAsyncService(AsyncAWSQueryConnection):
+    APIVersion = '2012-01-01'
+
+    def _required_auth_capability(self):
+        return ['sign-v2']
+
+
+class StubServerProtocol(object):
+    """
+    Answers each request with the next canned (status, headers, body)
+    response, recording the raw requests it received.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.buffer = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        while b'\r\n\r\n' in self.buffer:
+            head, rest = self.buffer.split(b'\r\n\r\n', 1)
+            length = 0
+            for line in head.split(b'\r\n')[1:]:
+                name, _, value = line.partition(b':')
+                if name.strip().lower() == b'content-length':
+                    length = int(value)
+            if len(rest) < length:
+                return
+            self.buffer = rest[length:]
+            self.server.requests.append((head, rest[:length]))
+            status, headers, body = self.server.responses.pop(0)
+            lines = ['HTTP/1.1 %d Stub' % status,
+                     'Content-Length: %d' % len(body)]
+            lines.extend('%s: %s' % item for item in headers)
+            self.transport.write(
+                ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+
+    def connection_lost(self, exc):
+        self.server.connections += 1
+
+    def eof_received(self):
+        pass
+
+
+class StubServer(object):
+    def __init__(self, loop, responses):
+        self.loop = loop
+        self.responses = list(responses)
+        self.requests = []
+        self.connections = 0
+        self.server = loop.run_until_complete(loop.create_server(
+            lambda: StubServerProtocol(self), '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def close(self):
+        self.server.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class TestAsyncAWSQueryConnection(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        # Make every retry back off for zero seconds.
+        random_patch = mock.patch('random.random', return_value=0)
+        random_patch.start()
+        self.addCleanup(random_patch.stop)
+
+    def create_connection(self, responses):
+        self.server = StubServer(self.loop, responses)
+        self.addCleanup(self.server.close)
+        conn = MockAsyncService(
+            host='127.0.0.1', port=self.server.port, is_secure=False,
+            aws_access_key_id='access_key', aws_secret_access_key='secret')
+        self.addCleanup(lambda: self.loop.run_until_complete(conn.close()))
+        return conn
+
+    def test_make_request_signs_query(self):
+        conn = self.create_connection([(200, [], b'ok')])
+        response = self.loop.run_until_complete(
+            conn.make_request('myCmd', {'par1': 'foo'}, '/', 'POST'))
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.read(), b'ok')
+        args = parse_qs(self.server.requests[0][1])
+        self.assertEqual(args[b'Action'], [b'myCmd'])
+        self.assertEqual(args[b'AWSAccessKeyId'], [b'access_key'])
+        self.assertEqual(args[b'par1'], [b'foo'])
+        self.assertIn(b'Signature', args)
+
+    def test_get_status_parses_xml(self):
+        conn = self.create_connection([
+            (200, [('Content-Type', 'text/xml')], b'<status>ok</status>')])
+        status = self.loop.run_until_complete(
+            conn.get_status('getStatus', {}, '/'))
+        self.assertEqual(status, 'ok')
+
+    def test_retries_server_errors(self):
+        conn = self.create_connection([(503, [], b'busy'),
+                                       (200, [], b'<status>ok</status>')])
+        status = self.loop.run_until_complete(
+            conn.get_status('getStatus', {}, '/'))
+        self.assertEqual(status, 'ok')
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_follows_redirects(self):
+        conn = self.create_connection([])
+        location = 'http://127.0.0.1:%d/moved' % self.server.port
+        self.server.responses = [(307, [('Location', location)], b''),
+                                 (200, [], b'<status>ok</status>')]
+        status = self.loop.run_until_complete(
+            conn.get_status('getStatus', {}, '/'))
+        self.assertEqual(status, 'ok')
+        self.assertTrue(self.server.requests[1][0].startswith(b'GET /moved'))
+
+    def test_reuses_connections(self):
+        conn = self.create_connection([(200, [], b'one'), (200, [], b'two')])
+        self.loop.run_until_complete(conn.make_request('a'))
+        self.loop.run_until_complete(conn.make_request('b'))
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.connections, 0)
+
+    def test_exhausted_retries_raise(self):
+        conn = self.create_connection([(500, [], b'error')] * 2)
+        conn.num_retries = 1
+        with self.assertRaises(BotoServerError):
+            self.loop.run_until_complete(conn.get_status('getStatus', {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,7 +27,8 @@ from httpretty import HTTPretty
 
 from boto.compat import json, parse_qs
 from boto.connection import AWSQueryConnection, AWSAuthConnection
-from boto.exception import BotoServerError
+from boto.connection import ConnectionPool
+from boto.exception import AWSConnectionError, BotoServerError
 from boto.regioninfo import RegionInfo
 
 
@@ -460,5 +461,74 @@ class TestAWSQueryStatus(TestAWSQueryConnection):
                                    {'par1': 'foo', 'par2': 'baz'},
                                    'status')
 
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.key = ('example.com', 443, True)
+
+    def create_connection(self, ready=True):
+        conn = mock.Mock()
+        response = mock.Mock()
+        response.isclosed.return_value = ready
+        conn._HTTPConnection__response = response
+        return conn
+
+    def test_reuse_counts_hits_and_misses(self):
+        pool = ConnectionPool()
+        self.assertIsNone(pool.get_http_connection(*self.key))
+        conn = self.create_connection()
+        pool.put_http_connection(*(self.key + (conn,)))
+        self.assertIs(pool.get_http_connection(*self.key), conn)
+
+        stats = pool.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['checked_out'], 1)
+        self.assertEqual(stats['size'], 0)
+
+    def test_busy_connection_is_kept_pending(self):
+        pool = ConnectionPool()
+        busy = self.create_connection(ready=False)
+        pool.put_http_connection(*(self.key + (busy,)))
+
+        self.assertIsNone(pool.get_http_connection(*self.key))
+        self.assertEqual(pool.size(), 1)
+
+        busy._HTTPConnection__response.isclosed.return_value = True
+        self.assertIs(pool.get_http_connection(*self.key), busy)
+        self.assertEqual(pool.size(), 0)
+
+    def test_max_size_evicts_oldest(self):
+        pool = ConnectionPool(max_size=2)
+        conns = [self.create_connection() for i in range(3)]
+        for conn in conns:
+            pool.put_http_connection(*(self.key + (conn,)))
+
+        self.assertEqual(pool.size(), 2)
+        self.assertEqual(pool.stats()['evictions'], 1)
+        conns[0].close.assert_called_once_with()
+        self.assertIs(pool.get_http_connection(*self.key), conns[1])
+
+    def test_non_blocking_pool_allows_overflow(self):
+        pool = ConnectionPool(max_size=1)
+        self.assertIsNone(pool.get_http_connection(*self.key))
+        self.assertIsNone(pool.get_http_connection(*self.key))
+        self.assertEqual(pool.stats()['waits'], 0)
+
+    def test_blocking_pool_times_out(self):
+        pool = ConnectionPool(max_size=1, block=True, timeout=0.01)
+        self.assertIsNone(pool.get_http_connection(*self.key))
+        with self.assertRaises(AWSConnectionError):
+            pool.get_http_connection(*self.key)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_release_frees_slot_in_blocking_pool(self):
+        pool = ConnectionPool(max_size=1, block=True, timeout=0.01)
+        self.assertIsNone(pool.get_http_connection(*self.key))
+        pool.release_http_connection(*self.key)
+        self.assertIsNone(pool.get_http_connection(*self.key))
+        self.assertEqual(pool.stats()['waits'], 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,133 @@
+# Copyright (c) 2014 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from tests.compat import mock, unittest
+from tests.unit import AWSMockServiceTestCase
+
+from boto.connection import AWSQueryConnection
+from boto.exception import BotoServerError
+from boto.retry import RetryBudget, RetryPolicy
+from boto.retry import CONNECTION, THROTTLING, TRANSIENT
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_unknown_jitter(self):
+        with self.assertRaises(ValueError):
+            RetryPolicy(jitter='sideways')
+
+    def test_no_jitter(self):
+        policy = RetryPolicy(jitter='none', base_delay=0.05, max_delay=1)
+        self.assertEqual([policy.delay(i) for i in range(6)],
+                         [0, 0.1, 0.2, 0.4, 0.8, 1])
+
+    @mock.patch('random.random', return_value=0.5)
+    def test_full_jitter(self, random_mock):
+        policy = RetryPolicy(jitter='full', max_delay=10)
+        self.assertEqual(policy.delay(0), 0.5)
+        self.assertEqual(policy.delay(2), 2)
+        self.assertEqual(policy.delay(8), 5)
+
+    @mock.patch('random.random', return_value=0.5)
+    def test_equal_jitter(self, random_mock):
+        policy = RetryPolicy(jitter='equal', max_delay=10)
+        self.assertEqual(policy.delay(2), 3)
+        self.assertEqual(policy.delay(8), 7.5)
+
+    def test_decorrelated_jitter_is_bounded(self):
+        policy = RetryPolicy(jitter='decorrelated', base_delay=1,
+                             max_delay=20)
+        previous = None
+        for i in range(50):
+            delay = policy.delay(i, previous)
+            self.assertTrue(1 <= delay <= 20)
+            if previous is not None:
+                self.assertTrue(delay <= previous * 3)
+            previous = delay
+
+    def test_classify_response(self):
+        policy = RetryPolicy()
+        self.assertEqual(policy.classify_response(mock.Mock(status=500)),
+                         TRANSIENT)
+        self.assertEqual(policy.classify_response(mock.Mock(status=503)),
+                         THROTTLING)
+        self.assertIsNone(policy.classify_response(mock.Mock(status=404)))
+
+    def test_budget_limits_retries(self):
+        policy = RetryPolicy(budget=RetryBudget(capacity=10))
+        self.assertTrue(policy.should_retry(TRANSIENT))
+        self.assertTrue(policy.should_retry(THROTTLING))
+        self.assertFalse(policy.should_retry(CONNECTION))
+        policy.record_success()
+        self.assertEqual(policy.stats()['budget_tokens'], 1)
+        self.assertEqual(policy.stats()['retries'], 2)
+        self.assertEqual(policy.stats()['budget_exhausted'], 1)
+
+    @mock.patch('time.sleep')
+    def test_sleep_is_recorded(self, sleep_mock):
+        policy = RetryPolicy()
+        policy.sleep(1.5)
+        policy.sleep(0.5)
+        sleep_mock.assert_called_with(0.5)
+        self.assertEqual(policy.stats()['sleep_time'], 2.0)
+
+
+class MockQueryService(AWSQueryConnection):
+    APIVersion = '2012-01-01'
+
+    def _required_auth_capability(self):
+        return ['sign-v2']
+
+
+class TestMexeRetryPolicy(AWSMockServiceTestCase):
+    connection_class = MockQueryService
+
+    def create_service_connection(self, **kwargs):
+        kwargs['host'] = 'mockservice.cc-zone-1.amazonaws.com'
+        return super(TestMexeRetryPolicy, self).create_service_connection(
+            **kwargs)
+
+    @mock.patch('time.sleep')
+    def test_retries_are_counted(self, sleep_mock):
+        self.set_http_response(status_code=500)
+        self.service_connection.num_retries = 2
+        with self.assertRaises(BotoServerError):
+            self.service_connection.make_request('Action')
+
+        stats = self.service_connection.retry_policy.stats()
+        self.assertEqual(stats['attempts'], 3)
+        self.assertEqual(stats['retries'], 2)
+        self.assertEqual(sleep_mock.call_count, 2)
+
+    @mock.patch('time.sleep')
+    def test_exhausted_budget_stops_retrying(self, sleep_mock):
+        self.set_http_response(status_code=503)
+        self.service_connection.retry_policy = RetryPolicy(
+            budget=RetryBudget(capacity=5))
+        with self.assertRaises(BotoServerError):
+            self.service_connection.make_request('Action')
+
+        stats = self.service_connection.retry_policy.stats()
+        self.assertEqual(stats['attempts'], 2)
+        self.assertEqual(stats['budget_exhausted'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
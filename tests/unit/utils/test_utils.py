@@ -25,7 +25,10 @@ import datetime
 import hashlib
 import hmac
 import locale
+import os
+import tempfile
 import time
+import zlib
 
 import boto.utils
 from boto.utils import Password
@@ -34,8 +37,9 @@ from boto.utils import _build_instance_metadata_url
 from boto.utils import get_instance_userdata
 from boto.utils import retry_url
 from boto.utils import LazyLoadMetadata
+from boto.utils import Crc32, MappedFileRegion, MultiHasher
 
-from boto.compat import json, _thread
+from boto.compat import json, _thread, BytesIO, StringIO
 
 
 @unittest.skip("http://bugs.python.org/issue7980")
@@ -301,5 +305,130 @@ class TestStringToDatetimeParsing(unittest.TestCase):
         self.assertEqual(6, result.minute)
 
 
+class TestMultiHasher(unittest.TestCase):
+    data = b'0123456789abcdef' * 1000
+
+    def hasher(self, **kwargs):
+        return MultiHasher({'md5': hashlib.md5, 'sha256': hashlib.sha256,
+                            'crc32': Crc32}, **kwargs)
+
+    def assert_digests(self, hasher, data):
+        self.assertEqual(hasher.hexdigest('md5'),
+                         hashlib.md5(data).hexdigest())
+        self.assertEqual(hasher.hexdigest('sha256'),
+                         hashlib.sha256(data).hexdigest())
+        self.assertEqual(hasher.hexdigest('crc32'),
+                         '%08x' % (zlib.crc32(data) & 0xffffffff))
+
+    def test_hash_file_reads_once(self):
+        fp = BytesIO(self.data)
+        fp.seek(16)
+        read = mock.Mock(side_effect=fp.read)
+        with mock.patch.object(fp, 'read', read):
+            size = self.hasher(buf_size=4096).hash_file(fp, size=10000)
+        self.assertEqual(size, 10000)
+        self.assertEqual(fp.tell(), 16)
+        self.assertEqual(read.call_count, 3)
+
+    def test_digests(self):
+        hasher = self.hasher()
+        hasher.hash_file(BytesIO(self.data))
+        self.assert_digests(hasher, self.data)
+        self.assertEqual(hasher.base64digest('md5'),
+                         boto.utils.compute_md5(BytesIO(self.data))[1])
+
+    def test_text_is_encoded(self):
+        hasher = self.hasher()
+        hasher.hash_file(StringIO(u'caf\xe9'))
+        self.assert_digests(hasher, u'caf\xe9'.encode('utf-8'))
+
+    def test_stream_without_rewind(self):
+        fp = mock.Mock(spec=['read'])
+        fp.read.side_effect = BytesIO(self.data).read
+        hasher = self.hasher()
+        self.assertEqual(hasher.hash_file(fp, rewind=False), len(self.data))
+        self.assert_digests(hasher, self.data)
+
+    def test_mmap(self):
+        with tempfile.NamedTemporaryFile() as tmp:
+            tmp.write(self.data)
+            tmp.flush()
+            with open(tmp.name, 'rb') as fp:
+                fp.seek(5000)
+                hasher = self.hasher()
+                with mock.patch.object(fp, 'read') as read:
+                    size = hasher.hash_file(fp, size=8000, use_mmap=True)
+                self.assertFalse(read.called)
+                self.assertEqual(fp.tell(), 5000)
+        self.assertEqual(size, 8000)
+        self.assert_digests(hasher, self.data[5000:13000])
+
+    def test_mapped_region_is_hashed_in_place(self):
+        with tempfile.NamedTemporaryFile() as tmp:
+            tmp.write(self.data)
+            tmp.flush()
+            with MappedFileRegion(tmp.name, 100, 5000) as region:
+                region.seek(10)
+                hasher = self.hasher()
+                with mock.patch.object(region, 'read') as read:
+                    self.assertEqual(hasher.hash_file(region), 4990)
+                self.assertFalse(read.called)
+                self.assertEqual(region.tell(), 10)
+        self.assert_digests(hasher, self.data[110:5100])
+
+    def test_mmap_falls_back_to_reading(self):
+        hasher = self.hasher()
+        self.assertEqual(hasher.hash_file(BytesIO(self.data), use_mmap=True),
+                         len(self.data))
+        self.assert_digests(hasher, self.data)
+
+
+class TestMappedFileRegion(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(3 * mmap_granularity() + 100)
+        tmp = tempfile.NamedTemporaryFile()
+        self.addCleanup(tmp.close)
+        tmp.write(self.data)
+        tmp.flush()
+        self.filename = tmp.name
+
+    def test_read_and_seek(self):
+        offset = mmap_granularity() + 7
+        with open(self.filename, 'rb') as fp:
+            region = MappedFileRegion(fp, offset, 1000)
+        self.assertEqual(len(region), 1000)
+        self.assertEqual(region.name, self.filename)
+        self.assertEqual(bytes(region.read(10)), self.data[offset:offset + 10])
+        self.assertEqual(region.tell(), 10)
+        region.seek(-5, os.SEEK_END)
+        self.assertEqual(bytes(region.read()), self.data[offset + 995:
+                                                         offset + 1000])
+        self.assertEqual(len(region.read(10)), 0)
+        region.seek(0)
+        self.assertEqual(bytes(region.read(2000)),
+                         self.data[offset:offset + 1000])
+        region.close()
+
+    def test_region_ends_with_file(self):
+        offset = len(self.data) - 50
+        with MappedFileRegion(self.filename, offset, 1000) as region:
+            self.assertEqual(len(region), 50)
+            self.assertEqual(bytes(region.read()), self.data[-50:])
+        with MappedFileRegion(self.filename, len(self.data) + 10) as region:
+            self.assertEqual(len(region), 0)
+            self.assertEqual(len(region.read()), 0)
+
+    def test_close_with_slice_in_use(self):
+        region = MappedFileRegion(self.filename)
+        chunk = region.read(10)
+        region.close()
+        self.assertEqual(bytes(chunk), self.data[:10])
+
+
+def mmap_granularity():
+    import mmap
+    return mmap.ALLOCATIONGRANULARITY
+
+
 if __name__ == '__main__':
     unittest.main()